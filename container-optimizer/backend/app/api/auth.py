@@ -1,5 +1,5 @@
 import os
-import requests
+from app.core import http_client
 from fastapi import APIRouter, HTTPException, Response
 from fastapi.responses import HTMLResponse, RedirectResponse
 from dotenv import load_dotenv
@@ -36,7 +36,7 @@ def github_callback(code: str):
         "code": code
     }
 
-    resp = requests.post(token_url, headers=headers, data=data)
+    resp = http_client.post(token_url, headers=headers, data=data)
     if resp.status_code != 200:
         raise HTTPException(status_code=400, detail="Failed to exchange code for token")
 
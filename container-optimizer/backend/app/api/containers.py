@@ -1,67 +1,100 @@
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from app.core.report.report_builder import build_report, build_static_report
-from app.docker.client import get_docker_client
-from app.core.github_service import extract_repo_info, get_file_content, full_bulk_pr_workflow, find_all_dockerfiles
+from app.core.github_service import extract_repo_info, full_bulk_pr_workflow
+from app.core.github_scan_service import scan_github_repo, scan_github_services
 from fastapi import HTTPException
 from app.core.registry_service import scan_registry_image
+from app.core.report.streaming import stream_report, streaming_media_type
+from app.core.cache import all_cache_stats
+from app.core.ai_service import ai_response_cache
+from app.core.trivy_server import trivy_server
+from app.core.security_scanner import get_trivy_version_info
+from app.core.trivy_results import find_vulnerability_details
+from app.core.fleet_analyzer import analyze_fleet
+from app.core.analysis_watcher import analysis_watcher
+from app.core.container_inventory import container_inventory
+from app.core.stats_collector import stats_collector
+from app.core.analyzers.rightsizing_analyzer import rightsize_all, RIGHTSIZE_WINDOW_SECONDS
 
 router = APIRouter()
 
 
 @router.get("/containers")
 def list_containers():
-    client = get_docker_client()
-    containers = client.containers.list(all=True)
-    results = []
-
-    for c in containers:
-        try:
-            # Optimize: Try to get size from attributes directly to avoid extra image fetch
-            image_size_mb = 0.0
-            try:
-                if hasattr(c.image, "attrs") and "Size" in c.image.attrs:
-                    image_size_mb = round(c.image.attrs["Size"] / (1024 * 1024), 2)
-                else:
-                    # Fallback if attrs missing
-                    img = client.images.get(c.image.id)
-                    image_size_mb = round(img.attrs["Size"] / (1024 * 1024), 2)
-            except: pass
-
-            # NOTE: We skip c.stats(stream=False) here because it is too slow (blocks for ~1s per container)
-            # Memory usage will be fetched only during deep analysis.
-            results.append({
-                "id": c.short_id,
-                "name": c.name,
-                "image": c.image.tags[0] if (hasattr(c.image, "tags") and c.image.tags) else c.short_id,
-                "status": c.status,
-                "image_size_mb": image_size_mb,
-            })
-
-        except Exception:
-            continue
-
+    # One containers call and one images call, cached until a Docker event changes the picture.
+    # Usage comes from the background stats collector; c.stats(stream=False) blocks for ~1s per container.
+    stats_collector.start()
+    results = container_inventory.list()
+    for c in results:
+        usage = stats_collector.usage(c["id"])
+        c["cpu_percent"] = usage["cpu_percent"] if usage else None
+        c["memory_mb"] = usage["memory_mb"] if usage else None
     return results
 
 
+@router.get("/containers/rightsizing")
+def containers_rightsizing(window: float = RIGHTSIZE_WINDOW_SECONDS):
+    """Memory/CPU limit recommendations for every running container, plus aggregate over-provisioning."""
+    return rightsize_all(window)
+
+
+@router.get("/containers/{container_id}/stats")
+def container_stats(container_id: str, window: float = 900):
+    """Recent CPU/memory samples and p50/p95/max over the last `window` seconds."""
+    history = stats_collector.history(container_id, window)
+    if history is None:
+        raise HTTPException(status_code=404, detail="No usage samples for this container (is it running?)")
+    return history
+
+
+@router.get("/images/fleet")
+def fleet_report():
+    """Which layers local images share, what each base image costs, and what consolidating bases would save."""
+    return analyze_fleet()
+
+
 
 class RuntimeScanRequest(BaseModel):
     image: str
     id: Optional[str] = None
     dockerfile_content: Optional[str] = None
+    time_budget: Optional[float] = None  # seconds; slower stages degrade instead of blocking
 
 @router.post("/image/report")
 def image_report(request: RuntimeScanRequest):
-    return build_report(request.image, request.dockerfile_content, container_id=request.id)
+    return build_report(request.image, request.dockerfile_content, container_id=request.id, time_budget=request.time_budget)
+
+
+@router.post("/image/report/stream")
+def image_report_stream(request: RuntimeScanRequest, format: str = "ndjson"):
+    """Same report as /image/report, pushed section by section (NDJSON, or SSE with ?format=sse)."""
+    return StreamingResponse(
+        stream_report(lambda on_section: build_report(request.image, request.dockerfile_content, container_id=request.id,
+                                                   on_section=on_section, time_budget=request.time_budget), format),
+        media_type=streaming_media_type(format),
+    )
 
 
 class DockerfileRequest(BaseModel):
     content: str
+    time_budget: Optional[float] = None  # seconds; slower stages degrade instead of blocking
+    deep_scan: bool = False  # with DOCKERFILE_NATIVE_CHECKS on, also run `trivy config` (it always runs otherwise)
 
 @router.post("/analyze-dockerfile")
 def analyze_dockerfile(request: DockerfileRequest):
-    return build_static_report(request.content)
+    return build_static_report(request.content, time_budget=request.time_budget, deep_scan=request.deep_scan)
+
+
+@router.post("/analyze-dockerfile/stream")
+def analyze_dockerfile_stream(request: DockerfileRequest, format: str = "ndjson"):
+    return StreamingResponse(
+        stream_report(lambda on_section: build_static_report(request.content, on_section=on_section,
+                                                          time_budget=request.time_budget, deep_scan=request.deep_scan), format),
+        media_type=streaming_media_type(format),
+    )
 
 
 class GitHubScanRequest(BaseModel):
@@ -71,55 +104,35 @@ class GitHubScanRequest(BaseModel):
 
 @router.post("/scan-github")
 def scan_github(request: GitHubScanRequest):
-    owner, repo, branch = extract_repo_info(request.url)
-    if not owner or not repo:
-        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
-    
-    # 1. Handle Path Discovery or Targeted Analysis
-    path = request.path
-    token = request.token
-    if not path:
-        # Discovery Phase
-        all_paths = find_all_dockerfiles(owner, repo, token=token)
-        if not all_paths:
-            raise HTTPException(status_code=404, detail="No Dockerfile found in repository")
-        
-        # If multiple found and no path specified, return list for selection
-        if len(all_paths) > 1:
-            return {
-                "multi_service": True,
-                "paths": all_paths,
-                "owner": owner,
-                "repo": repo,
-                "url": request.url
-            }
-        path = all_paths[0]
-
-    # 2. Analyze the specific path
-    content = get_file_content(owner, repo, path, token=token)
-    if not content:
-        raise HTTPException(status_code=404, detail=f"Failed to fetch Dockerfile at {path}")
-    
-    # Use the unified static report builder (includes Trivy + AI)
-    report = build_static_report(content)
-    
-    # Add GitHub metadata to the report
-    report.update({
-        "owner": owner,
-        "repo": repo,
-        "branch": branch,
-        "path": path,
-        "original_content": content,
-        "url": request.url,
-        "multi_service": False
-    })
-    
-    # Ensure ResultViewer can find the AI result
-    if "recommendation" in report:
-        rec = report["recommendation"]
-        report["optimization"] = rec.get("optimized_dockerfile") or rec.get("dockerfile")
-    
-    return report
+    return scan_github_repo(request.url, request.path, token=request.token)
+
+
+@router.post("/scan-github/stream")
+def scan_github_stream(request: GitHubScanRequest, format: str = "ndjson"):
+    return StreamingResponse(
+        stream_report(lambda on_section: scan_github_repo(request.url, request.path, token=request.token, on_section=on_section), format),
+        media_type=streaming_media_type(format),
+    )
+
+class GitHubServicesScanRequest(BaseModel):
+    url: str
+    paths: Optional[List[str]] = None  # defaults to every Dockerfile in the repository
+    token: Optional[str] = None
+    deep_scan: bool = False  # as for /analyze-dockerfile; `trivy config` runs once over all Dockerfiles
+
+@router.post("/scan-github/services")
+def scan_github_all_services(request: GitHubServicesScanRequest):
+    return scan_github_services(request.url, request.paths, token=request.token, deep_scan=request.deep_scan)
+
+
+@router.post("/scan-github/services/stream")
+def scan_github_all_services_stream(request: GitHubServicesScanRequest, format: str = "ndjson"):
+    """Pushes one "service" section per Dockerfile as soon as its report is ready."""
+    return StreamingResponse(
+        stream_report(lambda on_section: scan_github_services(request.url, request.paths, token=request.token,
+                                                                          on_section=on_section, deep_scan=request.deep_scan), format),
+        media_type=streaming_media_type(format),
+    )
 
 class CreateBulkPRRequest(BaseModel):
     url: str
@@ -157,3 +170,43 @@ class RegistryScanRequest(BaseModel):
 @router.post("/scan-registry")
 def scan_registry(request: RegistryScanRequest):
     return scan_registry_image(request.image)
+
+
+@router.post("/scan-registry/stream")
+def scan_registry_stream(request: RegistryScanRequest, format: str = "ndjson"):
+    return StreamingResponse(
+        stream_report(lambda on_section: scan_registry_image(request.image, on_section=on_section), format),
+        media_type=streaming_media_type(format),
+    )
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    return all_cache_stats()
+
+
+@router.delete("/cache/ai")
+def purge_ai_cache():
+    return {"purged": ai_response_cache.purge()}
+
+
+@router.get("/scanner/status")
+def scanner_status():
+    return {"trivy_server": trivy_server.status(), "trivy": get_trivy_version_info()}
+
+
+@router.get("/watcher/status")
+def watcher_status():
+    """Background analyses queued from Docker events (most recent first)."""
+    return analysis_watcher.status()
+
+
+@router.get("/security/scans/{scan_id}/vulnerabilities/{vulnerability_id}")
+def vulnerability_details(scan_id: str, vulnerability_id: str):
+    """Full Trivy records (description, references, CVSS) for one vulnerability of an image scan."""
+    details = find_vulnerability_details(scan_id, vulnerability_id)
+    if details is None:
+        raise HTTPException(status_code=404, detail="Scan results not found or expired")
+    if not details:
+        raise HTTPException(status_code=404, detail=f"{vulnerability_id} not found in scan {scan_id}")
+    return {"scan_id": scan_id, "vulnerability_id": vulnerability_id, "records": details}
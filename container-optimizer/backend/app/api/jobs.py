@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from app.api.containers import RuntimeScanRequest, GitHubScanRequest, RegistryScanRequest, GitHubServicesScanRequest
+from app.core.jobs import job_manager, QueueFullError
+from app.core.report.report_builder import build_report
+from app.core.github_scan_service import scan_github_repo, scan_github_services
+from app.core.registry_service import scan_registry_image
+
+router = APIRouter(prefix="/jobs")
+
+
+def _submit(kind: str, fn, params: dict):
+    try:
+        job = job_manager.submit(kind, fn, params=params)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return JSONResponse(status_code=202, content=job)
+
+
+@router.post("/scan-registry")
+def submit_registry_scan(request: RegistryScanRequest):
+    return _submit(
+        "scan-registry",
+        lambda on_section: scan_registry_image(request.image, on_section=on_section),
+        {"image": request.image},
+    )
+
+
+@router.post("/image/report")
+def submit_image_report(request: RuntimeScanRequest):
+    return _submit(
+        "image-report",
+        lambda on_section: build_report(request.image, request.dockerfile_content, container_id=request.id,
+                                        on_section=on_section, time_budget=request.time_budget),
+        {"image": request.image, "id": request.id},
+    )
+
+
+@router.post("/scan-github")
+def submit_github_scan(request: GitHubScanRequest):
+    # The token is only captured by the closure, never stored in the job record
+    return _submit(
+        "scan-github",
+        lambda on_section: scan_github_repo(request.url, request.path, token=request.token, on_section=on_section),
+        {"url": request.url, "path": request.path},
+    )
+
+
+@router.post("/scan-github/services")
+def submit_github_services_scan(request: GitHubServicesScanRequest):
+    return _submit(
+        "scan-github-services",
+        lambda on_section: scan_github_services(request.url, request.paths, token=request.token,
+                                                        on_section=on_section, deep_scan=request.deep_scan),
+        {"url": request.url, "paths": request.paths},
+    )
+
+
+@router.get("/stats")
+def job_stats():
+    return job_manager.stats()
+
+
+@router.get("/{job_id}")
+def job_status(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/{job_id}/result")
+def job_result(job_id: str):
+    job = job_manager.get(job_id, include_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=job["error"]["status_code"], detail=job["error"]["detail"])
+    if job["status"] != "completed":
+        # Not ready yet: same body as the status endpoint
+        job.pop("result", None)
+        return JSONResponse(status_code=202, content=job)
+    return job["result"]
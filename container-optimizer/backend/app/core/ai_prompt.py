@@ -0,0 +1,137 @@
+import json
+import os
+import re
+
+# Upper bound for the user prompt (system message excluded); larger inputs are compacted step by step
+AI_PROMPT_TOKEN_BUDGET = int(os.getenv("AI_PROMPT_TOKEN_BUDGET", "4000"))
+# RUN instructions chaining more commands than this are abbreviated once the prompt is over budget
+RUN_CHAIN_KEEP_COMMANDS = 6
+
+SEVERITY_ORDER = {"CRITICAL": 0, "HIGH": 1, "MEDIUM": 2, "LOW": 3, "INFO": 4, "UNKNOWN": 5}
+LOW_SEVERITIES = {"LOW", "INFO", "UNKNOWN"}
+
+# Captures the separator so abbreviated chains keep `a; b` (b runs regardless) distinct from `a && b`
+_CHAIN_SPLIT_RE = re.compile(r"\s*(&&|;)\s*")
+
+PROMPT_TEMPLATE = """
+You are an expert Docker and DevSecOps engineer. Your task is to analyze a Docker image/Dockerfile and provide an industry-ready, SECURE, and OPTIMIZED multi-stage replacement.
+
+### CONTEXT:
+Image: {image}
+Detected Runtime: {runtime}
+Misconfigurations Found: {misconfigurations}
+
+### ORIGINAL DOCKERFILE CONTENT (If provided):
+{dockerfile}
+
+### OUTPUT FORMAT:
+Your response must be a VALID JSON object with the following keys:
+- "optimized_dockerfile": The complete string of the new Dockerfile.
+- "dockerignore": Recommended .dockerignore content.
+- "explanation": An array of strings explaining the key changes.
+- "security_warnings": An array of specific security alerts discovered.
+
+DO NOT include any conversation or markdown outside the JSON object.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; close enough for English text and code on GPT-style tokenizers."""
+    return (len(text) + 3) // 4
+
+
+def compact_misconfigs(misconfigs: list, drop_low: bool = False) -> list:
+    """
+    Collapses repeats of the same finding (same ID and message) into one entry with a count, keeps only
+    the fields the model needs and orders them by severity. Distinct messages under one rule ID are kept
+    as separate entries. Optionally drops LOW/INFO findings.
+    """
+    merged = {}
+    for m in misconfigs:
+        severity = (m.get("severity") or "UNKNOWN").upper()
+        if drop_low and severity in LOW_SEVERITIES:
+            continue
+        key = (m.get("id"), m.get("message", ""))
+        entry = merged.get(key)
+        if entry is None:
+            entry = merged[key] = {k: m[k] for k in ("id", "severity", "message") if m.get(k)}
+            entry["severity"] = severity
+        else:
+            entry["count"] = entry.get("count", 1) + 1
+            if SEVERITY_ORDER.get(severity, 5) < SEVERITY_ORDER.get(entry["severity"], 5):
+                entry["severity"] = severity
+    return sorted(merged.values(), key=lambda e: SEVERITY_ORDER.get(e["severity"], 5))
+
+
+def summarize_run_chains(dockerfile_content: str, keep: int = RUN_CHAIN_KEEP_COMMANDS) -> str:
+    """Abbreviates RUN instructions chaining more than `keep` commands, joining line continuations first."""
+    out = []
+    buffer = ""
+    for line in dockerfile_content.splitlines():
+        stripped = line.rstrip()
+        if stripped.endswith("\\"):
+            buffer += stripped[:-1].strip() + " "
+            continue
+        instruction = (buffer + stripped.strip()) if buffer else line
+        buffer = ""
+
+        if instruction.lstrip().upper().startswith("RUN "):
+            parts = _CHAIN_SPLIT_RE.split(instruction.strip()[4:])  # command, separator, command, ...
+            commands = len(parts) // 2 + 1
+            if commands > keep:
+                kept = "".join(part if i % 2 == 0 else ("; " if part == ";" else " && ")
+                               for i, part in enumerate(parts[:2 * keep]))
+                instruction = f"RUN {kept}...  # {commands - keep} more commands omitted"
+        out.append(instruction)
+    if buffer:
+        out.append(buffer.strip())
+    return "\n".join(out)
+
+
+def build_prompt(image_context: dict, dockerfile_content: str = None, budget: int = None):
+    """
+    Renders the optimization prompt within `budget` tokens. Compaction is applied in order until it fits:
+    compact JSON with duplicates collapsed (always), dropping LOW/INFO findings, abbreviating long RUN chains,
+    and finally truncating the Dockerfile. Returns (prompt, info) where info lists the steps applied.
+    """
+    budget = budget or AI_PROMPT_TOKEN_BUDGET
+    misconfigs = image_context.get("misconfigurations", [])
+    steps = ["compact_json"]
+
+    def render(findings, dockerfile):
+        return PROMPT_TEMPLATE.format(
+            image=image_context.get("image", "unknown"),
+            runtime=image_context.get("runtime", "unknown"),
+            misconfigurations=json.dumps(findings, separators=(",", ":")),
+            dockerfile=dockerfile or "Not provided. Use image metadata and misconfigurations above.",
+        )
+
+    findings = compact_misconfigs(misconfigs)
+    dockerfile = dockerfile_content
+    prompt = render(findings, dockerfile)
+
+    if estimate_tokens(prompt) > budget and any(f["severity"] in LOW_SEVERITIES for f in findings):
+        findings = compact_misconfigs(misconfigs, drop_low=True)
+        steps.append("drop_low_severity")
+        prompt = render(findings, dockerfile)
+
+    if estimate_tokens(prompt) > budget and dockerfile:
+        summarized = summarize_run_chains(dockerfile)
+        if summarized != dockerfile:
+            dockerfile = summarized + "\n# NOTE: long RUN chains were abbreviated for length; keep the omitted commands."
+            steps.append("summarize_run_chains")
+            prompt = render(findings, dockerfile)
+
+    overflow = estimate_tokens(prompt) - budget
+    if overflow > 0 and dockerfile:
+        keep_chars = max(0, len(dockerfile) - overflow * 4)
+        dockerfile = dockerfile[:keep_chars] + "\n# ... truncated for length"
+        steps.append("truncate_dockerfile")
+        prompt = render(findings, dockerfile)
+
+    return prompt, {
+        "prompt_tokens": estimate_tokens(prompt),
+        "budget": budget,
+        "misconfigurations": len(findings),
+        "compaction": steps,
+    }
@@ -0,0 +1,144 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from app.core.metrics import register_collector
+
+# Provider limits (Groq free tier defaults for openai/gpt-oss-120b)
+GROQ_REQUESTS_PER_MINUTE = float(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = float(os.getenv("GROQ_TOKENS_PER_MINUTE", "8000"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_BACKGROUND = 20
+
+
+class TokenBucket:
+    """Continuously refilling bucket; `capacity` defaults to one minute's worth of tokens."""
+
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)  # oversized requests still go through once the bucket is full
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate_per_second if self.rate_per_second > 0 else float("inf")
+
+    def consume(self, amount: float):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class AIScheduler:
+    """
+    Dispatches AI calls in priority order while staying under the provider's requests-per-minute
+    and tokens-per-minute limits, with at most `max_concurrency` calls in flight.
+    """
+
+    def __init__(self, requests_per_minute: float = GROQ_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = GROQ_TOKENS_PER_MINUTE,
+                 max_concurrency: int = AI_MAX_CONCURRENCY):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self._queue = []  # heap of (priority, seq, task)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="ai-call")
+        self._dispatcher = None
+
+    def submit(self, fn, *args, priority: int = PRIORITY_INTERACTIVE, est_tokens: int = 0, **kwargs) -> Future:
+        future = Future()
+        with self._cond:
+            heapq.heappush(self._queue, (priority, next(self._seq), (fn, args, kwargs, est_tokens, future)))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="ai-scheduler", daemon=True)
+                self._dispatcher.start()
+            self._cond.notify_all()
+        return future
+
+    def run(self, fn, *args, priority: int = PRIORITY_INTERACTIVE, est_tokens: int = 0, **kwargs):
+        """Submits and waits for the result."""
+        return self.submit(fn, *args, priority=priority, est_tokens=est_tokens, **kwargs).result()
+
+    def map_as_completed(self, calls: dict, priority: int = PRIORITY_BATCH):
+        """
+        calls: key -> (fn, args, est_tokens). Yields (key, result, error) as each call finishes.
+        """
+        futures = {
+            self.submit(fn, *args, priority=priority, est_tokens=est_tokens): key
+            for key, (fn, args, est_tokens) in calls.items()
+        }
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "request_tokens": round(self.request_bucket.tokens, 2),
+                "llm_tokens": round(self.token_bucket.tokens, 2),
+            }
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._queue or self._in_flight >= self.max_concurrency:
+                    self._cond.wait()
+
+                _, _, (fn, args, kwargs, est_tokens, future) = self._queue[0]
+                delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(est_tokens))
+                if delay > 0:
+                    # Re-check after the delay; a higher-priority call may have arrived meanwhile
+                    self._cond.wait(timeout=delay)
+                    continue
+
+                heapq.heappop(self._queue)
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(est_tokens)
+                self._in_flight += 1
+
+            self._executor.submit(self._run, fn, args, kwargs, future)
+
+    def _run(self, fn, args, kwargs, future):
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+
+ai_scheduler = AIScheduler()
+
+
+@register_collector
+def _scheduler_metrics():
+    stats = ai_scheduler.stats()
+    return [
+        ("optimizer_ai_scheduler_queued", "gauge", "AI calls waiting for a rate-limit slot.", [({}, stats["queued"])]),
+        ("optimizer_ai_scheduler_in_flight", "gauge", "AI calls currently running.", [({}, stats["in_flight"])]),
+    ]
@@ -1,48 +1,26 @@
 import os
-import requests
+from app.core import http_client
 import json
+import time
 from dotenv import load_dotenv
+from app.core.metrics import observe_call, ai_prompt_tokens, ai_response_seconds
+from app.core.ai_prompt import build_prompt, estimate_tokens, AI_PROMPT_TOKEN_BUDGET
+from app.core.cache import DiskCache, make_key
+from app.core.dockerfile_analyzer import canonicalize_dockerfile
+from app.core.ai_scheduler import ai_scheduler, PRIORITY_INTERACTIVE
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_URL = "https://api.groq.com/openai/v1/chat/completions"
+GROQ_MODEL = "openai/gpt-oss-120b"
+# Bump whenever the prompt or system message changes so cached responses are not reused
+PROMPT_VERSION = "2"
 
-def optimize_with_ai(image_context: dict, dockerfile_content: str = None):
-    """
-    Calls Groq AI to perform deep optimization of a Dockerfile or Image.
-    """
-    if not GROQ_API_KEY:
-        raise Exception("GROQ_API_KEY not found in environment")
-
-    # Construct the prompt
-    prompt = f"""
-You are an expert Docker and DevSecOps engineer. Your task is to analyze a Docker image/Dockerfile and provide an industry-ready, SECURE, and OPTIMIZED multi-stage replacement.
-
-### CONTEXT:
-Image: {image_context.get('image', 'unknown')}
-Detected Runtime: {image_context.get('runtime', 'unknown')}
-Misconfigurations Found: {json.dumps(image_context.get('misconfigurations', []), indent=2)}
-
-### ORIGINAL DOCKERFILE CONTENT (If provided):
-{dockerfile_content or "Not provided. Use image metadata and misconfigurations above."}
-
-### OUTPUT FORMAT:
-Your response must be a VALID JSON object with the following keys:
-- "optimized_dockerfile": The complete string of the new Dockerfile.
-- "dockerignore": Recommended .dockerignore content.
-- "explanation": An array of strings explaining the key changes.
-- "security_warnings": An array of specific security alerts discovered.
-
-DO NOT include any conversation or markdown outside the JSON object.
-"""
+# Rough size of the JSON answer, used for rate-limit accounting
+EXPECTED_COMPLETION_TOKENS = 1500
 
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    system_message = """You are a specialized Docker Optimization AI. You ONLY output valid JSON.
+SYSTEM_MESSAGE = """You are a specialized Docker Optimization AI. You ONLY output valid JSON.
 CRITICAL MANDATES for logic accuracy:
 1. TRUTHFULNESS: 
    - NEVER suggest a tool (curl, wget, ping) in a CMD or HEALTHCHECK unless you explicitly install it in the SAME stage using a package manager (apt/apk).
@@ -61,10 +39,88 @@ CRITICAL MANDATES for logic accuracy:
    - DO NOT make minor formatting changes or add comments if the logic is already correct. This prevents duplicate PRs.
 """
 
+# Responses are near-deterministic (temperature 0.1), so repeat CI runs can reuse them across restarts
+ai_response_cache = DiskCache(
+    "ai_response",
+    directory=os.getenv("AI_CACHE_DIR", "/tmp/optimizer_ai_cache"),
+    max_entries=int(os.getenv("AI_CACHE_MAX_ENTRIES", "500")),
+    ttl_seconds=float(os.getenv("AI_CACHE_TTL_SECONDS", str(7 * 86400))),
+)
+
+def ai_cache_key(image_context: dict, dockerfile_content: str = None) -> str:
+    """
+    Key on what actually shapes the prompt: the canonicalized Dockerfile (comments, blank lines and
+    continuations normalized), the set of misconfiguration IDs, the runtime, model, prompt version and budget.
+    The resolved image ID is part of the key, so a tag moved by `docker pull` does not reuse the old answer.
+    """
+    misconfig_ids = sorted({m.get("id") or m.get("message", "") for m in image_context.get("misconfigurations", [])})
+    return make_key(
+        "ai_response",
+        PROMPT_VERSION,
+        AI_PROMPT_TOKEN_BUDGET,
+        GROQ_MODEL,
+        image_context.get("image", "unknown"),
+        image_context.get("image_id"),
+        image_context.get("runtime", "unknown"),
+        misconfig_ids,
+        canonicalize_dockerfile(dockerfile_content) if dockerfile_content else None,
+    )
+
+def estimate_request_tokens(prompt: str) -> int:
+    """Prompt plus system message plus the expected answer."""
+    return estimate_tokens(prompt) + estimate_tokens(SYSTEM_MESSAGE) + EXPECTED_COMPLETION_TOKENS
+
+def optimize_with_ai(image_context: dict, dockerfile_content: str = None, priority: int = PRIORITY_INTERACTIVE):
+    """
+    Calls Groq AI to perform deep optimization of a Dockerfile or Image.
+    Successful responses are served from the persistent AI cache when the inputs are unchanged.
+    Calls go through the shared AI scheduler, which enforces provider rate limits and runs them by priority.
+    The prompt is compacted to fit AI_PROMPT_TOKEN_BUDGET (see ai_prompt.build_prompt).
+    """
+    cache_key = ai_cache_key(image_context, dockerfile_content)
+    # Identical concurrent requests share one provider call (and one rate-limit slot)
+    return ai_response_cache.get_or_compute(
+        cache_key, lambda: _scheduled_optimization(image_context, dockerfile_content, priority)
+    )
+
+def _unavailable_reason():
+    """Why a provider call cannot be sent at all, or None. Checked before queueing for a rate-limit slot."""
+    if not GROQ_API_KEY:
+        return "GROQ_API_KEY not found in environment"
+    return None
+
+def _scheduled_optimization(image_context: dict, dockerfile_content: str, priority: int):
+    # Fail fast: a call that cannot be sent must not take rate-limit tokens or queue behind others
+    reason = _unavailable_reason()
+    if reason:
+        raise Exception(reason)
+
+    prompt, prompt_info = build_prompt(image_context, dockerfile_content)
+    ai_prompt_tokens.observe(prompt_info["prompt_tokens"], source="estimated")
+
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        return ai_scheduler.run(
+            _request_optimization, prompt, priority=priority, est_tokens=estimate_request_tokens(prompt),
+        )
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        ai_response_seconds.observe(elapsed, outcome=outcome)
+
+def _request_optimization(prompt: str):
+    headers = {
+        "Authorization": f"Bearer {GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
     payload = {
-        "model": "openai/gpt-oss-120b",
+        "model": GROQ_MODEL,
         "messages": [
-            {"role": "system", "content": system_message},
+            {"role": "system", "content": SYSTEM_MESSAGE},
             {"role": "user", "content": prompt}
         ],
         "temperature": 0.1,
@@ -72,13 +128,17 @@ CRITICAL MANDATES for logic accuracy:
     }
 
     try:
-        response = requests.post(GROQ_URL, headers=headers, json=payload, timeout=30)
+        with observe_call("groq", "chat_completion"):
+            response = http_client.post(GROQ_URL, headers=headers, json=payload, timeout=30, retry_non_idempotent=True)
         if response.status_code != 200:
             print(f"Groq API Error Status: {response.status_code}")
             print(f"Groq API Error Response: {response.text}")
             response.raise_for_status()
             
         data = response.json()
+        reported_tokens = (data.get("usage") or {}).get("prompt_tokens")
+        if reported_tokens:
+            ai_prompt_tokens.observe(reported_tokens, source="reported")
         
         # Parse the JSON string from the AI response
         ai_response_content = data['choices'][0]['message']['content']
@@ -0,0 +1,158 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+from app.docker.client import get_docker_client, reporting_failures
+from app.docker.events import docker_events
+from app.core.ai_scheduler import PRIORITY_BACKGROUND
+from app.core.cache import make_key
+from app.core.jobs import job_manager, QueueFullError
+from app.core.metrics import Counter
+from app.core.report.report_builder import build_report
+
+# "on": analyze new images/containers as Docker reports them; "off" (default): only on request.
+# Opt-in because every analyzed pull costs an AI call and a Trivy scan.
+ANALYSIS_WATCHER = os.getenv("ANALYSIS_WATCHER", "off")
+# Events waiting to be inspected; a bulk pull or `compose up` beyond this is dropped, not threaded
+WATCHER_EVENT_BACKLOG = int(os.getenv("WATCHER_EVENT_BACKLOG", "256"))
+# Background jobs never take more than this share of the job queue, so user requests still fit
+WATCHER_QUEUE_SHARE = float(os.getenv("WATCHER_QUEUE_SHARE", "0.5"))
+WATCHER_MAX_TRACKED = 4096
+# Runs after anything a user submitted
+WATCHER_JOB_PRIORITY = 100
+
+IMAGE_ACTIONS = {"pull", "tag", "load", "import"}
+
+watcher_events_total = Counter(
+    "optimizer_watcher_events_total",
+    "Docker events seen by the analysis watcher, by outcome (queued, unchanged, skipped, queue_full, dropped, error).",
+    ("kind", "outcome"),
+)
+
+
+def container_fingerprint(attrs: dict) -> str:
+    """Identity of what a container report depends on: the image and the container's configuration."""
+    host_config = attrs.get("HostConfig") or {}
+    config = attrs.get("Config") or {}
+    return make_key(
+        attrs.get("Image"),
+        {k: host_config.get(k) for k in ("Privileged", "NetworkMode", "Memory", "NanoCpus", "CpuQuota", "CpuShares",
+                                         "CapAdd", "Binds", "ReadonlyRootfs", "SecurityOpt")},
+        {k: config.get(k) for k in ("User", "Env", "Entrypoint", "Cmd", "ExposedPorts")},
+    )
+
+
+class AnalysisWatcher:
+    """
+    Turns Docker events into low-priority background reports, so the expensive parts (history, layer
+    export, Trivy scan, AI call) are cached before anyone opens the report. New image digests and new
+    container configurations are queued once each; restarts and re-tags of known digests are not.
+    """
+
+    def __init__(self, enabled: bool = ANALYSIS_WATCHER == "on", jobs=job_manager, events=docker_events, build=None):
+        self.enabled = enabled
+        self.jobs = jobs
+        self._build = build or build_report
+        self._seen = OrderedDict()  # dedupe key -> job ID, most recent last
+        self._lock = threading.Lock()
+        self._events = queue.Queue(maxsize=WATCHER_EVENT_BACKLOG)
+        self._worker = None
+        if enabled:
+            events.subscribe(self._on_event)
+
+    def _on_event(self, event: dict):
+        action = (event.get("Action") or "").split(":")[0]
+        if event.get("Type") == "image" and action in IMAGE_ACTIONS:
+            kind = "image"
+        elif event.get("Type") == "container" and action == "start":
+            kind = "container"
+        else:
+            return
+        # Inspecting blocks on the daemon; one worker does it so the shared events thread stays free
+        try:
+            self._events.put_nowait((kind, event))
+        except queue.Full:
+            watcher_events_total.inc(kind=kind, outcome="dropped")
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="analysis-watcher", daemon=True)
+                self._worker.start()
+
+    def _work(self):
+        while True:
+            self._handle(*self._events.get())
+
+    def _handle(self, kind: str, event: dict):
+        try:
+            outcome = self.handle(kind, (event.get("Actor") or {}).get("ID") or event.get("id"))
+        except Exception as e:
+            print(f"Analysis watcher failed on {kind} event: {e}")
+            outcome = "error"
+        watcher_events_total.inc(kind=kind, outcome=outcome)
+
+    @reporting_failures()
+    def handle(self, kind: str, object_id: str):
+        """Queues a background report for an image or container unless it was already analyzed."""
+        client = get_docker_client()
+        if kind == "image":
+            attrs = client.api.inspect_image(object_id)
+            tags = attrs.get("RepoTags") or []
+            if not tags:
+                return "skipped"  # dangling build intermediates
+            key = ("image", attrs["Id"])
+            image, container_id, params = tags[0], None, {"image": tags[0], "image_id": attrs["Id"]}
+        else:
+            attrs = client.api.inspect_container(object_id)
+            key = ("container", container_fingerprint(attrs))
+            image, container_id = attrs["Config"]["Image"], attrs["Id"]
+            params = {"image": image, "id": container_id[:12]}
+
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return "unchanged"
+            self._seen[key] = None  # claimed; concurrent events for the same object stop here
+            while len(self._seen) > WATCHER_MAX_TRACKED:
+                self._seen.popitem(last=False)
+
+        if self.jobs.stats()["queued"] >= self.jobs.max_queue * WATCHER_QUEUE_SHARE:
+            self._forget(key)  # picked up again by the next event for this object
+            return "queue_full"
+        try:
+            job = self.jobs.submit(
+                f"watch-{kind}-report",
+                lambda on_section: self._report(key, image, container_id, on_section),
+                params=params,
+                priority=WATCHER_JOB_PRIORITY,
+            )
+        except QueueFullError:
+            self._forget(key)
+            return "queue_full"
+        with self._lock:
+            self._seen[key] = job["id"]
+        return "queued"
+
+    def _forget(self, key):
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def _report(self, key, image: str, container_id: str, on_section):
+        try:
+            return self._build(image, container_id=container_id, on_section=on_section, ai_priority=PRIORITY_BACKGROUND)
+        except Exception:
+            self._forget(key)  # retried on the next event for this object
+            raise
+
+    def status(self):
+        with self._lock:
+            recent = list(self._seen.items())[-20:]
+        return {
+            "enabled": self.enabled,
+            "backlog": self._events.qsize(),
+            "tracked": len(self._seen),
+            "recent": [{"kind": key[0], "key": key[1], "job_id": job_id} for key, job_id in reversed(recent)],
+        }
+
+
+analysis_watcher = AnalysisWatcher()
@@ -0,0 +1,284 @@
+import json
+import re
+from app.core.dockerfile_analyzer import parse_instructions, parse_from
+
+# In-process checks modelled on Trivy's Dockerfile checks (AVD-DS-*), with the same IDs and severities,
+# so the common misconfigurations no longer need a `trivy config` process per request.
+# tests/test_dockerfile_checks.py compares them with recorded `trivy config` output when available.
+# Bump when a check is added or changed so cached reports are recomputed.
+CHECKS_VERSION = "1"
+
+CHECKS = {
+    "DS001": ("MEDIUM", "':latest' tag used",
+              "When using a 'FROM' statement you should use a specific tag to avoid uncontrolled behavior when the image is updated.",
+              "Add a tag to the image in the 'FROM' statement"),
+    "DS002": ("HIGH", "Image user should not be 'root'",
+              "Running containers with 'root' user can lead to a container escape situation. It is a best practice to run containers as non-root users, which can be done by adding a 'USER' statement to the Dockerfile.",
+              "Add 'USER <non root user name>' line to the Dockerfile"),
+    "DS004": ("MEDIUM", "Port 22 exposed",
+              "Exposing port 22 might allow users to SSH into the container.",
+              "Remove 'EXPOSE 22' statement from the Dockerfile"),
+    "DS005": ("LOW", "ADD instead of COPY",
+              "You should use COPY instead of ADD unless you want to extract a tar file. Note that an ADD command will extract a tar file, which adds the risk of Zip-based vulnerabilities. Accordingly, it is advised to use a COPY command, which does not extract tar files.",
+              "Use COPY instead of ADD"),
+    "DS006": ("CRITICAL", "COPY '--from' referring to the current image",
+              "COPY '--from' should not mention the current FROM alias, since it is impossible to copy from itself.",
+              "Change the '--from' so that it will not refer to itself"),
+    "DS007": ("CRITICAL", "Multiple ENTRYPOINT instructions listed",
+              "There can only be one ENTRYPOINT instruction in a Dockerfile. Only the last ENTRYPOINT instruction in the Dockerfile will have an effect.",
+              "Remove unnecessary ENTRYPOINT instruction."),
+    "DS008": ("CRITICAL", "Exposed port out of range",
+              "UNIX ports outside the range 0-65535 are exposed.",
+              "Use port number within range"),
+    "DS009": ("HIGH", "WORKDIR path not absolute",
+              "For clarity and reliability, you should always use absolute paths for your WORKDIR.",
+              "Use absolute paths for your WORKDIR"),
+    "DS010": ("CRITICAL", "RUN using 'sudo'",
+              "Avoid using 'RUN' with 'sudo' commands, as it can lead to unpredictable behavior.",
+              "Don't use sudo"),
+    "DS011": ("CRITICAL", "COPY with more than two arguments not ending with slash",
+              "When a COPY command has more than two arguments, the last one should end with a slash.",
+              "Add slash to last COPY argument"),
+    "DS012": ("CRITICAL", "Duplicate aliases defined in different FROMs",
+              "Different FROMs can't have the same alias defined.",
+              "Change aliases to make them different"),
+    "DS013": ("MEDIUM", "'RUN cd ...' to change directory",
+              "Use WORKDIR instead of proliferating instructions like 'RUN cd … && do-something', which are hard to read, troubleshoot, and maintain.",
+              "Use WORKDIR to change directory"),
+    "DS014": ("LOW", "RUN using 'wget' and 'curl'",
+              "Avoid using both 'wget' and 'curl' since these tools have the same effect.",
+              "Pick one util and use it consistently"),
+    "DS015": ("HIGH", "'yum clean all' missing",
+              "You should use 'yum clean all' after using a 'yum install' command to clean package cached data and reduce image size.",
+              "Add 'yum clean all' to Dockerfile"),
+    "DS016": ("HIGH", "Multiple CMD instructions listed",
+              "There can only be one CMD instruction in a Dockerfile. If you list more than one CMD then only the last CMD will take effect.",
+              "Dockerfile should only have one CMD instruction. Remove all the other CMD instructions"),
+    "DS017": ("HIGH", "'RUN <package-manager> update' instruction alone",
+              "The instruction 'RUN <package-manager> update' should always be followed by '<package-manager> install' in the same RUN statement.",
+              "Combine '<package-manager> update' and '<package-manager> install' instructions to single one"),
+    "DS019": ("HIGH", "'dnf clean all' missing",
+              "Cached package data should be cleaned after installation to reduce image size.",
+              "Add 'dnf clean all' to Dockerfile"),
+    "DS020": ("HIGH", "'zypper clean' missing",
+              "The layer and image size should be reduced by deleting unneeded caches after running zypper.",
+              "Add 'zypper clean' to Dockerfile"),
+    "DS021": ("HIGH", "'apt-get' missing '-y' to avoid manual input",
+              "'apt-get' calls should use the flag '-y' to avoid manual user input.",
+              "Add '-y' flag to 'apt-get'"),
+    "DS022": ("HIGH", "Deprecated MAINTAINER used",
+              "MAINTAINER has been deprecated since Docker 1.13.0.",
+              "Use LABEL instead of MAINTAINER"),
+    "DS023": ("MEDIUM", "Multiple HEALTHCHECK defined",
+              "Providing more than one HEALTHCHECK instruction per stage is confusing and error-prone.",
+              "One HEALTHCHECK instruction must remain in Dockerfile. Remove all other instructions."),
+    "DS024": ("HIGH", "'apt-get dist-upgrade' used",
+              "'apt-get dist-upgrade' upgrades a major version so it doesn't make more sense in Dockerfile.",
+              "Just use different image"),
+    "DS025": ("HIGH", "'apk add' is missing '--no-cache'",
+              "You should use 'apk add' with '--no-cache' to clean package cached data and reduce image size.",
+              "Add '--no-cache' to 'apk add' in Dockerfile"),
+    "DS026": ("LOW", "No HEALTHCHECK defined",
+              "You should add HEALTHCHECK instruction in your docker container images to perform the health check on running containers.",
+              "Add HEALTHCHECK instruction in Dockerfile"),
+    "DS029": ("HIGH", "'apt-get' missing '--no-install-recommends'",
+              "'apt-get' install should use '--no-install-recommends' to minimize image size.",
+              "Add '--no-install-recommends' flag to 'apt-get'"),
+}
+
+_CHAIN_SPLIT_RE = re.compile(r"\s*(?:&&|\|\||;|\|)\s*")
+_WORKDIR_OK_RE = re.compile(r"^(/|[A-Za-z]:\\|\$)")
+_ARCHIVE_RE = re.compile(r"\.(tar|tar\.gz|tgz|tar\.bz2|tbz2?|tar\.xz|txz)$")
+
+
+def _finding(check_id: str, message: str, line: int = None):
+    severity, title, description, resolution = CHECKS[check_id]
+    return {
+        "id": check_id,
+        "avd_id": f"AVD-DS-{check_id[2:].zfill(4)}",
+        "title": title,
+        "message": message,
+        "severity": severity,
+        "description": description,
+        "resolution": resolution,
+        "line": line,
+    }
+
+
+def _args(value: str) -> list:
+    """Instruction arguments in either exec form (JSON array) or shell form, without --flags."""
+    value = value.strip()
+    if value.startswith("["):
+        try:
+            parsed = json.loads(value)
+            if isinstance(parsed, list):
+                return [str(a) for a in parsed]
+        except ValueError:
+            pass
+    return [a for a in value.split() if not a.startswith("--")]
+
+
+def _flag(value: str, name: str):
+    match = re.search(rf"--{name}=(\S+)", value)
+    return match.group(1) if match else None
+
+
+def _commands(value: str) -> list:
+    """Splits a RUN value into its chained shell commands."""
+    value = value.strip()
+    if value.startswith("["):
+        args = _args(value)
+        if len(args) >= 3 and args[1] == "-c":
+            value = args[2]
+        else:
+            value = " ".join(args)
+    return [c.strip() for c in _CHAIN_SPLIT_RE.split(value) if c.strip()]
+
+
+def _words(command: str) -> list:
+    return command.split()
+
+
+def _invokes(command: str, *program: str) -> bool:
+    """True if the command runs `program ...`, ignoring a leading sudo and VAR=value assignments."""
+    words = _words(command)
+    while words and (words[0] == "sudo" or re.match(r"^[A-Za-z_][A-Za-z0-9_]*=", words[0])):
+        words = words[1:]
+    return words[:len(program)] == list(program)
+
+
+def _assumes_yes(words: list) -> bool:
+    for w in words:
+        if w in ("--yes", "--assume-yes", "-qq", "-q=2"):
+            return True
+        if w.startswith("-") and not w.startswith("--") and "y" in w:
+            return True
+    return False
+
+
+def run_dockerfile_checks(content: str) -> list:
+    """Runs every check against the Dockerfile and returns findings sorted by line."""
+    instructions = parse_instructions(content)
+    findings = []
+
+    stages = {}   # stage index -> {"alias", "instructions"}
+    for inst in instructions:
+        if inst["instruction"] == "FROM":
+            stages[inst["stage"]] = {"from": inst, "alias": parse_from(inst["value"])["name"], "instructions": []}
+        elif inst["stage"] in stages:
+            stages[inst["stage"]]["instructions"].append(inst)
+    aliases = {s["alias"].lower() for s in stages.values() if s["alias"]}
+
+    # --- FROM ---
+    seen_aliases = {}
+    for stage in stages.values():
+        inst = stage["from"]
+        image = parse_from(inst["value"])["base"]
+        name = image.rsplit("/", 1)[-1]
+        tag = name.split(":", 1)[1] if ":" in name else None
+        is_reference = image.lower() in aliases or image == "scratch" or "$" in image or "@" in image
+        if not is_reference and (tag is None or tag == "latest"):
+            repository = image[:-(len(tag) + 1)] if tag else image
+            findings.append(_finding("DS001", f"Specify a tag in the 'FROM' statement for image '{repository}'", inst["line"]))
+
+        alias = stage["alias"]
+        if alias:
+            if alias.lower() in seen_aliases:
+                findings.append(_finding("DS012", f"Duplicate aliases '{alias}' are found in different FROMs", inst["line"]))
+            seen_aliases[alias.lower()] = inst["line"]
+
+    # --- Per-stage instruction counts ---
+    for stage in stages.values():
+        for instr, check_id, label in (("ENTRYPOINT", "DS007", "ENTRYPOINT"), ("CMD", "DS016", "CMD"),
+                                       ("HEALTHCHECK", "DS023", "HEALTHCHECK")):
+            listed = [i for i in stage["instructions"] if i["instruction"] == instr]
+            for extra in listed[1:]:
+                findings.append(_finding(check_id, f"There are {len(listed)} duplicate {label} instructions", extra["line"]))
+
+    # --- Individual instructions ---
+    uses_curl = uses_wget = None
+    for inst in instructions:
+        instr, value, line = inst["instruction"], inst["value"], inst["line"]
+
+        if instr == "MAINTAINER":
+            findings.append(_finding("DS022", f"MAINTAINER should not be used: 'MAINTAINER {value}'", line))
+
+        elif instr == "EXPOSE":
+            for port in _args(value):
+                number = port.split("/")[0]
+                if not number.isdigit():
+                    continue  # ranges and variables are left to the engine
+                if int(number) == 22:
+                    findings.append(_finding("DS004", "Port 22 should not be exposed in Dockerfile", line))
+                elif int(number) > 65535:
+                    findings.append(_finding("DS008", f"'EXPOSE' contains port which is out of range [0, 65535]: {number}", line))
+
+        elif instr == "WORKDIR":
+            path = value.strip().strip('"').strip("'")
+            if not _WORKDIR_OK_RE.match(path):
+                findings.append(_finding("DS009", f"WORKDIR path '{path}' should be absolute", line))
+
+        elif instr == "ADD":
+            args = _args(value)
+            if not any(_ARCHIVE_RE.search(a) for a in args[:-1]):
+                findings.append(_finding("DS005", f"Consider using 'COPY {' '.join(args)}' command instead of 'ADD {' '.join(args)}'", line))
+
+        elif instr == "COPY":
+            source = _flag(value, "from")
+            current = stages.get(inst["stage"], {}).get("alias")
+            if source and current and source.lower() == current.lower():
+                findings.append(_finding("DS006", f"'COPY --from' should not mention current alias '{current}' since it is impossible to copy from itself", line))
+            args = _args(value)
+            if len(args) > 2 and not args[-1].endswith("/"):
+                findings.append(_finding("DS011", f"Slash is expected at the end of COPY command argument '{args[-1]}'", line))
+
+        elif instr == "RUN":
+            commands = _commands(value)
+            for command in commands:
+                words = _words(command)
+                if words and words[0] == "sudo":
+                    findings.append(_finding("DS010", "Using 'sudo' in Dockerfile should be avoided", line))
+                if words and words[0] == "cd":
+                    findings.append(_finding("DS013", f"RUN should not be used to change directory: '{command}'. Use 'WORKDIR' statement instead.", line))
+                if words and words[0] == "curl" and uses_curl is None:
+                    uses_curl = line
+                if words and words[0] == "wget" and uses_wget is None:
+                    uses_wget = line
+
+                if _invokes(command, "apt-get") and "install" in words:
+                    if not _assumes_yes(words):
+                        findings.append(_finding("DS021", f"'-y' flag is missed: '{command}'", line))
+                    if "--no-install-recommends" not in words:
+                        findings.append(_finding("DS029", f"'--no-install-recommends' flag is missed: '{command}'", line))
+                if _invokes(command, "apt-get") and ("dist-upgrade" in words):
+                    findings.append(_finding("DS024", "'apt-get dist-upgrade' should not be used in Dockerfile", line))
+                if _invokes(command, "apk", "add") and "--no-cache" not in words:
+                    findings.append(_finding("DS025", f"'--no-cache' is missed: {command}", line))
+
+            text = " && ".join(commands)
+            for manager, installs, cleans, check_id in (("yum", ("install",), ("yum clean all",), "DS015"),
+                                                        ("dnf", ("install",), ("dnf clean all",), "DS019"),
+                                                        ("zypper", ("install", "in"), ("zypper clean", "zypper cc"), "DS020")):
+                if any(_invokes(c, manager, op) for c in commands for op in installs) and not any(cl in text for cl in cleans):
+                    findings.append(_finding(check_id, f"'{cleans[0]}' is missed: {value}", line))
+
+            for manager in ("apt-get", "apt", "apk", "yum", "dnf", "zypper"):
+                updates = any(_invokes(c, manager, "update") for c in commands)
+                installs = any(_invokes(c, manager, op) for c in commands for op in ("install", "add", "in", "upgrade"))
+                if updates and not installs:
+                    findings.append(_finding("DS017", f"The instruction 'RUN {manager} update' should always be followed by '{manager} install' in the same RUN statement.", line))
+
+    if uses_curl and uses_wget:
+        findings.append(_finding("DS014", "Shouldn't use both curl and wget", max(uses_curl, uses_wget)))
+
+    # --- Whole-file checks ---
+    users = [i for i in instructions if i["instruction"] == "USER"]
+    if not users:
+        findings.append(_finding("DS002", "Specify at least 1 USER command in Dockerfile with non-root user as argument"))
+    elif users[-1]["value"].split(":")[0].strip() == "root":
+        findings.append(_finding("DS002", "Last USER command in Dockerfile should not be 'root'", users[-1]["line"]))
+
+    if stages and not any(i["instruction"] == "HEALTHCHECK" for i in instructions):
+        findings.append(_finding("DS026", "Add HEALTHCHECK instruction in your Dockerfile"))
+
+    return sorted(findings, key=lambda f: (f["line"] or 0, f["id"]))
@@ -1,3 +1,7 @@
+# Bump whenever a rule is added or changed so cached reports are recomputed
+RULESET_VERSION = "3"
+
+
 def analyze_misconfig(image_analysis: dict, runtime_analysis: dict):
     """
     Detect Docker image misconfigurations and bad practices.
@@ -147,13 +151,41 @@ def analyze_misconfig(image_analysis: dict, runtime_analysis: dict):
                 "recommendation": "Use bridge network or custom overlay networks for isolation."
             })
 
-        # Resource Limits
+        # Resource Limits (sized from observed usage when the stats collector has enough samples)
+        sizing = runtime_analysis.get("rightsizing") or {}
+        memory = sizing.get("memory", {}) if sizing.get("status") == "ok" else {}
+        cpu = sizing.get("cpu", {}) if sizing.get("status") == "ok" else {}
         if inst.get("memory_limit") == 0:
             issues.append({
                 "id": "RUNTIME_NO_MEMORY_LIMIT",
                 "severity": "MEDIUM",
                 "message": "No memory limit set for active container",
-                "recommendation": "Set --memory limit to prevent OOM on host."
+                "recommendation": (f"Set --memory {memory['recommended_limit_mb']:.0f}m "
+                                   f"(observed max {sizing['observed']['memory_mb']['max']:.0f} MB plus headroom) to prevent OOM on host."
+                                   if memory else "Set --memory limit to prevent OOM on host.")
+            })
+        if memory.get("action") == "increase":
+            issues.append({
+                "id": "RUNTIME_MEMORY_NEAR_LIMIT",
+                "severity": "HIGH",
+                "message": (f"Memory usage peaked at {sizing['observed']['memory_mb']['max']:.0f} MB, "
+                            f"{sizing['observed']['memory_mb']['max'] / memory['current_limit_mb']:.0%} of the "
+                            f"{memory['current_limit_mb']:.0f} MB limit"),
+                "recommendation": f"Raise --memory to {memory['recommended_limit_mb']:.0f}m or reduce the workload's footprint."
+            })
+        overprovisioned = []
+        if memory.get("action") == "reduce":
+            overprovisioned.append(f"memory {memory['current_limit_mb']:.0f} MB -> {memory['recommended_limit_mb']:.0f} MB")
+        if cpu.get("action") == "reduce":
+            overprovisioned.append(f"CPU {cpu['current_limit_cores']} -> {cpu['recommended_limit_cores']} cores")
+        if cpu.get("cpu_shares"):
+            overprovisioned.append(f"cpu-shares {cpu['cpu_shares']['current']} -> {cpu['cpu_shares']['recommended']}")
+        if overprovisioned:
+            issues.append({
+                "id": "RUNTIME_OVERPROVISIONED",
+                "severity": "LOW",
+                "message": f"Resource limits far above observed usage ({'; '.join(overprovisioned)})",
+                "recommendation": "Lower the limits to the recommended values to pack more workloads per host."
             })
         
         # Volume Inefficiencies & Sensitive Mounts
@@ -0,0 +1,138 @@
+import math
+import os
+from app.docker.client import reporting_failures
+from app.core.container_inventory import container_inventory
+from app.core.stats_collector import stats_collector
+
+# Usage window the recommendations are based on (the collector keeps an hour by default)
+RIGHTSIZE_WINDOW_SECONDS = float(os.getenv("RIGHTSIZE_WINDOW_SECONDS", "3600"))
+# Fewer samples than this (one minute at the default interval) is not enough to size anything
+RIGHTSIZE_MIN_SAMPLES = int(os.getenv("RIGHTSIZE_MIN_SAMPLES", "12"))
+# Memory is sized from the observed max (running out means an OOM kill), CPU from p95 (running out means throttling)
+MEMORY_HEADROOM = 1.3
+CPU_HEADROOM = 1.5
+MEMORY_STEP_MB = 32
+MIN_MEMORY_MB = 64
+CPU_STEP = 0.1
+# Usage at this share of a limit counts as near it. Memory rarely records a sample at the limit itself:
+# the kernel reclaims or OOM-kills first.
+NEAR_LIMIT_RATIO = 0.9
+# A limit this many times above the recommendation is flagged as over-provisioned
+OVERPROVISION_FACTOR = 2.0
+DEFAULT_CPU_SHARES = 1024
+
+
+def _round_up(value: float, step: float) -> float:
+    return round(math.ceil(value / step - 1e-9) * step, 2)
+
+
+def instance_limits(host_config: dict) -> dict:
+    """Memory limit (MB) and CPU limit (cores) from a container's HostConfig; None means unlimited."""
+    memory = host_config.get("Memory") or 0
+    cores = None
+    if host_config.get("NanoCpus"):
+        cores = host_config["NanoCpus"] / 1e9
+    elif host_config.get("CpuQuota", 0) > 0:
+        cores = host_config["CpuQuota"] / (host_config.get("CpuPeriod") or 100000)
+    return {
+        "memory_limit_mb": round(memory / (1024 * 1024), 2) if memory else None,
+        "cpu_limit_cores": round(cores, 2) if cores else None,
+        "cpu_shares": host_config.get("CpuShares") or 0,
+    }
+
+
+def recommend(history: dict, limits: dict):
+    """
+    Right-sizing for one container from collector history (p50/p95/max) and its current limits.
+    Actions: "set" (no limit), "reduce" (limit far above need), "increase" (observed max for memory, p95 for
+    CPU, within NEAR_LIMIT_RATIO of the limit) or "keep".
+    """
+    if not history or history["sample_count"] < RIGHTSIZE_MIN_SAMPLES:
+        return {
+            "status": "insufficient_data",
+            "sample_count": history["sample_count"] if history else 0,
+            "min_samples": RIGHTSIZE_MIN_SAMPLES,
+        }
+
+    memory, cpu = history["memory_mb"], history["cpu_percent"]
+
+    memory_limit = limits.get("memory_limit_mb")
+    recommended_mb = max(MIN_MEMORY_MB, _round_up(memory["max"] * MEMORY_HEADROOM, MEMORY_STEP_MB))
+    if memory_limit is None:
+        memory_action = "set"
+    elif memory["max"] >= memory_limit * NEAR_LIMIT_RATIO:
+        memory_action = "increase"
+    elif memory_limit > recommended_mb * OVERPROVISION_FACTOR:
+        memory_action = "reduce"
+    else:
+        memory_action = "keep"
+
+    cpu_limit = limits.get("cpu_limit_cores")
+    recommended_cores = max(CPU_STEP, _round_up(cpu["p95"] / 100 * CPU_HEADROOM, CPU_STEP))
+    if cpu_limit is None:
+        cpu_action = "set"
+    elif cpu["p95"] / 100 >= cpu_limit * NEAR_LIMIT_RATIO:
+        cpu_action = "increase"
+    elif cpu_limit > recommended_cores * OVERPROVISION_FACTOR:
+        cpu_action = "reduce"
+    else:
+        cpu_action = "keep"
+
+    result = {
+        "status": "ok",
+        "window_seconds": history["window_seconds"],
+        "sample_count": history["sample_count"],
+        "observed": {"memory_mb": memory, "cpu_percent": cpu},
+        "memory": {
+            "current_limit_mb": memory_limit,
+            "recommended_limit_mb": recommended_mb,
+            "action": memory_action,
+            "over_provisioned_mb": round(memory_limit - recommended_mb, 2) if memory_action == "reduce" else 0,
+        },
+        "cpu": {
+            "current_limit_cores": cpu_limit,
+            "recommended_limit_cores": recommended_cores,
+            "action": cpu_action,
+            "over_provisioned_cores": round(cpu_limit - recommended_cores, 2) if cpu_action == "reduce" else 0,
+        },
+    }
+    # Shares only weigh containers against each other under contention; a large weight on a mostly idle
+    # container lets it crowd out busier neighbours when they do contend.
+    shares = limits.get("cpu_shares") or 0
+    if shares > DEFAULT_CPU_SHARES and cpu["p95"] < 50:
+        result["cpu"]["cpu_shares"] = {"current": shares, "recommended": DEFAULT_CPU_SHARES}
+    return result
+
+
+def rightsize_container(container_id: str, host_config: dict, window_seconds: float = RIGHTSIZE_WINDOW_SECONDS):
+    """Recommendation for one container from the background stats collector's samples."""
+    return recommend(stats_collector.history(container_id, window_seconds), instance_limits(host_config))
+
+
+def summarize(recommendations: list) -> dict:
+    """Aggregate savings and counts over per-container recommendations."""
+    sized = [r for r in recommendations if r["rightsizing"]["status"] == "ok"]
+    return {
+        "containers": len(recommendations),
+        "sized": len(sized),
+        "over_provisioned_memory_mb": round(sum(r["rightsizing"]["memory"]["over_provisioned_mb"] for r in sized), 2),
+        "over_provisioned_cores": round(sum(r["rightsizing"]["cpu"]["over_provisioned_cores"] for r in sized), 2),
+        "without_memory_limit": sum(1 for r in sized if r["rightsizing"]["memory"]["action"] == "set"),
+        "without_cpu_limit": sum(1 for r in sized if r["rightsizing"]["cpu"]["action"] == "set"),
+        "near_limit": sum(1 for r in sized if "increase" in (r["rightsizing"]["memory"]["action"], r["rightsizing"]["cpu"]["action"])),
+    }
+
+
+@reporting_failures()
+def rightsize_all(window_seconds: float = RIGHTSIZE_WINDOW_SECONDS):
+    """Recommendations for every running container, plus fleet totals."""
+    recommendations = []
+    # Limits from the inventory snapshot: containers are only inspected the first time they are seen
+    for summary, host_config in container_inventory.running_limits():
+        names = summary.get("Names") or []
+        recommendations.append({
+            "id": summary["Id"][:12],
+            "name": names[0].lstrip("/") if names else summary["Id"][:12],
+            "rightsizing": rightsize_container(summary["Id"], host_config, window_seconds),
+        })
+    return {"containers": recommendations, "totals": summarize(recommendations)}
@@ -1,6 +1,12 @@
-from app.docker.client import get_docker_client
+from app.docker.client import get_docker_client, reporting_failures
+from app.core.cache import TTLCache
+from app.core.analyzers.rightsizing_analyzer import rightsize_container
 import docker
 
+# Image-level runtime metadata keyed by image ID (digest)
+runtime_metadata_cache = TTLCache("runtime_metadata", max_entries=256, ttl_seconds=86400)
+
+@reporting_failures()
 def analyze_runtime(image_ref: str, container_id: str = None):
     client = get_docker_client()
 
@@ -11,12 +17,18 @@ def analyze_runtime(image_ref: str, container_id: str = None):
         # fallback: try without tag
         image = client.images.get(image_ref.split(":")[0])
 
-    cfg = image.attrs.get("Config", {})
-    user = cfg.get("User", "root")
-    runs_as_root = user in ["", "0", "root"]
+    metadata = runtime_metadata_cache.get(image.id)
+    if metadata is None:
+        cfg = image.attrs.get("Config", {})
+        user = cfg.get("User", "root")
+        metadata = {"user": user, "runs_as_root": user in ["", "0", "root"]}
+        runtime_metadata_cache.set(image.id, metadata)
+    user = metadata["user"]
+    runs_as_root = metadata["runs_as_root"]
 
     # 2. Container Instance Analysis (Deep Inspection)
     instance_info = {}
+    rightsizing = None
     if container_id:
         try:
             container = client.containers.get(container_id)
@@ -34,11 +46,14 @@ def analyze_runtime(image_ref: str, container_id: str = None):
                 "mounts": attrs.get("Mounts") or [],
                 "env": config.get("Env") or []
             }
+            # Limits sized from the background collector's observed usage
+            rightsizing = rightsize_container(container.id, host_config)
         except Exception as e:
             print(f"Error inspecting container instance: {e}")
 
     return {
         "user": user,
         "runs_as_root": runs_as_root,
-        "instance": instance_info
+        "instance": instance_info,
+        "rightsizing": rightsizing,
     }
@@ -1,20 +1,55 @@
-from app.core.security_scanner import scan_image, scan_dockerfile
+import os
+from app.core.security_scanner import scan_image, scan_dockerfile, scan_dockerfiles, get_trivy_version_info
+from app.core.image_analyzer import resolve_image_id
+from app.core.cache import TTLCache, make_key
+from app.core.analyzers.dockerfile_checks import run_dockerfile_checks
+
+# In-process Dockerfile checks (analyzers/dockerfile_checks.py). Off until their parity with `trivy config` is
+# shown by recorded fixtures (tests/scenarios/trivy); until then `trivy config` is the Dockerfile engine.
+DOCKERFILE_NATIVE_CHECKS = os.getenv("DOCKERFILE_NATIVE_CHECKS", "false").lower() in ("1", "true", "yes")
+# With the native checks on, also run `trivy config` for every static report
+TRIVY_CONFIG_DEEP = os.getenv("TRIVY_CONFIG_DEEP", "false").lower() in ("1", "true", "yes")
+
+# Trivy image results keyed by image digest + Trivy/vulnerability DB version,
+# so a moved tag or a DB update automatically triggers a fresh scan.
+image_scan_cache = TTLCache(
+    "trivy_image_scan",
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "128")),
+    ttl_seconds=float(os.getenv("TRIVY_CACHE_TTL_SECONDS", "86400")),
+)
+
+# Trivy config results keyed by the exact Dockerfile content (findings carry line numbers).
+# Also lets a scan that outlived a caller's time budget be served on the next request.
+dockerfile_scan_cache = TTLCache(
+    "trivy_config_scan",
+    max_entries=int(os.getenv("DOCKERFILE_SCAN_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("TRIVY_CACHE_TTL_SECONDS", "86400")),
+)
 
 
 def analyze_security(image_name: str):
+    image_id = resolve_image_id(image_name)
+    if not image_id:
+        return _analyze_image_security(image_name)
+
+    # Concurrent requests for the same digest share one Trivy scan
+    cache_key = make_key("trivy_image_scan", image_id, get_trivy_version_info())
+    return image_scan_cache.get_or_compute(
+        cache_key, lambda: _analyze_image_security(image_name), should_cache=lambda r: r["status"] == "ok"
+    )
+
+
+def _analyze_image_security(image_name: str):
     try:
+        # Compact records streamed from Results[].Vulnerabilities, counted while parsing
         scan = scan_image(image_name)
-        vulnerabilities = scan.get("vulnerabilities", [])
-
-        severity_count = {}
-        for v in vulnerabilities:
-            sev = v.get("severity", "UNKNOWN")
-            severity_count[sev] = severity_count.get(sev, 0) + 1
+        vulnerabilities = scan["vulnerabilities"]
 
         return {
             "status": "ok",
+            "scan_id": scan["scan_id"],
             "total_vulnerabilities": len(vulnerabilities),
-            "by_severity": severity_count,
+            "by_severity": scan["by_severity"],
             "vulnerabilities": vulnerabilities,
         }
 
@@ -27,47 +62,133 @@ def analyze_security(image_name: str):
             "vulnerabilities": [],
         }
 
-def analyze_dockerfile_security(content: str):
+def dockerfile_engines(deep: bool = None) -> tuple:
+    """Engines a Dockerfile scan runs: `trivy config`, or the native checks plus `trivy config` in deep mode."""
+    if not DOCKERFILE_NATIVE_CHECKS:
+        return ("trivy",)
+    return ("native", "trivy") if (TRIVY_CONFIG_DEEP if deep is None else deep) else ("native",)
+
+def analyze_dockerfile_security(content: str, deep: bool = None):
     """
-    Analyzes security of a Dockerfile using Trivy config scan.
+    Analyzes security of a Dockerfile with `trivy config`.
+    With DOCKERFILE_NATIVE_CHECKS on, the in-process checks modelled on Trivy's DS rules run instead (milliseconds),
+    and deep mode adds `trivy config` for what they do not cover (e.g. secrets).
     Returns findings in a format consistent with analyze_security.
     """
+    return _dockerfile_security(content, _trivy_config_security(content) if "trivy" in dockerfile_engines(deep) else None)
+
+def _dockerfile_security(content: str, trivy: dict = None):
+    """Native check results when enabled, plus `trivy config` results when given; engines records each engine's status."""
+    vulnerabilities = []
+    engines = {}
+
+    if DOCKERFILE_NATIVE_CHECKS:
+        vulnerabilities = [
+            {k: f[k] for k in ("id", "title", "severity", "description", "resolution", "line")}
+            for f in run_dockerfile_checks(content)
+        ]
+        engines["native"] = "ok"
+
+    if trivy is not None:
+        engines["trivy"] = trivy["status"]
+        native_ids = {v["id"] for v in vulnerabilities}
+        vulnerabilities += [v for v in trivy["vulnerabilities"] if v["id"] not in native_ids]
+
+    severity_count = {}
+    for v in vulnerabilities:
+        severity_count[v["severity"]] = severity_count.get(v["severity"], 0) + 1
+
+    result = {
+        "status": "ok" if "ok" in engines.values() else "error",
+        "engines": engines,
+        "total_vulnerabilities": len(vulnerabilities),
+        "by_severity": severity_count,
+        "vulnerabilities": vulnerabilities,
+    }
+    if result["status"] == "error":
+        result["error"] = trivy["error"]
+    return result
+
+def analyze_dockerfiles_security(contents: dict, deep: bool = None):
+    """
+    Batch form of analyze_dockerfile_security for several Dockerfiles (monorepos, org audits).
+    Every uncached file goes through one `trivy config` run over a shared temp tree.
+    contents: key -> Dockerfile content. Returns key -> result.
+    """
+    trivy = _trivy_config_batch(contents) if "trivy" in dockerfile_engines(deep) else {}
+    return {key: _dockerfile_security(content, trivy.get(key)) for key, content in contents.items()}
+
+def _trivy_config_batch(contents: dict):
+    """key -> `trivy config` result, scanning every uncached file in one run. Failures are not cached."""
+    version = get_trivy_version_info()
+    cache_keys = {key: make_key("trivy_config_scan", content, version) for key, content in contents.items()}
+    results, missing = {}, {}
+    for key, cache_key in cache_keys.items():
+        cached = dockerfile_scan_cache.get(cache_key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            missing[cache_key] = contents[key]
+    if not missing:
+        return results
+
     try:
-        scan = scan_dockerfile(content)
-        results = scan.get("Results", [])
-        
-        vulnerabilities = []
-        severity_count = {}
+        scans = {cache_key: _config_scan_result(scan) for cache_key, scan in scan_dockerfiles(missing).items()}
+    except Exception as e:
+        print(f"Dockerfile Security Analysis Error: {e}")
+        failed = _config_scan_error(e)
+        return {key: results.get(key, failed) for key in contents}
+    for cache_key, result in scans.items():
+        dockerfile_scan_cache.set(cache_key, result)
+    return {key: results.get(key) or scans[cache_keys[key]] for key in contents}
+
+def _trivy_config_security(content: str):
+    cache_key = make_key("trivy_config_scan", content, get_trivy_version_info())
+    return dockerfile_scan_cache.get_or_compute(
+        cache_key, lambda: _analyze_dockerfile_security(content), should_cache=lambda r: r["status"] == "ok"
+    )
+
+def _config_scan_result(scan: dict):
+    """Summarizes one file's `trivy config` results in the analyze_security format."""
+    vulnerabilities = []
+    severity_count = {}
 
-        for result in results:
-            # Trivy 'config' scan returns Misconfigurations and Secrets
-            misconfigs = result.get("Misconfigurations", [])
-            secrets = result.get("Secrets", [])
+    for result in scan.get("Results", []):
+        # Trivy 'config' scan returns Misconfigurations and Secrets
+        misconfigs = result.get("Misconfigurations") or []
+        secrets = result.get("Secrets") or []
+        
+        for m in misconfigs + secrets:
+            sev = m.get("Severity", "UNKNOWN")
+            severity_count[sev] = severity_count.get(sev, 0) + 1
             
-            for m in misconfigs + secrets:
-                sev = m.get("Severity", "UNKNOWN")
-                severity_count[sev] = severity_count.get(sev, 0) + 1
-                
-                vulnerabilities.append({
-                    "id": m.get("ID") or m.get("RuleID"),
-                    "title": m.get("Title") or m.get("Message"),
-                    "severity": sev,
-                    "description": m.get("Description", ""),
-                    "resolution": m.get("Resolution", "")
-                })
+            vulnerabilities.append({
+                "id": m.get("ID") or m.get("RuleID"),
+                "title": m.get("Title") or m.get("Message"),
+                "severity": sev,
+                "description": m.get("Description", ""),
+                "resolution": m.get("Resolution", "")
+            })
 
-        return {
-            "status": "ok",
-            "total_vulnerabilities": len(vulnerabilities),
-            "by_severity": severity_count,
-            "vulnerabilities": vulnerabilities,
-        }
+    return {
+        "status": "ok",
+        "total_vulnerabilities": len(vulnerabilities),
+        "by_severity": severity_count,
+        "vulnerabilities": vulnerabilities,
+    }
+
+def _config_scan_error(e: Exception):
+    return {
+        "status": "error",
+        "error": str(e),
+        "total_vulnerabilities": 0,
+        "by_severity": {},
+        "vulnerabilities": [],
+    }
+
+def _analyze_dockerfile_security(content: str):
+    try:
+        return _config_scan_result(scan_dockerfile(content))
     except Exception as e:
         print(f"Dockerfile Security Analysis Error: {e}")
-        return {
-            "status": "error",
-            "error": str(e),
-            "total_vulnerabilities": 0,
-            "by_severity": {},
-            "vulnerabilities": [],
-        }
+        return _config_scan_error(e)
@@ -0,0 +1,226 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from app.core.singleflight import SingleFlight
+
+_registry = []
+
+
+def _get_or_compute(cache, key: str, compute, should_cache=None):
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    def _compute_and_store():
+        value = compute()
+        if should_cache is None or should_cache(value):
+            try:
+                cache.set(key, value)
+            except OSError as e:
+                print(f"{cache.name} cache write failed: {e}")
+        return value
+
+    return cache.flight.do(key, _compute_and_store)
+
+
+class TTLCache:
+    """
+    Thread-safe in-memory LRU cache with per-entry TTL and a bounded number of entries.
+    Values are deep-copied on the way in and out so callers can mutate what they get back.
+    """
+
+    def __init__(self, name: str, max_entries: int = 256, ttl_seconds: float = 3600):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flight = SingleFlight(name)
+        _registry.append(self)
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value, ttl_seconds: float = None):
+        value = copy.deepcopy(value)
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: str, compute, should_cache=None):
+        """
+        Returns the cached value, or runs `compute()` once for all concurrent callers missing the same key
+        and caches the result (unless `should_cache(result)` is false).
+        """
+        return _get_or_compute(self, key, compute, should_cache)
+
+    def invalidate(self, key: str = None):
+        """Drops one key, or everything when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "in_flight": self.flight.in_flight(),
+            }
+
+
+class DiskCache:
+    """
+    JSON-file cache that survives restarts: one file per key under `directory`.
+    Entries expire after `ttl_seconds`; beyond `max_entries` the least recently used files are evicted.
+    """
+
+    def __init__(self, name: str, directory: str, max_entries: int = 500, ttl_seconds: float = 7 * 86400):
+        self.name = name
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flight = SingleFlight(name)
+        _registry.append(self)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            self._remove(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Refresh mtime so eviction is least-recently-used rather than oldest-written
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return entry["value"]
+
+    def set(self, key: str, value):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"created_at": time.time(), "value": value}, f)
+        os.replace(tmp_path, path)  # atomic, so readers never see a partial file
+        self._evict()
+
+    def get_or_compute(self, key: str, compute, should_cache=None):
+        """
+        Same as TTLCache.get_or_compute; a failed write leaves the value uncached.
+        """
+        return _get_or_compute(self, key, compute, should_cache)
+
+    def purge(self) -> int:
+        """Deletes every entry; returns how many were removed."""
+        removed = 0
+        for path in self._files():
+            if self._remove(path):
+                removed += 1
+        return removed
+
+    def _files(self):
+        try:
+            return [os.path.join(self.directory, n) for n in os.listdir(self.directory) if n.endswith(".json")]
+        except OSError:
+            return []
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def _evict(self):
+        files = self._files()
+        if len(files) <= self.max_entries:
+            return
+        with_mtime = []
+        for path in files:
+            try:
+                with_mtime.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        with_mtime.sort()
+        for _, path in with_mtime[:len(with_mtime) - self.max_entries]:
+            if self._remove(path):
+                with self._lock:
+                    self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        return {
+            "name": self.name,
+            "entries": len(self._files()),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": round(hits / lookups, 3) if lookups else 0.0,
+            "in_flight": self.flight.in_flight(),
+        }
+
+
+def make_key(*parts) -> str:
+    """Builds a stable sha256 key from JSON-serializable parts."""
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def all_cache_stats():
+    return [c.stats() for c in _registry]
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from app.docker.client import get_docker_client, reporting_failures
+from app.docker.events import docker_events
+from app.core.metrics import observe_call, register_collector
+
+# Safety net for events that never arrive (e.g. a daemon that drops the subscription silently)
+CONTAINER_LIST_MAX_AGE_SECONDS = float(os.getenv("CONTAINER_LIST_MAX_AGE_SECONDS", "300"))
+
+# Events that change what the container listing shows
+CONTAINER_ACTIONS = {"create", "start", "restart", "die", "stop", "kill", "destroy", "rename", "pause", "unpause", "update"}
+IMAGE_ACTIONS = {"pull", "delete", "tag", "untag", "import", "load"}
+# HostConfig fields kept per container for right-sizing; only `docker update` changes them
+LIMIT_KEYS = ("Memory", "NanoCpus", "CpuQuota", "CpuPeriod", "CpuShares")
+
+
+def build_listing(containers: list, images: list):
+    """Joins one containers call with one images call in memory (no per-container image lookups)."""
+    images_by_id = {image["Id"]: image for image in images}
+    results = []
+    for c in containers:
+        image = images_by_id.get(c.get("ImageID"), {})
+        tags = [t for t in image.get("RepoTags") or [] if t != "<none>:<none>"]
+        names = c.get("Names") or []
+        short_id = c["Id"][:12]
+        results.append({
+            "id": short_id,
+            "name": names[0].lstrip("/") if names else short_id,
+            "image": tags[0] if tags else short_id,
+            "status": c.get("State", "unknown"),
+            "image_size_mb": round(image.get("Size", 0) / (1024 * 1024), 2),
+        })
+    return results
+
+
+class ContainerInventory:
+    """
+    Cached container listing. A snapshot is rebuilt (two Docker API calls) only after a relevant
+    Docker event, a reconnect of the events subscription, or CONTAINER_LIST_MAX_AGE_SECONDS.
+    While the subscription is down every call lists afresh.
+    Resource limits of running containers are inspected once per container and kept until the container
+    is updated or removed, or until events may have been missed.
+    """
+
+    def __init__(self, events=docker_events, max_age: float = CONTAINER_LIST_MAX_AGE_SECONDS):
+        self.events = events
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._changes = 0      # bumped by every relevant event
+        self._snapshot = None  # (changes, events generation, built_at, listing, container summaries)
+        self._limits = {}      # full container ID -> HostConfig limits
+        self._limits_generation = None
+        self.rebuilds = 0
+        events.subscribe(self._on_event)
+
+    def _on_event(self, event: dict):
+        action = (event.get("Action") or "").split(":")[0]
+        if (event.get("Type") == "container" and action in CONTAINER_ACTIONS) or \
+                (event.get("Type") == "image" and action in IMAGE_ACTIONS):
+            with self._lock:
+                self._changes += 1
+                if action in ("update", "destroy"):
+                    self._limits.pop((event.get("Actor") or {}).get("ID") or event.get("id"), None)
+
+    def invalidate(self):
+        with self._lock:
+            self._changes += 1
+            self._limits.clear()
+
+    def _fresh(self, snapshot) -> bool:
+        if snapshot is None or not self.events.connected:
+            return False
+        changes, generation, built_at, _, _ = snapshot
+        return (changes == self._changes and generation == self.events.generation
+                and time.monotonic() - built_at < self.max_age)
+
+    def list(self):
+        return [dict(c) for c in self._current()[3]]
+
+    def running_limits(self):
+        """
+        (container summary, HostConfig limits) for every running container. Only containers whose limits
+        are not known yet are inspected, so repeated calls on an unchanged host make no per-container calls.
+        """
+        containers = self._current()[4]
+        with self._lock:
+            # Events (and with them `docker update`s) may have been missed
+            if not self.events.connected or self._limits_generation != self.events.generation:
+                self._limits = {}
+                self._limits_generation = self.events.generation
+            limits = dict(self._limits)
+
+        client = get_docker_client()
+        results = []
+        for summary in containers:
+            if summary.get("State") != "running":
+                continue
+            host_config = limits.get(summary["Id"])
+            if host_config is None:
+                try:
+                    with observe_call("docker", "inspect_container"):
+                        inspected = client.api.inspect_container(summary["Id"]).get("HostConfig", {})
+                except Exception:
+                    continue  # stopped or removed since the listing
+                host_config = {k: inspected[k] for k in LIMIT_KEYS if k in inspected}
+                with self._lock:
+                    self._limits[summary["Id"]] = host_config
+            results.append((summary, host_config))
+        return results
+
+    def _current(self):
+        self.events.start()
+        snapshot = self._snapshot
+        if self._fresh(snapshot):
+            return snapshot
+
+        # Capture the change counter first: an event arriving during the rebuild leaves the snapshot stale
+        with self._lock:
+            changes = self._changes
+        generation = self.events.generation
+        client = get_docker_client()
+        with reporting_failures():
+            with observe_call("docker", "list_containers"):
+                containers = client.api.containers(all=True)
+            with observe_call("docker", "list_images"):
+                images = client.api.images()
+        listing = build_listing(containers, images)
+        snapshot = (changes, generation, time.monotonic(), listing, containers)
+        ids = {c["Id"] for c in containers}
+        with self._lock:
+            self._snapshot = snapshot
+            self._limits = {cid: v for cid, v in self._limits.items() if cid in ids}
+            self.rebuilds += 1
+        return snapshot
+
+
+container_inventory = ContainerInventory()
+
+
+@register_collector
+def _inventory_metrics():
+    return [
+        ("optimizer_container_list_rebuilds_total", "counter", "Container listings rebuilt from the Docker API.",
+         [({}, container_inventory.rebuilds)]),
+    ]
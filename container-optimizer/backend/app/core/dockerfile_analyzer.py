@@ -1,15 +1,17 @@
 import re
 
-def analyze_dockerfile_content(content: str):
+_INSTRUCTION_RE = re.compile(r"^([A-Z]+)\s+(.*)$", re.IGNORECASE)
+
+def _logical_lines(content: str):
     """
-    Statically analyze Dockerfile content with support for line continuations and multi-stage builds.
+    Yields (line_number, text) for each logical Dockerfile line: comments and blank lines removed,
+    line continuations (\\) joined. line_number is where the instruction starts (1-based).
     """
-    raw_lines = content.splitlines()
-    processed_lines = []
     current_line = ""
+    start = None
 
     # 1. Handle line continuations (\)
-    for line in raw_lines:
+    for number, line in enumerate(content.splitlines(), start=1):
         line = line.strip()
         if not line:
             continue
@@ -19,33 +21,51 @@ def analyze_dockerfile_content(content: str):
             line = line.split("#")[0].strip()
             if not line: continue
 
+        if start is None:
+            start = number
         if line.endswith("\\"):
             current_line += line[:-1].strip() + " "
         else:
             current_line += line
-            processed_lines.append(current_line.strip())
+            yield start, current_line.strip()
             current_line = ""
+            start = None
 
+def canonicalize_dockerfile(content: str) -> list:
+    """
+    Returns the logical instruction lines of a Dockerfile: comments and blank lines removed,
+    line continuations (\\) joined. Dockerfiles differing only in comments, blank lines or
+    continuation layout canonicalize the same.
+    """
+    return [text for _, text in _logical_lines(content)]
+
+def parse_instructions(content: str) -> list:
+    """
+    Parses a Dockerfile into [{"instruction", "value", "line", "stage"}], where `stage` is the
+    index of the FROM block the instruction belongs to (-1 before the first FROM, e.g. global ARGs).
+    """
     instructions = []
+    stage = -1
+    for number, line in _logical_lines(content):
+        match = _INSTRUCTION_RE.match(line)
+        if not match:
+            continue
+        instr = match.group(1).upper()
+        if instr == "FROM":
+            stage += 1
+        instructions.append({"instruction": instr, "value": match.group(2), "line": number, "stage": stage})
+    return instructions
+
+def analyze_dockerfile_content(content: str):
+    """
+    Statically analyze Dockerfile content with support for line continuations and multi-stage builds.
+    """
+    instructions = parse_instructions(content)
     stages = []
     
-    for line in processed_lines:
-        match = re.match(r"^([A-Z]+)\s+(.*)$", line, re.IGNORECASE)
-        if match:
-            instr = match.group(1).upper()
-            value = match.group(2)
-            instructions.append({"instruction": instr, "value": value})
-            
-            if instr == "FROM":
-                # Handle 'FROM image AS stage'
-                parts = value.split()
-                base = parts[0]
-                stage_name = None
-                if "as" in [p.lower() for p in parts]:
-                    idx = [p.lower() for p in parts].index("as")
-                    if len(parts) > idx + 1:
-                        stage_name = parts[idx + 1]
-                stages.append({"base": base, "name": stage_name})
+    for inst in instructions:
+        if inst["instruction"] == "FROM":
+            stages.append(parse_from(inst["value"]))
 
     # Prepare "layers" format for compatibility with misconfig_analyzer
     layers = []
@@ -83,6 +103,17 @@ def analyze_dockerfile_content(content: str):
         }
     }
 
+def parse_from(value: str) -> dict:
+    """Handles 'FROM [--platform=...] image [AS stage]'."""
+    parts = [p for p in value.split() if not p.startswith("--")]
+    base = parts[0] if parts else ""
+    stage_name = None
+    if "as" in [p.lower() for p in parts]:
+        idx = [p.lower() for p in parts].index("as")
+        if len(parts) > idx + 1:
+            stage_name = parts[idx + 1]
+    return {"base": base, "name": stage_name}
+
 def detect_runtime_from_content(content: str, instructions: list):
     content_lower = content.lower()
     
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import re
+import docker
+from app.docker.client import get_docker_client, reporting_failures
+from app.core.cache import TTLCache
+from app.core.layer_analyzer import cached_layer_size
+from app.core.metrics import observe_call
+
+TOP_SHARED_LAYERS = 10
+
+# An image's layer list never changes for a given ID, so only images new since the last report are inspected
+image_layers_cache = TTLCache(
+    "image_layers",
+    max_entries=int(os.getenv("FLEET_IMAGE_CACHE_MAX_ENTRIES", "4096")),
+    ttl_seconds=float(os.getenv("FLEET_IMAGE_CACHE_TTL_SECONDS", str(7 * 86400))),
+)
+
+_VARIANT_RE = re.compile(r"[:@].*$")
+
+
+def chain_ids(diff_ids: list):
+    """OCI ChainIDs: each one identifies a layer together with every layer below it."""
+    chains = []
+    for diff_id in diff_ids:
+        if not chains:
+            chains.append(diff_id)
+        else:
+            chains.append("sha256:" + hashlib.sha256(f"{chains[-1]} {diff_id}".encode()).hexdigest())
+    return chains
+
+
+def list_image_layers(client):
+    """Every local image with its tags, size and diff IDs: one list call plus an inspect per unseen image."""
+    with observe_call("docker", "list_images"):
+        summaries = client.api.images()
+
+    images = []
+    for summary in summaries:
+        image_id = summary["Id"]
+        diff_ids = image_layers_cache.get(image_id)
+        if diff_ids is None:
+            try:
+                with observe_call("docker", "inspect_image"):
+                    attrs = client.api.inspect_image(image_id)
+            except docker.errors.NotFound:
+                continue  # removed since the listing
+            diff_ids = attrs.get("RootFS", {}).get("Layers") or []
+            image_layers_cache.set(image_id, diff_ids)
+        images.append({
+            "id": image_id,
+            "tags": [t for t in summary.get("RepoTags") or [] if t != "<none>:<none>"],
+            "size": summary.get("Size", 0),
+            "layers": diff_ids,
+        })
+    return images
+
+
+def _image_name(image: dict) -> str:
+    return image["tags"][0] if image["tags"] else image["id"][7:19]
+
+
+def _family(name: str) -> str:
+    """'python:3.11-slim' -> 'python', 'ghcr.io/org/base:1' -> 'ghcr.io/org/base'."""
+    return _VARIANT_RE.sub("", name)
+
+
+def build_fleet_report(images: list):
+    """
+    Shared-layer accounting over a set of images, using layer digests only.
+    Cumulative sizes are exact at chains that are themselves local images; between them they come
+    from layer sizes measured by earlier layer analyses. A base image is the deepest local image an
+    image is built on, or else the deepest layer chain it shares with other images.
+    """
+    # 1. Layer-chain tree: one node per distinct chain, with the images passing through / ending at it
+    nodes = {}
+    for image in images:
+        image["chains"] = chain_ids(image["layers"])
+        parent = None
+        for depth, (chain, diff_id) in enumerate(zip(image["chains"], image["layers"]), start=1):
+            node = nodes.setdefault(chain, {"parent": parent, "diff_id": diff_id, "depth": depth, "users": set(), "images": []})
+            node["users"].add(image["id"])
+            parent = chain
+        if image["chains"]:
+            nodes[image["chains"][-1]]["images"].append(image)
+
+    # 2. Cumulative size per chain, lowest layers first
+    sizes = {None: 0}
+    for chain, node in sorted(nodes.items(), key=lambda item: item[1]["depth"]):
+        if node["images"]:
+            sizes[chain] = node["images"][0]["size"]
+        elif sizes.get(node["parent"]) is not None:
+            layer_size = cached_layer_size(node["diff_id"])
+            sizes[chain] = sizes[node["parent"]] + layer_size if layer_size is not None else None
+        else:
+            sizes[chain] = None
+
+    def _known_ancestor(chain):
+        """Nearest proper ancestor with a known cumulative size (None stands for the empty chain)."""
+        parent = nodes[chain]["parent"]
+        while parent is not None and sizes.get(parent) is None:
+            parent = nodes[parent]["parent"]
+        return parent
+
+    # 3. Disk usage: each chain with a known size adds the bytes above its nearest known ancestor.
+    # If a branch point has no known size, the layers above it are counted once per branch (an upper bound).
+    actual_bytes = sum(sizes[c] - sizes[_known_ancestor(c)] for c in nodes if sizes[c] is not None)
+    children = {}
+    for chain, node in nodes.items():
+        children[node["parent"]] = children.get(node["parent"], 0) + 1
+    exact = all(sizes[c] is not None for c, n in children.items() if c is not None and n > 1)
+    virtual_bytes = sum(image["size"] for image in images)
+
+    # 4. Base image per image
+    bases = {}
+    for image in images:
+        base_chain = None
+        for chain in reversed(image["chains"][:-1]):
+            if nodes[chain]["images"]:
+                base_chain = chain
+                break
+        if base_chain is None:
+            base_chain = next((c for c in reversed(image["chains"][:-1]) if len(nodes[c]["users"]) > 1), None)
+        if base_chain is None:
+            continue
+        base = bases.setdefault(base_chain, {"chain_id": base_chain, "images": [], "app_bytes": 0})
+        base["images"].append(_image_name(image))
+        if sizes[base_chain] is not None:
+            base["app_bytes"] += image["size"] - sizes[base_chain]
+
+    for chain, base in bases.items():
+        node = nodes[chain]
+        base["base"] = _image_name(node["images"][0]) if node["images"] else f"untagged layers {chain[7:19]}"
+        base["layers"] = node["depth"]
+        base["image_count"] = len(base["images"])
+        # A fresh host pulls the whole base once; what it alone keeps on disk is the part no other base shares
+        base["size_bytes"] = sizes[chain]
+        shared_below = node["parent"]
+        while shared_below is not None and nodes[shared_below]["users"] == node["users"]:
+            shared_below = nodes[shared_below]["parent"]
+        if shared_below is not None and sizes.get(shared_below) is None:
+            shared_below = _known_ancestor(shared_below)
+        base["unique_bytes"] = sizes[chain] - sizes[shared_below] if sizes[chain] is not None else None
+
+    # 5. Consolidation: move every image in a base family (python:*, node:*) onto its most used base
+    families = {}
+    for base in bases.values():
+        families.setdefault(_family(base["base"]), []).append(base)
+    consolidation = []
+    for family, members in families.items():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda b: (-b["image_count"], b["size_bytes"] if b["size_bytes"] is not None else float("inf")))
+        target, others = members[0], members[1:]
+        savings = sum(b["unique_bytes"] or 0 for b in others)
+        consolidation.append({
+            "family": family,
+            "target": target["base"],
+            "replace": [b["base"] for b in others],
+            "images_to_move": sum(b["image_count"] for b in others),
+            "disk_savings_bytes": savings,
+            # Each host (or CI runner) that pulls the whole fleet downloads these bytes once fewer
+            "pull_savings_bytes": savings,
+        })
+    consolidation.sort(key=lambda c: c["disk_savings_bytes"], reverse=True)
+
+    # 6. Layers whose sharing saves the most bytes
+    shared = []
+    for chain, node in nodes.items():
+        if len(node["users"]) < 2 or sizes[chain] is None or sizes.get(node["parent"]) is None:
+            continue
+        layer_bytes = sizes[chain] - sizes[node["parent"]]
+        shared.append({
+            "diff_id": node["diff_id"],
+            "size_bytes": layer_bytes,
+            "image_count": len(node["users"]),
+            "saved_bytes": layer_bytes * (len(node["users"]) - 1),
+        })
+    shared.sort(key=lambda s: s["saved_bytes"], reverse=True)
+
+    return {
+        "image_count": len(images),
+        "distinct_layers": len(nodes),
+        "shared_layers": sum(1 for node in nodes.values() if len(node["users"]) > 1),
+        "disk": {
+            "virtual_bytes": virtual_bytes,
+            "actual_bytes": actual_bytes,
+            "shared_savings_bytes": virtual_bytes - actual_bytes,
+            "exact": exact,
+        },
+        "base_images": sorted(bases.values(), key=lambda b: (-b["image_count"], b["base"])),
+        "consolidation": consolidation,
+        "potential_savings_bytes": sum(c["disk_savings_bytes"] for c in consolidation),
+        "top_shared_layers": shared[:TOP_SHARED_LAYERS],
+    }
+
+
+@reporting_failures()
+def analyze_fleet():
+    """Shared-layer and base-image report over every local image."""
+    client = get_docker_client()
+    return build_fleet_report(list_image_layers(client))
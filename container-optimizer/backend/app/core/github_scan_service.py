@@ -0,0 +1,150 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List
+from fastapi import HTTPException
+from app.core.github_service import extract_repo_info, get_file_content, find_all_dockerfiles
+from app.core.report.report_builder import build_static_report
+from app.core.ai_scheduler import PRIORITY_BATCH
+from app.core.analyzers.security_analyzer import analyze_dockerfiles_security, dockerfile_engines
+
+# Dockerfiles fetched and analyzed at once; AI calls are further limited by the AI scheduler
+REPO_SCAN_CONCURRENCY = int(os.getenv("REPO_SCAN_CONCURRENCY", "8"))
+# AI calls for a monorepo wait behind provider rate limits, so allow them much longer than interactive ones
+BATCH_AI_TIMEOUT_SECONDS = float(os.getenv("BATCH_AI_TIMEOUT_SECONDS", "900"))
+
+
+def scan_github_repo(url: str, path: Optional[str] = None, token: Optional[str] = None, on_section=None):
+    """
+    Discovers and analyzes a Dockerfile in a GitHub repository.
+    Returns the list of candidate paths when the repository has several Dockerfiles and no path was given.
+    """
+    owner, repo, branch = extract_repo_info(url)
+    if not owner or not repo:
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
+
+    # 1. Handle Path Discovery or Targeted Analysis
+    if not path:
+        # Discovery Phase
+        all_paths = find_all_dockerfiles(owner, repo, token=token)
+        if not all_paths:
+            raise HTTPException(status_code=404, detail="No Dockerfile found in repository")
+
+        # If multiple found and no path specified, return list for selection
+        if len(all_paths) > 1:
+            return {
+                "multi_service": True,
+                "paths": all_paths,
+                "owner": owner,
+                "repo": repo,
+                "url": url
+            }
+        path = all_paths[0]
+
+    # 2. Analyze the specific path
+    content = get_file_content(owner, repo, path, token=token)
+    if not content:
+        raise HTTPException(status_code=404, detail=f"Failed to fetch Dockerfile at {path}")
+
+    # Use the unified static report builder (includes Trivy + AI)
+    report = build_static_report(content, on_section=on_section)
+
+    # Add GitHub metadata to the report
+    report.update({
+        "owner": owner,
+        "repo": repo,
+        "branch": branch,
+        "path": path,
+        "original_content": content,
+        "url": url,
+        "multi_service": False
+    })
+
+    # Ensure ResultViewer can find the AI result
+    if "recommendation" in report:
+        rec = report["recommendation"]
+        report["optimization"] = rec.get("optimized_dockerfile") or rec.get("dockerfile")
+
+    return report
+
+
+def scan_github_services(url: str, paths: Optional[List[str]] = None, token: Optional[str] = None, on_section=None,
+                         deep_scan: bool = False):
+    """
+    Analyzes every Dockerfile of a (mono)repository concurrently.
+    Each finished service is pushed through `on_section("service", ...)` as soon as its report is ready.
+    Whenever `trivy config` runs (see dockerfile_engines), all Dockerfiles go through one batched run up front,
+    so the per-service reports read its results from the scan cache.
+    """
+    owner, repo, branch = extract_repo_info(url)
+    if not owner or not repo:
+        raise HTTPException(status_code=400, detail="Invalid GitHub URL")
+
+    if not paths:
+        paths = find_all_dockerfiles(owner, repo, token=token)
+        if not paths:
+            raise HTTPException(status_code=404, detail="No Dockerfile found in repository")
+
+    services = {}
+    errors = {}
+    workers = max(1, min(REPO_SCAN_CONCURRENCY, len(paths)))
+
+    def _record_error(path, e):
+        errors[path] = e.detail if isinstance(e, HTTPException) else str(e)
+        if on_section:
+            on_section("service_error", {"path": path, "error": errors[path]})
+
+    def _fetch(path):
+        content = get_file_content(owner, repo, path, token=token)
+        if not content:
+            raise HTTPException(status_code=404, detail=f"Failed to fetch Dockerfile at {path}")
+        return content
+
+    # 1. Fetch every Dockerfile
+    contents = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_fetch, path): path for path in paths}
+        for future in as_completed(futures):
+            try:
+                contents[futures[future]] = future.result()
+            except Exception as e:
+                _record_error(futures[future], e)
+
+    # 2. One Trivy config run for the whole batch
+    if "trivy" in dockerfile_engines(deep_scan or None) and contents:
+        analyze_dockerfiles_security(contents, deep=deep_scan or None)
+
+    # 3. Per-service reports
+    def _analyze(path):
+        content = contents[path]
+        report = build_static_report(content, ai_priority=PRIORITY_BATCH, ai_timeout=BATCH_AI_TIMEOUT_SECONDS,
+                                     deep_scan=deep_scan)
+        rec = report.get("recommendation", {})
+        report.update({
+            "path": path,
+            "original_content": content,
+            "optimization": rec.get("optimized_dockerfile") or rec.get("dockerfile"),
+        })
+        return report
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_analyze, path): path for path in contents}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                services[path] = future.result()
+            except Exception as e:
+                _record_error(path, e)
+                continue
+            if on_section:
+                on_section("service", {"path": path, "report": services[path]})
+
+    return {
+        "multi_service": True,
+        "owner": owner,
+        "repo": repo,
+        "branch": branch,
+        "url": url,
+        "paths": paths,
+        "services": {path: services[path] for path in paths if path in services},
+        "errors": errors,
+    }
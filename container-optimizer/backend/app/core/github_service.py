@@ -1,10 +1,11 @@
-import requests
+from app.core import http_client
 import base64
 import os
 import re
 import json
 from typing import Optional, Tuple
 from dotenv import load_dotenv
+from app.core.metrics import track_call
 
 load_dotenv()
 
@@ -41,6 +42,7 @@ def get_headers(token: Optional[str] = None):
         headers["Authorization"] = f"token {active_token}"
     return headers
 
+@track_call("github")
 def find_all_dockerfiles(owner: str, repo: str, token: Optional[str] = None) -> list[str]:
     """
     Recursively searches for all Dockerfiles in a repository using the Trees API.
@@ -48,7 +50,7 @@ def find_all_dockerfiles(owner: str, repo: str, token: Optional[str] = None) ->
     """
     # 1. Get the default branch and its latest commit SHA
     repo_url = f"https://api.github.com/repos/{owner}/{repo}"
-    repo_resp = requests.get(repo_url, headers=get_headers(token))
+    repo_resp = http_client.get(repo_url, headers=get_headers(token))
     if repo_resp.status_code != 200:
         return []
     
@@ -57,7 +59,7 @@ def find_all_dockerfiles(owner: str, repo: str, token: Optional[str] = None) ->
     # 2. Get the recursive tree
     # We use recursive=1 to get the entire tree in one go (limit 100k entries)
     tree_url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{default_branch}?recursive=1"
-    tree_resp = requests.get(tree_url, headers=get_headers(token))
+    tree_resp = http_client.get(tree_url, headers=get_headers(token))
     
     if tree_resp.status_code != 200:
         return []
@@ -73,12 +75,13 @@ def find_all_dockerfiles(owner: str, repo: str, token: Optional[str] = None) ->
             
 
 
+@track_call("github")
 def get_file_content(owner: str, repo: str, path: str, token: Optional[str] = None) -> Optional[str]:
     """
     Fetches the content of a file from a GitHub repository.
     """
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
-    response = requests.get(url, headers=get_headers(token))
+    response = http_client.get(url, headers=get_headers(token))
     
     if response.status_code == 200:
         data = response.json()
@@ -88,6 +91,7 @@ def get_file_content(owner: str, repo: str, path: str, token: Optional[str] = No
             return content_decoded
     return None
 
+@track_call("github")
 def create_pull_request(owner: str, repo: str, title: str, body: str, head: str, base: str = "main", token: Optional[str] = None):
     """
     Creates a pull request on GitHub.
@@ -103,29 +107,33 @@ def create_pull_request(owner: str, repo: str, title: str, body: str, head: str,
         "head": head,
         "base": base
     }
-    response = requests.post(url, headers=get_headers(token), json=payload)
+    response = http_client.post(url, headers=get_headers(token), json=payload)
     return response
 
 import time
 
+@track_call("github")
 def get_authenticated_user(token: str) -> Tuple[str, Optional[str]]:
     """Gets the login name of the authenticated user. Safe for CI."""
     try:
         url = "https://api.github.com/user"
-        resp = requests.get(url, headers=get_headers(token), timeout=5)
+        resp = http_client.get(url, headers=get_headers(token), timeout=5)
         if resp.status_code == 200:
             return resp.json()["login"], None
         return "github-actions[bot]", f"HTTP {resp.status_code}: {resp.text[:50]}"
     except Exception as e:
         return "github-actions[bot]", str(e)
 
+@track_call("github")
 def fork_repo(owner: str, repo: str, token: Optional[str] = None):
     """Forks a repository."""
     url = f"https://api.github.com/repos/{owner}/{repo}/forks"
-    resp = requests.post(url, headers=get_headers(token))
+    resp = http_client.post(url, headers=get_headers(token))
     resp.raise_for_status()
     return resp.json()
 
+# Not wrapped in track_call: it sleeps between retries, and each of its GitHub requests is
+# already timed per host by http_client (and per call by the helpers it uses)
 def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_name: str = "optimize-all-services", base_branch: str = None, pr_title: str = None, commit_message: str = None, token: Optional[str] = None):
     """
     Updates multiple files in a single commit and creates one PR.
@@ -139,7 +147,7 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
     
     # 1. Check permissions & Fork if needed
     repo_url = f"https://api.github.com/repos/{owner}/{repo}"
-    repo_resp = requests.get(repo_url, headers=headers)
+    repo_resp = http_client.get(repo_url, headers=headers)
     repo_resp.raise_for_status()
     repo_data = repo_resp.json()
     
@@ -171,7 +179,7 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
             for i in range(5):
                     time.sleep(2)
                     check_url = f"https://api.github.com/repos/{target_owner}/{repo}"
-                    if requests.get(check_url, headers=headers).status_code == 200:
+                    if http_client.get(check_url, headers=headers).status_code == 200:
                         break
         else:
             # Actions token with no write-perm is a terminal state for direct push
@@ -179,9 +187,9 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
 
     # 2. Get Base Branch SHA
     ref_url = f"https://api.github.com/repos/{target_owner}/{repo}/git/refs/heads/{default_branch}"
-    ref_resp = requests.get(ref_url, headers=headers)
+    ref_resp = http_client.get(ref_url, headers=headers)
     if ref_resp.status_code != 200:
-        ref_resp = requests.get(f"https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{default_branch}", headers=headers)
+        ref_resp = http_client.get(f"https://api.github.com/repos/{owner}/{repo}/git/refs/heads/{default_branch}", headers=headers)
     ref_resp.raise_for_status()
     base_sha = ref_resp.json()["object"]["sha"]
 
@@ -189,7 +197,7 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
     # We create a new tree starting from the base_sha's tree
     # First, get the tree SHA of the base commit
     commit_url = f"https://api.github.com/repos/{owner}/{repo}/git/commits/{base_sha}"
-    commit_resp = requests.get(commit_url, headers=headers)
+    commit_resp = http_client.get(commit_url, headers=headers)
     commit_resp.raise_for_status()
     base_tree_sha = commit_resp.json()["tree"]["sha"]
 
@@ -208,7 +216,7 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
         "base_tree": base_tree_sha,
         "tree": tree_items
     }
-    tree_resp = requests.post(create_tree_url, headers=headers, json=tree_payload)
+    tree_resp = http_client.post(create_tree_url, headers=headers, json=tree_payload)
     tree_resp.raise_for_status()
     new_tree_sha = tree_resp.json()["sha"]
 
@@ -218,21 +226,21 @@ def full_bulk_pr_workflow(owner: str, repo: str, updates: list[dict], branch_nam
         "tree": new_tree_sha,
         "parents": [base_sha]
     }
-    commit_resp = requests.post(f"https://api.github.com/repos/{target_owner}/{repo}/git/commits", headers=headers, json=commit_payload)
+    commit_resp = http_client.post(f"https://api.github.com/repos/{target_owner}/{repo}/git/commits", headers=headers, json=commit_payload)
     commit_resp.raise_for_status()
     new_commit_sha = commit_resp.json()["sha"]
 
     # 5. Update or Create Branch Ref
     ref_path = f"refs/heads/{branch_name}"
     ref_url = f"https://api.github.com/repos/{target_owner}/{repo}/git/{ref_path}"
-    ref_check = requests.get(ref_url, headers=headers)
+    ref_check = http_client.get(ref_url, headers=headers)
     
     if ref_check.status_code == 200:
         # Update existing
-        requests.patch(ref_url, headers=headers, json={"sha": new_commit_sha, "force": True}).raise_for_status()
+        http_client.patch(ref_url, headers=headers, json={"sha": new_commit_sha, "force": True}).raise_for_status()
     else:
         # Create new
-        requests.post(f"https://api.github.com/repos/{target_owner}/{repo}/git/refs", headers=headers, json={"ref": ref_path, "sha": new_commit_sha}).raise_for_status()
+        http_client.post(f"https://api.github.com/repos/{target_owner}/{repo}/git/refs", headers=headers, json={"ref": ref_path, "sha": new_commit_sha}).raise_for_status()
 
     # 6. Create PR
     head_param = f"{target_owner}:{branch_name}" if target_owner != owner else branch_name
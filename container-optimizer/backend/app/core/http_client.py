@@ -0,0 +1,143 @@
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from app.core.metrics import Counter, Histogram
+
+# Shared keep-alive pool for outbound HTTPS (Groq, GitHub).
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "16"))          # distinct hosts kept in the pool
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))      # connections kept alive per host
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+RETRY_BACKOFF_BASE = 0.5   # seconds, doubled per attempt
+RETRY_MAX_DELAY = 30       # never sleep longer than this, even if Retry-After asks for more
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+http_client_duration_seconds = Histogram(
+    "optimizer_http_client_duration_seconds", "Outbound HTTP latency per host.", ("host", "status")
+)
+http_client_retries_total = Counter(
+    "optimizer_http_client_retries_total", "Outbound HTTP retries per host and reason.", ("host", "reason")
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled in request() so we can honor Retry-After and method semantics
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _retry_after_seconds(response: requests.Response):
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff(attempt: int) -> float:
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BACKOFF_BASE * (2 ** attempt)))
+
+
+def _never_sent(error: Exception) -> bool:
+    """
+    True only for failures to open the connection (refused, DNS, connect timeout), where the server
+    never saw the request. Resets and read timeouts can happen after the body was sent.
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and not isinstance(error, requests.Timeout):
+        reason = error.args[0] if error.args else None
+        if isinstance(reason, MaxRetryError):
+            reason = reason.reason
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def _should_retry_status(response: requests.Response, method: str, retry_non_idempotent: bool) -> bool:
+    # GitHub signals secondary rate limits with 403 + Retry-After
+    rate_limited = response.status_code == 429 or (response.status_code == 403 and "Retry-After" in response.headers)
+    if rate_limited:
+        return True  # the request was rejected before being processed, so any method is safe to resend
+    return response.status_code in RETRY_STATUSES and (method in IDEMPOTENT_METHODS or retry_non_idempotent)
+
+
+def request(method: str, url: str, timeout=None, retry_non_idempotent: bool = False, max_retries: int = None, **kwargs):
+    """
+    Sends a request through the shared pooled session.
+    Retries connection failures, 429/5xx (5xx and failures after the request was sent only for idempotent
+    methods unless retry_non_idempotent) with exponential backoff and jitter, honoring Retry-After.
+    """
+    method = method.upper()
+    host = urlsplit(url).hostname or "unknown"
+    timeout = timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    max_retries = HTTP_MAX_RETRIES if max_retries is None else max_retries
+    session = get_session()
+
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            http_client_duration_seconds.observe(time.perf_counter() - started, host=host, status="error")
+            # Non-idempotent requests (GitHub commits, refs, PRs) are only resent if they never left
+            safe = _never_sent(e) or method in IDEMPOTENT_METHODS or retry_non_idempotent
+            if attempt >= max_retries or not safe:
+                raise
+            http_client_retries_total.inc(host=host, reason=type(e).__name__)
+            time.sleep(_backoff(attempt))
+            attempt += 1
+            continue
+
+        http_client_duration_seconds.observe(time.perf_counter() - started, host=host, status=str(response.status_code))
+        if attempt >= max_retries or not _should_retry_status(response, method, retry_non_idempotent):
+            return response
+
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = _backoff(attempt)
+        elif delay > RETRY_MAX_DELAY:
+            return response  # caller decides; sleeping this long would blow request deadlines
+        http_client_retries_total.inc(host=host, reason=str(response.status_code))
+        response.close()
+        time.sleep(delay)
+        attempt += 1
+
+
+def get(url: str, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def patch(url: str, **kwargs):
+    return request("PATCH", url, **kwargs)
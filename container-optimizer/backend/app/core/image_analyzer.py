@@ -1,10 +1,21 @@
+import os
 import subprocess
 import docker
-from app.docker.client import get_docker_client
+from app.docker.client import get_docker_client, reporting_failures
+from app.core.cache import TTLCache, make_key
+from app.core.metrics import observe_call, record_subprocess
 
 LARGE_LAYER_THRESHOLD_MB = 50
 
+# Image IDs are content digests, so a cached analysis never goes stale; a moved tag resolves to a new key.
+image_analysis_cache = TTLCache(
+    "image_analysis",
+    max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "128")),
+    ttl_seconds=float(os.getenv("IMAGE_CACHE_TTL_SECONDS", "86400")),
+)
 
+
+@reporting_failures()
 def analyze_image(image_ref: str):
     """
     Analyze a LOCAL Docker image.
@@ -17,19 +28,36 @@ def analyze_image(image_ref: str):
     image_size_mb = round(image.attrs["Size"] / (1024 * 1024), 2)
     image_id = image.id  # always safe
 
-    result = subprocess.run(
-        [
-            "docker",
-            "history",
-            image_id,
-            "--no-trunc",
-            "--format",
-            "{{.Size}}|{{.CreatedBy}}",
-        ],
-        capture_output=True,
-        text=True,
-        check=True,
+    # Concurrent requests for the same image share one `docker history` run
+    cache_key = make_key("image_analysis", image_id, LARGE_LAYER_THRESHOLD_MB)
+    analysis = image_analysis_cache.get_or_compute(
+        cache_key, lambda: _analyze_history(image, image_ref, image_size_mb)
     )
+    analysis["image"] = image_ref
+    return analysis
+
+
+def _analyze_history(image, image_ref: str, image_size_mb: float):
+    image_id = image.id
+    try:
+        with observe_call("docker", "history"):
+            result = subprocess.run(
+                [
+                    "docker",
+                    "history",
+                    image_id,
+                    "--no-trunc",
+                    "--format",
+                    "{{.Size}}|{{.CreatedBy}}",
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+    except Exception:
+        record_subprocess("docker_history", "error")
+        raise
+    record_subprocess("docker_history", "ok")
 
     layers = []
     for line in result.stdout.strip().split("\n"):
@@ -52,14 +80,16 @@ def analyze_image(image_ref: str):
     # New: Enhanced runtime detection
     runtime_info = detect_runtime(image, layers)
 
-    return {
+    analysis = {
         "image": image_ref,
+        "image_id": image_id,
         "total_size_mb": image_size_mb,
         "layer_count": len(layers),
         "base_image": base_image,
         "layers": layers,
         "runtime": runtime_info,
     }
+    return analysis
 
 
 def resolve_image(client: docker.DockerClient, image_ref: str):
@@ -75,6 +105,18 @@ def resolve_image(client: docker.DockerClient, image_ref: str):
         )
 
 
+def resolve_image_id(image_ref: str):
+    """
+    Returns the immutable image ID (content digest) for a local image reference,
+    or None if the image or the Docker daemon is unavailable.
+    """
+    try:
+        with reporting_failures():
+            return get_docker_client().images.get(image_ref).id
+    except Exception:
+        return None
+
+
 def parse_size(size_str: str) -> float:
     size_str = size_str.strip()
 
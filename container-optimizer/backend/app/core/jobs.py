@@ -0,0 +1,140 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+import uuid
+from fastapi import HTTPException
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "50"))
+# Finished jobs are kept this long so clients can fetch their results
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobManager:
+    """
+    Bounded background queue for heavy scans.
+    Jobs run on a fixed pool of worker threads; lower `priority` values run first.
+    Each job's `fn(on_section)` reports progress through the same section callback the streaming endpoints use.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_DEPTH):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._jobs = {}
+        self._queue = []  # heap of (priority, seq, job_id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def submit(self, kind: str, fn, params: dict = None, priority: int = 0):
+        with self._cond:
+            self._prune()
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError(f"Job queue is full ({self.max_queue} pending)")
+
+            job_id = str(uuid.uuid4())
+            self._jobs[job_id] = {
+                "id": job_id,
+                "kind": kind,
+                "params": params or {},
+                "priority": priority,
+                "status": "queued",
+                "progress": {"sections": []},
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "error": None,
+                "_fn": fn,
+            }
+            heapq.heappush(self._queue, (priority, next(self._seq), job_id))
+            self._ensure_workers()
+            self._cond.notify()
+            return self._view(self._jobs[job_id])
+
+    def get(self, job_id: str, include_result: bool = False):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return self._view(job, include_result=include_result)
+
+    def stats(self):
+        with self._cond:
+            statuses = [j["status"] for j in self._jobs.values()]
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queued": len(self._queue),
+                "running": statuses.count("running"),
+                "completed": statuses.count("completed"),
+                "failed": statuses.count("failed"),
+            }
+
+    def _ensure_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"job-worker-{len(self._threads)}", daemon=True)
+            self._threads.append(t)
+            t.start()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                _, _, job_id = heapq.heappop(self._queue)
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started_at"] = time.time()
+
+            def _on_section(section, data, job=job):
+                with self._cond:
+                    job["progress"]["sections"].append(section)
+
+            try:
+                result = job["_fn"](_on_section)
+                status, error = "completed", None
+            except HTTPException as e:
+                result, status, error = None, "failed", {"status_code": e.status_code, "detail": e.detail}
+            except Exception as e:
+                result, status, error = None, "failed", {"status_code": 500, "detail": str(e)}
+
+            with self._cond:
+                # The closure holds the request's arguments (and any credentials); results outlive it
+                job.update(status=status, result=result, error=error, finished_at=time.time(), _fn=None)
+
+    def _queue_position(self, job_id: str):
+        ordered = sorted(self._queue)
+        for position, (_, _, queued_id) in enumerate(ordered):
+            if queued_id == job_id:
+                return position + 1
+        return None
+
+    def _view(self, job: dict, include_result: bool = False):
+        view = {k: v for k, v in job.items() if not k.startswith("_") and k != "result"}
+        view["progress"] = {"sections": list(job["progress"]["sections"])}
+        view["queue_position"] = self._queue_position(job["id"]) if job["status"] == "queued" else None
+
+        started, finished = job["started_at"], job["finished_at"]
+        view["timings"] = {
+            "queue_wait_ms": round(((started or time.time()) - job["submitted_at"]) * 1000, 1),
+            "run_ms": round(((finished or time.time()) - started) * 1000, 1) if started else None,
+        }
+        if include_result:
+            view["result"] = job["result"]
+        return view
+
+    def _prune(self):
+        cutoff = time.time() - JOB_RESULT_TTL_SECONDS
+        expired = [jid for jid, j in self._jobs.items() if j["finished_at"] and j["finished_at"] < cutoff]
+        for jid in expired:
+            del self._jobs[jid]
+
+
+job_manager = JobManager()
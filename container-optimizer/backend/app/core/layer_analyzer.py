@@ -0,0 +1,457 @@
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import tarfile
+from app.docker.client import get_docker_client, reporting_failures
+from app.core.cache import DiskCache, TTLCache, make_key
+from app.core.image_analyzer import resolve_image
+from app.core.metrics import observe_call
+
+# Bump whenever the accounting below (or what is kept per layer) changes so cached analyses are recomputed
+LAYER_ANALYZER_VERSION = "2"
+
+# Every analysis streams the whole image out of the daemon; beyond a typical app image that costs
+# more than an interactive report is worth (raise it for deep or batch audits)
+LAYER_ANALYSIS_MAX_MB = float(os.getenv("LAYER_ANALYSIS_MAX_MB", "512"))
+LAYER_ANALYSIS_CHUNK_SIZE = 1024 * 1024
+# Dead bytes below this are not worth a finding
+LAYER_WASTE_MIN_MB = float(os.getenv("LAYER_WASTE_MIN_MB", "5"))
+TOP_WASTED_FILES = 10
+
+WHITEOUT_PREFIX = ".wh."
+OPAQUE_WHITEOUT = ".wh..wh..opq"
+
+# Package-manager caches that are safe to delete in the layer that creates them
+PACKAGE_CACHES = [
+    ("apt", re.compile(r"^(var/cache/apt/|var/lib/apt/lists/)")),
+    ("apk", re.compile(r"^var/cache/apk/")),
+    ("yum/dnf", re.compile(r"^var/cache/(yum|dnf)/")),
+    ("pip", re.compile(r"^(root|home/[^/]+)/\.cache/pip/")),
+    ("npm", re.compile(r"^(root|home/[^/]+)/\.npm/_cacache/")),
+    ("yarn", re.compile(r"^(usr/local/share|root|home/[^/]+)/\.cache/yarn/")),
+    ("go", re.compile(r"^(root|home/[^/]+)/\.cache/go-build/")),
+    ("maven", re.compile(r"^(root|home/[^/]+)/\.m2/repository/")),
+]
+
+# Package databases, read from file contents while the layer streams past
+DPKG_STATUS = "var/lib/dpkg/status"
+DPKG_STATUS_DIR = "var/lib/dpkg/status.d/"
+APK_INSTALLED = "lib/apk/db/installed"
+_PIP_METADATA_RE = re.compile(r"(?:site|dist)-packages/([^/]+?)-([^/-]+)\.dist-info/METADATA$")
+
+RUNTIME_HINTS = [
+    ("python", re.compile(r"^usr/(local/)?bin/python3(\.\d+)?$")),
+    ("node", re.compile(r"^usr/(local/)?bin/node$")),
+    ("go", re.compile(r"^usr/local/go/bin/go$")),
+    ("java", re.compile(r"(^|/)bin/java$")),
+    ("ruby", re.compile(r"^usr/(local/)?bin/ruby$")),
+    ("php", re.compile(r"^usr/(local/)?bin/php$")),
+    ("dotnet", re.compile(r"^usr/(share|lib)/dotnet/dotnet$")),
+]
+
+# Layer diff IDs are content digests shared by every image built on the same base, so per-layer
+# results survive restarts and a new image only parses the layers no earlier image had.
+layer_contents_cache = DiskCache(
+    "layer_contents",
+    directory=os.getenv("LAYER_CONTENTS_CACHE_DIR", "/tmp/optimizer_layer_cache"),
+    max_entries=int(os.getenv("LAYER_CONTENTS_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=float(os.getenv("LAYER_CONTENTS_CACHE_TTL_SECONDS", str(30 * 86400))),
+)
+
+# Just the byte size per diff ID, small enough for fleet reports to look up hundreds of layers
+layer_size_cache = DiskCache(
+    "layer_sizes",
+    directory=os.getenv("LAYER_SIZE_CACHE_DIR", "/tmp/optimizer_layer_sizes"),
+    max_entries=int(os.getenv("LAYER_SIZE_CACHE_MAX_ENTRIES", "20000")),
+    ttl_seconds=float(os.getenv("LAYER_CONTENTS_CACHE_TTL_SECONDS", str(30 * 86400))),
+)
+
+# Image IDs are content digests, so an analysis never goes stale
+layer_analysis_cache = TTLCache(
+    "layer_analysis",
+    max_entries=int(os.getenv("LAYER_CACHE_MAX_ENTRIES", "64")),
+    ttl_seconds=float(os.getenv("LAYER_CACHE_TTL_SECONDS", "86400")),
+)
+
+
+class LayerContents:
+    """
+    File tree of one layer tarball (regular files/links with sizes, directories and whiteouts),
+    plus the packages and runtime hints found in it.
+    """
+
+    def __init__(self):
+        self.files = {}     # path -> size in bytes
+        self.dirs = set()
+        self.whiteouts = []  # paths deleted from lower layers
+        self.opaque = []     # directories whose lower-layer contents are hidden
+        self.size = 0
+        self.packages = {}   # ecosystem -> {name: version}
+        self.package_dbs = set()  # ecosystems whose full database is in this layer (it replaces lower ones)
+        self.runtime_hints = set()
+
+    def to_dict(self):
+        return {
+            "files": self.files,
+            "dirs": sorted(self.dirs),
+            "whiteouts": self.whiteouts,
+            "opaque": self.opaque,
+            "size": self.size,
+            "packages": self.packages,
+            "package_dbs": sorted(self.package_dbs),
+            "runtime_hints": sorted(self.runtime_hints),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        layer = cls()
+        layer.files = data["files"]
+        layer.dirs = set(data["dirs"])
+        layer.whiteouts = data["whiteouts"]
+        layer.opaque = data["opaque"]
+        layer.size = data["size"]
+        layer.packages = data["packages"]
+        layer.package_dbs = set(data["package_dbs"])
+        layer.runtime_hints = set(data["runtime_hints"])
+        return layer
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks (e.g. the Docker API's image export)."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+class _HashingReader:
+    """Passes reads through while computing the sha256 of everything read (a layer's diff ID)."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.sha256.update(data)
+        return data
+
+    def drain(self):
+        while self.read(LAYER_ANALYSIS_CHUNK_SIZE):
+            pass
+        return "sha256:" + self.sha256.hexdigest()
+
+
+def _parse_control_blocks(text: str, name_key: str, version_key: str, installed_only: bool = False):
+    """Parses dpkg status / apk installed style databases: blank-line separated 'Key: value' blocks."""
+    packages = {}
+    for block in text.split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            key, sep, value = line.partition(":")
+            if sep and not key.startswith(" "):
+                fields[key] = value.strip()
+        if name_key not in fields:
+            continue
+        if installed_only and "installed" not in fields.get("Status", "installed").split():
+            continue
+        packages[fields[name_key]] = fields.get(version_key, "")
+    return packages
+
+
+def _read_package_db(layer: LayerContents, path: str, data: bytes):
+    text = data.decode("utf-8", errors="replace")
+    if path == DPKG_STATUS:
+        layer.packages["dpkg"] = _parse_control_blocks(text, "Package", "Version", installed_only=True)
+        layer.package_dbs.add("dpkg")
+    elif path.startswith(DPKG_STATUS_DIR):
+        # Distroless images keep one control file per package instead of a single database
+        layer.packages.setdefault("dpkg", {}).update(_parse_control_blocks(text, "Package", "Version"))
+    elif path == APK_INSTALLED:
+        layer.packages["apk"] = _parse_control_blocks(text, "P", "V")
+        layer.package_dbs.add("apk")
+
+
+def _normalize_path(name: str) -> str:
+    """'./usr/bin/', '/usr/bin' -> 'usr/bin'; the root itself -> ''."""
+    return posixpath.normpath("/" + name).lstrip("/")
+
+
+def read_layer(fileobj) -> LayerContents:
+    """Reads one layer tarball sequentially; file data is skipped, only headers are kept."""
+    layer = LayerContents()
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            path = _normalize_path(member.name)
+            if not path:
+                continue
+            directory, base = posixpath.split(path)
+            if base == OPAQUE_WHITEOUT:
+                layer.opaque.append(directory)
+            elif base.startswith(WHITEOUT_PREFIX):
+                layer.whiteouts.append(posixpath.join(directory, base[len(WHITEOUT_PREFIX):]))
+            elif member.isdir():
+                layer.dirs.add(path)
+            else:
+                layer.files[path] = member.size if member.isreg() else 0
+                layer.size += layer.files[path]
+                if member.isreg() and (path in (DPKG_STATUS, APK_INSTALLED) or path.startswith(DPKG_STATUS_DIR)):
+                    _read_package_db(layer, path, tar.extractfile(member).read())
+                pip = _PIP_METADATA_RE.search(path)
+                if pip:
+                    layer.packages.setdefault("pip", {})[pip.group(1)] = pip.group(2)
+                for runtime, pattern in RUNTIME_HINTS:
+                    if pattern.search(path):
+                        layer.runtime_hints.add(runtime)
+    return layer
+
+
+def read_image_export(chunks, skip=()):
+    """
+    Streams a `docker save` tarball and parses its layers without extracting anything to disk.
+    Returns {diff_id: LayerContents}. Handles both the OCI (`blobs/sha256/<diff_id>`) layout, where
+    layers listed in `skip` are passed over unparsed, and the legacy (`<id>/layer.tar`) layout, where
+    the diff ID is only known once the layer has been hashed.
+    """
+    layers = {}
+    with tarfile.open(fileobj=_ChunkReader(chunks), mode="r|") as export:
+        for member in export:
+            if not member.isreg():
+                continue  # legacy exports symlink repeated layers to their first copy
+            if member.name.startswith("blobs/sha256/"):
+                diff_id = "sha256:" + member.name.rsplit("/", 1)[1]
+                if diff_id in skip or diff_id in layers:
+                    continue
+                try:
+                    layers[diff_id] = read_layer(export.extractfile(member))
+                except tarfile.ReadError:
+                    continue  # an image config or manifest blob, not a layer
+            elif member.name.endswith("layer.tar"):
+                reader = _HashingReader(export.extractfile(member))
+                layer = read_layer(reader)
+                layers[reader.drain()] = layer
+    return layers
+
+
+def load_layers(image_id: str, diff_ids: list, export):
+    """
+    Per-layer contents for an image, lowest first. Cached layers (from any image) are loaded from the
+    layer cache; only if some are missing is the image exported via `export()`, and then only the
+    missing layers are parsed and cached. Returns (layers, number of layers parsed).
+    """
+    keys = {d: make_key("layer_contents", d, LAYER_ANALYZER_VERSION) for d in diff_ids}
+    known = {}
+    for diff_id in diff_ids:
+        if diff_id not in known:
+            cached = layer_contents_cache.get(keys[diff_id])
+            if cached is not None:
+                known[diff_id] = LayerContents.from_dict(cached)
+
+    missing = set(diff_ids) - set(known)
+    if missing:
+        with observe_call("docker", "image_export"):
+            parsed = read_image_export(export(), skip=set(known))
+        for diff_id in missing:
+            if diff_id not in parsed:
+                raise RuntimeError(f"Export of {image_id} is missing layer {diff_id}")
+            known[diff_id] = parsed[diff_id]
+            try:
+                layer_contents_cache.set(keys[diff_id], parsed[diff_id].to_dict())
+                layer_size_cache.set(make_key("layer_size", diff_id), parsed[diff_id].size)
+            except OSError as e:
+                print(f"layer_contents cache write failed: {e}")
+    return [known[d] for d in diff_ids], len(missing)
+
+
+def cached_layer_size(diff_id: str):
+    """Uncompressed size of a layer parsed by any earlier analysis, or None."""
+    return layer_size_cache.get(make_key("layer_size", diff_id))
+
+
+def image_inventory(layers: list):
+    """Installed packages and runtime hints of the final image, derived from per-layer results."""
+    packages = {}
+    hints = set()
+    for layer in layers:
+        for ecosystem, found in layer.packages.items():
+            if ecosystem in layer.package_dbs:
+                packages[ecosystem] = dict(found)
+            else:
+                packages.setdefault(ecosystem, {}).update(found)
+        hints.update(layer.runtime_hints)
+    return packages, sorted(hints)
+
+
+def _remove_subtree(visible: dict, root: str):
+    """Removes everything under directory `root`; returns the removed {path: (layer, size)}."""
+    prefix = root + "/" if root else ""
+    removed = {p: v for p, v in visible.items() if p.startswith(prefix)}
+    for p in removed:
+        del visible[p]
+    return removed
+
+
+def compute_efficiency(layers: list, diff_ids: list = None):
+    """
+    Overlays the layers in order and accounts for bytes that no longer reach the final filesystem:
+    files overwritten by a later layer, or deleted by a later whiteout. The efficiency score is the
+    share of all layer bytes that is still visible, as in `dive`.
+    """
+    visible = {}        # path -> (layer index, size)
+    visible_dirs = set()
+    wasted_by_layer = [0] * len(layers)
+    wasted_by_path = {}  # path -> [dead copies, dead bytes]
+
+    def _waste(path, owner, size):
+        wasted_by_layer[owner] += size
+        entry = wasted_by_path.setdefault(path, [0, 0])
+        entry[0] += 1
+        entry[1] += size
+
+    for index, layer in enumerate(layers):
+        for directory in layer.opaque:
+            for path, (owner, size) in _remove_subtree(visible, directory).items():
+                _waste(path, owner, size)
+        for target in layer.whiteouts:
+            if target in visible:
+                owner, size = visible.pop(target)
+                _waste(target, owner, size)
+            if target in visible_dirs:
+                visible_dirs.discard(target)
+                for path, (owner, size) in _remove_subtree(visible, target).items():
+                    _waste(path, owner, size)
+        for path, size in layer.files.items():
+            previous = visible.get(path)
+            if previous is not None:
+                _waste(path, *previous)
+            visible[path] = (index, size)
+        visible_dirs.update(layer.dirs)
+
+    caches = {}
+    cache_by_layer = [0] * len(layers)
+    for path, (owner, size) in visible.items():
+        for manager, pattern in PACKAGE_CACHES:
+            if pattern.match(path):
+                entry = caches.setdefault(manager, {"manager": manager, "bytes": 0, "files": 0, "layers": set()})
+                entry["bytes"] += size
+                entry["files"] += 1
+                entry["layers"].add(owner)
+                cache_by_layer[owner] += size
+                break
+
+    total = sum(layer.size for layer in layers)
+    wasted = sum(wasted_by_layer)
+    cache_bytes = sum(c["bytes"] for c in caches.values())
+    top_wasted = sorted(wasted_by_path.items(), key=lambda item: item[1][1], reverse=True)[:TOP_WASTED_FILES]
+    return {
+        "total_bytes": total,
+        "visible_bytes": total - wasted,
+        "wasted_bytes": wasted,
+        "cache_bytes": cache_bytes,
+        "potential_savings_bytes": wasted + cache_bytes,
+        "efficiency": round((total - wasted) / total, 4) if total else 1.0,
+        "layers": [
+            {
+                "index": i,
+                "diff_id": diff_ids[i] if diff_ids and i < len(diff_ids) else None,
+                "size_bytes": layer.size,
+                "file_count": len(layer.files),
+                "wasted_bytes": wasted_by_layer[i],
+                "cache_bytes": cache_by_layer[i],
+            }
+            for i, layer in enumerate(layers)
+        ],
+        "package_caches": sorted(
+            ({**c, "layers": sorted(c["layers"])} for c in caches.values()),
+            key=lambda c: c["bytes"], reverse=True,
+        ),
+        "top_wasted_files": [
+            {"path": "/" + path, "dead_copies": copies, "wasted_bytes": size}
+            for path, (copies, size) in top_wasted
+        ],
+    }
+
+
+@reporting_failures()
+def analyze_layers(image_ref: str):
+    """
+    Measures wasted bytes and the efficiency score of a LOCAL image by streaming its layers.
+    Concurrent requests for the same image share one export.
+    """
+    client = get_docker_client()
+    image = resolve_image(client, image_ref)
+
+    size_mb = image.attrs.get("Size", 0) / (1024 * 1024)
+    if size_mb > LAYER_ANALYSIS_MAX_MB:
+        return {
+            "status": "skipped",
+            "error": f"Image is {size_mb:.0f} MB; layer analysis is limited to {LAYER_ANALYSIS_MAX_MB:.0f} MB (LAYER_ANALYSIS_MAX_MB).",
+        }
+
+    cache_key = make_key("layer_analysis", image.id, LAYER_ANALYZER_VERSION)
+    return layer_analysis_cache.get_or_compute(cache_key, lambda: _analyze_export(client, image))
+
+
+def _analyze_export(client, image):
+    diff_ids = image.attrs.get("RootFS", {}).get("Layers") or []
+    layers, parsed = load_layers(
+        image.id, diff_ids, lambda: client.api.get_image(image.id, chunk_size=LAYER_ANALYSIS_CHUNK_SIZE)
+    )
+    packages, runtime_hints = image_inventory(layers)
+    return {
+        "status": "ok",
+        "image_id": image.id,
+        **compute_efficiency(layers, diff_ids),
+        "packages": {ecosystem: len(found) for ecosystem, found in sorted(packages.items())},
+        "runtime_hints": runtime_hints,
+        "layers_parsed": parsed,
+        "layers_cached": len(set(diff_ids)) - parsed,
+    }
+
+
+def _mb(size: int) -> float:
+    return round(size / (1024 * 1024), 1)
+
+
+def layer_misconfigs(layer_analysis: dict):
+    """Findings backed by measured layer bytes, in the same shape as the rule engine's misconfigurations."""
+    if layer_analysis.get("status") != "ok":
+        return []
+
+    issues = []
+    if layer_analysis["wasted_bytes"] >= LAYER_WASTE_MIN_MB * 1024 * 1024:
+        paths = ", ".join(f["path"] for f in layer_analysis["top_wasted_files"][:3])
+        issues.append({
+            "id": "LAYER_WASTED_BYTES",
+            "severity": "MEDIUM",
+            "message": (f"{_mb(layer_analysis['wasted_bytes'])} MB in lower layers is overwritten or deleted by later layers "
+                        f"(efficiency {layer_analysis['efficiency']:.0%}; largest: {paths})"),
+            "recommendation": "Remove or replace files in the same RUN that creates them, or copy only the final artifacts from a build stage.",
+        })
+    for cache in layer_analysis["package_caches"]:
+        if cache["bytes"] < LAYER_WASTE_MIN_MB * 1024 * 1024:
+            continue
+        issues.append({
+            "id": "LAYER_PACKAGE_CACHE",
+            "severity": "LOW",
+            "message": f"{cache['manager']} cache left in the image ({_mb(cache['bytes'])} MB in {cache['files']} files)",
+            "recommendation": f"Clean the {cache['manager']} cache in the same RUN that installs packages (or use a cache mount).",
+        })
+    return issues
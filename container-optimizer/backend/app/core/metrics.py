@@ -0,0 +1,191 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus text exposition (format 0.0.4) without a client library dependency.
+# Every update is a dict lookup plus a few additions under a lock, so it is cheap enough to leave on.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = []
+    for k, v in pairs:
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{k}="{v}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(l, "") for l in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(l, "") for l in self.labelnames)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = [("le", "+Inf" if bound == float("inf") else repr(float(bound)))]
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(float(series[-2]))}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def register_collector(fn):
+    """Registers fn() -> list of (name, type, documentation, [(labels_dict, value), ...]) evaluated at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render_latest() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        for name, metric_type, documentation, samples in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# --- Application metrics ---
+
+http_requests_total = Counter(
+    "optimizer_http_requests_total", "HTTP requests by route, method and status code.", ("method", "route", "status")
+)
+http_request_duration_seconds = Histogram(
+    "optimizer_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+stage_duration_seconds = Histogram(
+    "optimizer_pipeline_stage_duration_seconds", "Report pipeline stage latency.", ("stage", "status")
+)
+external_call_duration_seconds = Histogram(
+    "optimizer_external_call_duration_seconds",
+    "Latency of calls to external dependencies (docker, trivy, groq, github).",
+    ("dependency", "operation", "outcome"),
+)
+subprocess_runs_total = Counter(
+    "optimizer_subprocess_runs_total", "Spawned subprocesses by command and outcome (ok, error, timeout).", ("command", "outcome")
+)
+ai_prompt_tokens = Histogram(
+    "optimizer_ai_prompt_tokens", "AI prompt size in tokens (estimated before sending, reported by the provider after).",
+    ("source",), buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+ai_response_seconds = Histogram(
+    "optimizer_ai_response_seconds", "Time from submitting an AI call to its response, including rate-limit wait.",
+    ("outcome",),
+)
+ai_fallbacks_total = Counter(
+    "optimizer_ai_fallbacks_total", "Reports that fell back to rule-based suggest_dockerfile.", ("reason",)
+)
+
+
+@contextmanager
+def observe_call(dependency: str, operation: str):
+    """Times a block calling an external dependency; outcome is 'error' if it raises."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        external_call_duration_seconds.observe(
+            time.perf_counter() - started, dependency=dependency, operation=operation, outcome=outcome
+        )
+
+
+def track_call(dependency: str, operation: str = None):
+    """Decorator form of observe_call; the operation defaults to the function name."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with observe_call(dependency, operation or fn.__name__):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_subprocess(command: str, outcome: str):
+    subprocess_runs_total.inc(command=command, outcome=outcome)
+
+
+def record_stage(stage: str, status: str, duration_ms: float):
+    stage_duration_seconds.observe(duration_ms / 1000, stage=stage, status=status)
+
+
+@register_collector
+def _cache_metrics():
+    from app.core.cache import all_cache_stats
+    stats = all_cache_stats()
+    return [
+        ("optimizer_cache_hits_total", "counter", "Cache hits by cache.",
+         [({"cache": s["name"]}, s["hits"]) for s in stats]),
+        ("optimizer_cache_misses_total", "counter", "Cache misses by cache.",
+         [({"cache": s["name"]}, s["misses"]) for s in stats]),
+        ("optimizer_cache_hit_ratio", "gauge", "Cache hit ratio since start.",
+         [({"cache": s["name"]}, s["hit_ratio"]) for s in stats]),
+        ("optimizer_cache_entries", "gauge", "Current number of cached entries.",
+         [({"cache": s["name"]}, s["entries"]) for s in stats]),
+    ]
@@ -1,9 +1,17 @@
 import docker
-from app.docker.client import get_docker_client
+from app.docker.client import get_docker_client, reporting_failures
 from app.core.report.report_builder import build_report
 from fastapi import HTTPException
+from app.core.singleflight import SingleFlight
 
-def scan_registry_image(image_ref: str):
+# Concurrent scans of the same reference share one pull
+_pulls = SingleFlight("registry_pull")
+
+@reporting_failures()
+def _pull(client, image_ref: str):
+    client.images.pull(image_ref)
+
+def scan_registry_image(image_ref: str, on_section=None):
     client = get_docker_client()
     
     try:
@@ -11,15 +19,19 @@ def scan_registry_image(image_ref: str):
         # This will follow normal Docker Hub / Registry logic
         print(f"Pulling image: {image_ref}...")
         try:
-            client.images.pull(image_ref)
+            # The pulled Image is not returned: single-flight results are copied per caller
+            _pulls.do(image_ref, lambda: _pull(client, image_ref))
         except docker.errors.APIError as e:
             if "not found" in str(e).lower():
                 raise HTTPException(status_code=404, detail=f"Image {image_ref} not found on Docker Hub")
             raise HTTPException(status_code=500, detail=f"Failed to pull image: {str(e)}")
-        
+
+        if on_section:
+            on_section("pull", {"image": image_ref, "status": "pulled"})
+
         # 2. Run the unified report builder
         # Since the image is now local, build_report will work perfectly
-        report = build_report(image_ref)
+        report = build_report(image_ref, on_section=on_section)
         
         # Mark it as a registry scan for frontend differentiation
         report["is_registry"] = True
@@ -0,0 +1,148 @@
+import re
+
+_TAG_RE = re.compile(r"\[([A-Z0-9_]+)\]")
+# Length of the substrings message words are indexed by; shorter identifiers fall back to a full scan
+_GRAM = 4
+
+
+def _extract_tag(message: str):
+    """Extracts [TAG] from the beginning of a message."""
+    match = _TAG_RE.search(message)
+    return match.group(1) if match else None
+
+def _normalize(text: str):
+    """Normalizes text for fuzzy matching."""
+    return re.sub(r'[^a-z0-9]', '', text.lower())
+
+def _ai_recommendation(warning: str, default: str):
+    # Map specific AI warnings to technical resolutions to avoid "See AI reasoning"
+    w_low = warning.lower()
+    if "root" in w_low: return "Add a non-root USER and set appropriate permissions."
+    elif "stage" in w_low: return "Use multi-stage builds to reduce image footprint."
+    elif "secret" in w_low or "token" in w_low: return "Use build secrets or environment variables instead of hardcoding."
+    elif "tool" in w_low or "install" in w_low: return "Clean package manager caches (apt/apk cleanup) in the same layer."
+    return default
+
+def _vulnerability_resolution(v: dict):
+    if v.get("resolution"):
+        return v["resolution"]
+    if v.get("fixed_version") and v.get("package"):
+        return f"Upgrade {v['package']} to {v['fixed_version']} or later."
+    return ""
+
+
+class FindingsIndex:
+    """
+    Ordered list of findings with hash indexes on IDs, normalized messages and message substrings,
+    so rule, AI and scanner findings can be merged without rescanning the whole list per item.
+    """
+
+    def __init__(self):
+        self.findings = []
+        self._norms = []        # normalized message per finding (same order as findings)
+        self._by_id = {}        # id -> position of first finding with that id
+        self._words = set()     # whitespace-separated words present in any message
+        self._grams = {}        # every _GRAM-character substring of a word -> words containing it
+
+    def add(self, finding: dict):
+        position = len(self.findings)
+        self.findings.append(finding)
+        self._norms.append(_normalize(finding["message"]))
+        if finding.get("id"):
+            self._by_id.setdefault(finding["id"], position)
+        for word in finding["message"].split():
+            if word in self._words:
+                continue  # scanner titles repeat the same words thousands of times
+            self._words.add(word)
+            for gram in {word[i:i + _GRAM] for i in range(len(word) - _GRAM + 1)}:
+                self._grams.setdefault(gram, []).append(word)
+
+    def match_warning(self, tag, warning_norm: str):
+        """
+        Position of the first finding that shares the tag or whose normalized message
+        contains (or is contained in) the warning. Mirrors a front-to-back scan.
+        """
+        tag_pos = self._by_id.get(tag) if tag else None
+        limit = tag_pos if tag_pos is not None else len(self._norms)
+        for position in range(limit):
+            f_norm = self._norms[position]
+            if warning_norm in f_norm or f_norm in warning_norm:
+                return position
+        return tag_pos
+
+    def mentions(self, identifier: str) -> bool:
+        """True if any message contains the identifier as a substring (e.g. inside 'pkg:CVE-2023-1234')."""
+        if len(identifier) < _GRAM or identifier != "".join(identifier.split()):
+            return any(identifier in f["message"] for f in self.findings)
+        # Without whitespace, the identifier sits inside a single word; only words holding its
+        # rarest substring can contain it, so confirm just those
+        candidates = min(
+            (self._grams.get(identifier[i:i + _GRAM], ()) for i in range(len(identifier) - _GRAM + 1)),
+            key=len,
+        )
+        return any(identifier in word for word in candidates)
+
+
+def merge_findings(misconfigs: list, security_warnings: list, vulnerabilities: list, ai_default_recommendation: str):
+    """
+    Merges rule-engine misconfigurations, AI security warnings and HIGH/CRITICAL scanner results
+    into a single de-duplicated findings list.
+    - AI warnings matching a rule finding (by [TAG] or fuzzy message) mark it as "hybrid" instead of duplicating it.
+    - Scanner results are skipped when their ID is already mentioned by an earlier finding.
+    """
+    index = FindingsIndex()
+
+    # 1. Misconfigurations (Rules Engine)
+    for m in misconfigs:
+        index.add({
+            "id": m.get("id"),
+            "category": "ANALYSIS",
+            "message": m["message"],
+            "severity": m.get("severity", "MEDIUM"),
+            "recommendation": m.get("recommendation", ""),
+            "source": "rules"
+        })
+
+    # 2. AI (Deep Semantic Analysis)
+    for w in security_warnings:
+        ai_tag = _extract_tag(w)
+        w_clean = _TAG_RE.sub("", w).strip()
+
+        position = index.match_warning(ai_tag, _normalize(w_clean))
+        if position is not None:
+            # Corroborated by AI
+            index.findings[position]["source"] = "hybrid"
+            continue
+
+        index.add({
+            "id": ai_tag,
+            "category": "ANALYSIS",
+            "message": w_clean,
+            "severity": "HIGH",
+            "recommendation": _ai_recommendation(w_clean, ai_default_recommendation),
+            "source": "ai"
+        })
+
+    # 3. Security (High/Critical)
+    for v in vulnerabilities:
+        if v.get("severity") in ["HIGH", "CRITICAL"]:
+            v_id = v.get('id', 'unknown')
+            if not index.mentions(v_id):
+                index.add({
+                    "id": v_id,
+                    "category": "SECURITY",
+                    "message": f"{v['title']} ({v_id})",
+                    "severity": v["severity"],
+                    "recommendation": _vulnerability_resolution(v),
+                    "source": "security_scanner"
+                })
+
+    # Final Deduplication & Cleanup
+    unique_findings = []
+    seen_msgs = set()
+    for f in index.findings:
+        msg_norm = f["message"].lower().strip()
+        if msg_norm not in seen_msgs:
+            unique_findings.append(f)
+            seen_msgs.add(msg_norm)
+    return unique_findings
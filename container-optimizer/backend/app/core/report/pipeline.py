@@ -0,0 +1,113 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.core.metrics import record_stage
+
+
+class Stage:
+    """
+    A single step of a report pipeline.
+    `fn` is called with the results of the stages listed in `requires` as keyword arguments.
+    If the stage fails or exceeds `timeout` seconds, `fallback(error, **inputs)` provides its result.
+    """
+
+    def __init__(self, name: str, fn, requires=(), timeout: float = None, fallback=None):
+        self.name = name
+        self.fn = fn
+        self.requires = tuple(requires)
+        self.timeout = timeout
+        self.fallback = fallback
+
+
+class StageTimeout(Exception):
+    pass
+
+
+def _stage_deadline(stage: Stage, started: float, run_deadline: float = None):
+    """Earliest of the stage's own timeout and, for stages that can degrade, the run deadline."""
+    candidates = []
+    if stage.timeout is not None:
+        candidates.append(started + stage.timeout)
+    if run_deadline is not None and stage.fallback is not None:
+        candidates.append(run_deadline)
+    return min(candidates) if candidates else None
+
+
+def run_stages(stages: list, max_workers: int = None, on_stage=None, deadline: float = None):
+    """
+    Runs stages concurrently, starting each one as soon as all of its requirements are available.
+    Returns (results, timings) where timings maps stage name -> {"status", "duration_ms"}.
+    A stage that fails without a fallback aborts the whole run by re-raising its error.
+    `on_stage(name, result)` is called from the calling thread as each stage settles.
+    `deadline` (seconds from start) bounds the whole run: stages with a fallback still running at that
+    point time out. Stages without a fallback are required and only honor their own timeout.
+    """
+    by_name = {s.name: s for s in stages}
+    for s in stages:
+        missing = [r for r in s.requires if r not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{s.name}' requires unknown stage(s): {', '.join(missing)}")
+
+    results = {}
+    timings = {}
+    pending = dict(by_name)
+    running = {}  # future -> (stage, inputs, started_at)
+    run_started = time.monotonic()
+    run_deadline = run_started + deadline if deadline is not None else None
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1, thread_name_prefix="report-stage")
+
+    def _finish(stage, started, status, value):
+        results[stage.name] = value
+        timings[stage.name] = {
+            "status": status,
+            "duration_ms": round((time.monotonic() - started) * 1000, 1),
+        }
+        record_stage(stage.name, status, timings[stage.name]["duration_ms"])
+        if on_stage is not None:
+            on_stage(stage.name, value)
+
+    def _fail(stage, inputs, started, status, error):
+        if stage.fallback is None:
+            raise error
+        _finish(stage, started, status, stage.fallback(error, **inputs))
+
+    try:
+        while pending or running:
+            # 1. Launch every stage whose inputs are ready
+            for name, stage in list(pending.items()):
+                if all(r in results for r in stage.requires):
+                    inputs = {r: results[r] for r in stage.requires}
+                    future = executor.submit(stage.fn, **inputs)
+                    running[future] = (stage, inputs, time.monotonic())
+                    del pending[name]
+
+            if not running:
+                raise RuntimeError(f"Unresolvable stage dependencies: {', '.join(pending)}")
+
+            # 2. Wait for the next completion or the nearest stage deadline
+            deadlines = [d for d in (_stage_deadline(s, started, run_deadline) for s, _, started in running.values()) if d is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage, inputs, started = running.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    _fail(stage, inputs, started, "failed", e)
+                else:
+                    _finish(stage, started, "ok", value)
+
+            # 3. Give up on stages that ran out of time (their threads finish in the background)
+            now = time.monotonic()
+            for future, (stage, inputs, started) in list(running.items()):
+                stage_deadline = _stage_deadline(stage, started, run_deadline)
+                if stage_deadline is not None and now >= stage_deadline:
+                    del running[future]
+                    _fail(stage, inputs, started, "timeout",
+                          StageTimeout(f"Stage '{stage.name}' timed out after {round(now - started, 1)}s"))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    timings["total"] = {"status": "ok", "duration_ms": round((time.monotonic() - run_started) * 1000, 1)}
+    return results, timings
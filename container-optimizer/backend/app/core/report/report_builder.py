@@ -1,270 +1,317 @@
+import os
 import re
+import time
 from app.core.image_analyzer import analyze_image
+from app.core.layer_analyzer import analyze_layers, layer_misconfigs
 from app.core.analyzers.runtime_analyzer import analyze_runtime
-from app.core.analyzers.security_analyzer import analyze_security, analyze_dockerfile_security
-from app.core.analyzers.misconfig_analyzer import analyze_misconfig
+from app.core.analyzers.security_analyzer import analyze_security, analyze_dockerfile_security, dockerfile_engines
+from app.core.analyzers.misconfig_analyzer import analyze_misconfig, RULESET_VERSION
+from app.core.analyzers.dockerfile_checks import CHECKS_VERSION
 from app.core.suggestors.dockerfile_suggestor import suggest_dockerfile
 from app.core.dockerfile_analyzer import analyze_dockerfile_content
-from app.core.ai_service import optimize_with_ai
+from app.core.ai_service import optimize_with_ai, GROQ_MODEL
+from app.core.ai_scheduler import PRIORITY_INTERACTIVE
+from app.core.security_scanner import get_trivy_version_info
+from app.core.report.pipeline import Stage, StageTimeout, run_stages
+from app.core.cache import TTLCache, make_key
+from app.core.report.findings import merge_findings
+from app.core.metrics import ai_fallbacks_total, record_stage
 
+# Per-stage timeouts (seconds). Trivy itself is capped at 60s/30s inside security_scanner.
+STAGE_TIMEOUTS = {
+    "image": 30,
+    "layers": 60,
+    "runtime": 15,
+    "security": 75,
+    "recommendation": 45,
+}
 
-def _extract_tag(message: str):
-    """Extracts [TAG] from the beginning of a message."""
-    match = re.search(r"\[([A-Z0-9_]+)\]", message)
-    return match.group(1) if match else None
+# Share of a caller's time budget that each degradable stage may use. Security starts right away;
+# the AI call starts after the rule engine, and the run deadline caps both.
+BUDGET_SHARES = {
+    "layers": 0.9,
+    "security": 0.9,
+    "recommendation": 0.8,
+}
 
-def _normalize(text: str):
-    """Normalizes text for fuzzy matching."""
-    return re.sub(r'[^a-z0-9]', '', text.lower())
+def _stage_timeout(name: str, time_budget: float = None, default: float = None):
+    timeout = default or STAGE_TIMEOUTS[name]
+    if time_budget:
+        return min(timeout, time_budget * BUDGET_SHARES[name])
+    return timeout
 
+# Reports for unchanged Dockerfiles (CI re-sends the same content on every push)
+static_report_cache = TTLCache(
+    "static_report",
+    max_entries=int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256")),
+    ttl_seconds=float(os.getenv("REPORT_CACHE_TTL_SECONDS", "3600")),
+)
 
-def build_report(image_name: str, dockerfile_content: str = None, container_id: str = None):
-    image = analyze_image(image_name)
-    runtime = analyze_runtime(image_name, container_id=container_id)
-    security = analyze_security(image_name)
-    misconfigs = analyze_misconfig(image, runtime)
 
-    # Prepare context for AI
-    image_context = {
-        "image": image_name,
-        "runtime": runtime.get("runtime", "unknown"),
-        "misconfigurations": misconfigs,
-        "summary": {
-            "image_size_mb": image["total_size_mb"],
-            "layer_count": image["layer_count"],
-            "runs_as_root": runtime["runs_as_root"],
+def _security_unavailable(error: Exception):
+    """
+    Result used when a security scan stage fails or exceeds its timeout.
+    A timed-out scan keeps running in the background and caches its result for the next request.
+    """
+    if isinstance(error, StageTimeout):
+        return {
+            "status": "pending",
+            "error": "Security scan did not finish within the time budget; results will be attached on the next request.",
+            "total_vulnerabilities": 0,
+            "by_severity": {},
+            "vulnerabilities": [],
         }
+    return {
+        "status": "error",
+        "error": str(error),
+        "total_vulnerabilities": 0,
+        "by_severity": {},
+        "vulnerabilities": [],
     }
-    
-    # Use AI for optimization and reasoning
-    try:
-        recommendation = optimize_with_ai(image_context, dockerfile_content)
-    except Exception:
-        # Fallback to rule-based if AI fails
-        dockerfile_suggestion = suggest_dockerfile(image, runtime, misconfigs)
-        recommendation = {
-            "optimized_dockerfile": dockerfile_suggestion,
-            "explanation": ["AI Optimization was unavailable, showing rule-based suggestions."],
-            "security_warnings": []
+
+def _layers_unavailable(error: Exception):
+    """Result used when the layer export fails or exceeds its timeout; a timed-out export still fills the cache."""
+    if isinstance(error, StageTimeout):
+        return {"status": "pending", "error": "Layer analysis did not finish within the time budget."}
+    return {"status": "error", "error": str(error)}
+
+def _rule_based_recommendation(error, image_analysis, runtime, misconfigs):
+    """Fallback recommendation used when the AI stage fails or exceeds its timeout."""
+    timed_out = isinstance(error, StageTimeout)
+    ai_fallbacks_total.inc(reason="timeout" if timed_out else "error")
+    dockerfile_suggestion = suggest_dockerfile(image_analysis, runtime, misconfigs)
+    explanation = ("AI Optimization did not finish in time, showing rule-based suggestions." if timed_out
+                   else "AI Optimization was unavailable, showing rule-based suggestions.")
+    return {
+        "optimized_dockerfile": dockerfile_suggestion,
+        "explanation": [explanation],
+        "security_warnings": []
+    }
+
+def _pending_sections(timings: dict):
+    """Sections whose stage timed out; their late results land in the caches for the next request."""
+    return [STAGE_SECTIONS[name] for name, t in timings.items() if name in STAGE_SECTIONS and t["status"] == "timeout"]
+
+
+# Section names pushed to streaming clients as each stage settles
+STAGE_SECTIONS = {
+    "image": "image_analysis",
+    "layers": "layer_analysis",
+    "runtime": "runtime_analysis",
+    "misconfigs": "misconfigurations",
+    "security": "security_summary",
+    "recommendation": "recommendation",
+}
+
+def _security_summary(security: dict):
+    return {k: v for k, v in security.items() if k != "vulnerabilities"}
+
+def _section_emitter(on_section):
+    """Adapts an on_section(section, data) callback to the pipeline's on_stage hook."""
+    if on_section is None:
+        return None
+
+    def _on_stage(name, value):
+        if name == "security":
+            value = _security_summary(value)
+        on_section(STAGE_SECTIONS[name], value)
+    return _on_stage
+
+def replay_sections(report: dict, on_section):
+    """Emits every section of an already computed report, e.g. one served from cache."""
+    if on_section is None:
+        return
+    on_section("image_analysis", report["image_analysis"])
+    if "layer_analysis" in report:
+        on_section("layer_analysis", report["layer_analysis"])
+    on_section("runtime_analysis", report["runtime_analysis"])
+    on_section("misconfigurations", report["misconfigurations"])
+    on_section("security_summary", _security_summary(report["security_analysis"]))
+    on_section("recommendation", report["recommendation"])
+    on_section("findings", report["findings"])
+
+
+def build_report(image_name: str, dockerfile_content: str = None, container_id: str = None, on_section=None,
+                 ai_priority: int = PRIORITY_INTERACTIVE, time_budget: float = None):
+    """
+    Builds the full image report. `on_section(section, data)` is called as each part becomes available.
+    `ai_priority` orders the AI call in the shared scheduler (lower runs first).
+    `time_budget` (seconds) bounds the security scan and AI call; whatever does not finish in time
+    degrades to a pending marker / rule-based suggestion and is listed in the report's "pending".
+    """
+    def _optimize(image, runtime, misconfigs):
+        # Prepare context for AI
+        image_context = {
+            "image": image_name,
+            "image_id": image.get("image_id"),
+            "runtime": runtime.get("runtime", "unknown"),
+            "misconfigurations": misconfigs,
+            "summary": {
+                "image_size_mb": image["total_size_mb"],
+                "layer_count": image["layer_count"],
+                "runs_as_root": runtime["runs_as_root"],
+            }
         }
+        # Use AI for optimization and reasoning
+        return optimize_with_ai(image_context, dockerfile_content, priority=ai_priority)
 
-    raw_findings = []
-    # 1. Runtime Insights (Rule Engine)
-    for m in misconfigs:
-        raw_findings.append({
-            "id": m.get("id"),
-            "category": "ANALYSIS",
-            "message": m["message"],
-            "severity": m.get("severity", "MEDIUM"),
-            "recommendation": m.get("recommendation", ""),
-            "source": "rules"
-        })
-        
-    # 2. AI Semantic Checks (Deep Reasoning)
-    for w in recommendation.get("security_warnings", []):
-        ai_tag = _extract_tag(w)
-        w_clean = re.sub(r"\[[A-Z0-9_]+\]", "", w).strip()
-        
-        # Check against already added findings (usually rule-based misconfigs)
-        is_duplicate = False
-        for f in raw_findings:
-            f_id = f.get("id")
-            # 1. Match by Tag/ID
-            if ai_tag and f_id and ai_tag == f_id:
-                is_duplicate = True
-                # Enhance existing finding with AI flavor if needed
-                f["source"] = "hybrid" # Mark as corroborated by AI
-                break
-            
-            # 2. Fuzzy match by content
-            f_norm = _normalize(f["message"])
-            w_norm = _normalize(w_clean)
-            if w_norm in f_norm or f_norm in w_norm:
-                is_duplicate = True
-                f["source"] = "hybrid"
-                break
-        
-        if not is_duplicate:
-            # Map specific AI warnings to technical resolutions to avoid "See AI reasoning"
-            rec = "Apply the suggested architecture in the optimized Dockerfile."
-            w_low = w_clean.lower()
-            if "root" in w_low: rec = "Add a non-root USER and set appropriate permissions."
-            elif "stage" in w_low: rec = "Use multi-stage builds to reduce image footprint."
-            elif "secret" in w_low or "token" in w_low: rec = "Use build secrets or environment variables instead of hardcoding."
-            elif "tool" in w_low or "install" in w_low: rec = "Clean package manager caches (apt/apk cleanup) in the same layer."
-            
-            raw_findings.append({
-                "id": ai_tag,
-                "category": "ANALYSIS",
-                "message": w_clean,
-                "severity": "HIGH",
-                "recommendation": rec,
-                "source": "ai"
-            })
-
-    # Verified Security CVEs (Only if scan was successful)
-    for v in security.get("vulnerabilities", []):
-        if v.get("severity") in ["HIGH", "CRITICAL"]:
-            v_id = v.get('id', 'unknown')
-            msg = f"{v['title']} ({v_id})"
-            
-            is_seen = False
-            for f in raw_findings:
-                if v_id in f["message"]:
-                    is_seen = True
-                    break
-            
-            if not is_seen:
-                raw_findings.append({
-                    "id": v_id,
-                    "category": "SECURITY",
-                    "message": msg,
-                    "severity": v["severity"],
-                    "recommendation": v.get("resolution", ""),
-                    "source": "security_scanner"
-                })
-
-    # Final Deduplicate
-    unique_findings = []
-    seen = set()
-    for f in raw_findings:
-        if f["message"].lower().strip() not in seen:
-            unique_findings.append(f)
-            seen.add(f["message"].lower().strip())
+    # History, layer export, runtime inspection and Trivy are independent; the AI only waits for the misconfigs.
+    results, timings = run_stages([
+        Stage("image", lambda: analyze_image(image_name), timeout=STAGE_TIMEOUTS["image"]),
+        Stage("layers", lambda: analyze_layers(image_name), timeout=_stage_timeout("layers", time_budget),
+              fallback=_layers_unavailable),
+        Stage("runtime", lambda: analyze_runtime(image_name, container_id=container_id), timeout=STAGE_TIMEOUTS["runtime"]),
+        Stage("security", lambda: analyze_security(image_name), timeout=_stage_timeout("security", time_budget),
+              fallback=_security_unavailable),
+        Stage("misconfigs", lambda image, runtime: analyze_misconfig(image, runtime), requires=("image", "runtime")),
+        Stage("recommendation", _optimize, requires=("image", "runtime", "misconfigs"),
+              timeout=_stage_timeout("recommendation", time_budget),
+              # Fallback to rule-based if AI fails
+              fallback=lambda e, image, runtime, misconfigs: _rule_based_recommendation(e, image, runtime, misconfigs)),
+    ], on_stage=_section_emitter(on_section), deadline=time_budget)
+    image = results["image"]
+    runtime = results["runtime"]
+    layers = results["layers"]
+    security = results["security"]
+    misconfigs = results["misconfigs"]
+    recommendation = results["recommendation"]
+
+    merge_started = time.monotonic()
+    unique_findings = merge_findings(
+        # Measured layer waste is merged after the fact so the AI call does not wait for the export
+        misconfigs + layer_misconfigs(layers),
+        recommendation.get("security_warnings", []),
+        security.get("vulnerabilities", []),
+        ai_default_recommendation="Apply the suggested architecture in the optimized Dockerfile.",
+    )
+    timings["findings"] = {"status": "ok", "duration_ms": round((time.monotonic() - merge_started) * 1000, 1)}
+    record_stage("findings", "ok", timings["findings"]["duration_ms"])
+
+    if on_section:
+        on_section("findings", unique_findings)
 
     return {
         "image": image_name,
         "summary": {
             "image_size_mb": image["total_size_mb"],
             "layer_count": image["layer_count"],
+            "layer_efficiency": layers.get("efficiency"),
+            "wasted_mb": round(layers["wasted_bytes"] / (1024 * 1024), 2) if layers.get("status") == "ok" else None,
             "runs_as_root": runtime["runs_as_root"],
             "security_scan_status": security["status"],
             "misconfiguration_count": len(misconfigs),
         },
         "image_analysis": image,
+        "layer_analysis": layers,
         "runtime_analysis": runtime,
         "security_analysis": security,
         "misconfigurations": misconfigs,
         "recommendation": recommendation,
         "findings": unique_findings,
+        "pending": _pending_sections(timings),
+        "timings": timings,
     }
 
-def build_static_report(dockerfile_content: str):
-    image_analysis = analyze_dockerfile_content(dockerfile_content)
-    runtime = image_analysis["runtime_analysis"]
-    
-    # Run static security scan (Trivy config scan)
-    security = analyze_dockerfile_security(dockerfile_content)
-    
-    misconfigs = analyze_misconfig(image_analysis, runtime)
-    
-    # Check for secrets in ENV/ARG statically (simple regex fallback)
-    secrets = _detect_static_secrets(dockerfile_content)
-    # Filter out duplicates if Trivy already caught them
-    existing_messages = [m["message"] for m in misconfigs]
-    for s in secrets:
-        if s["message"] not in existing_messages:
-            misconfigs.append(s)
-
-    # Prepare context for AI
-    image_context = {
-        "image": "uploaded_dockerfile",
-        "runtime": image_analysis.get("runtime", "unknown"),
-        "misconfigurations": misconfigs,
-        "summary": {
-            "layer_count": len(image_analysis["layers"]),
-            "runs_as_root": runtime["runs_as_root"],
-        }
-    }
+def _canonical_dockerfile(content: str) -> str:
+    """
+    Normalizes line endings and trailing whitespace only.
+    Line numbers are kept intact because findings reference them.
+    """
+    lines = [line.rstrip() for line in content.replace("\r\n", "\n").replace("\r", "\n").split("\n")]
+    return "\n".join(lines).rstrip("\n")
+
+def static_report_cache_key(dockerfile_content: str, deep_scan: bool = False) -> str:
+    engines = dockerfile_engines(deep_scan or None)
+    return make_key(
+        "static_report",
+        _canonical_dockerfile(dockerfile_content),
+        RULESET_VERSION,
+        engines,
+        CHECKS_VERSION if "native" in engines else None,
+        GROQ_MODEL,
+        get_trivy_version_info() if "trivy" in engines else None,
+    )
+
+def build_static_report(dockerfile_content: str, on_section=None, ai_priority: int = PRIORITY_INTERACTIVE,
+                        ai_timeout: float = None, time_budget: float = None, deep_scan: bool = False):
+    """
+    Builds a report from Dockerfile content alone. `on_section(section, data)` is called as each part becomes available.
+    Batch callers pass a lower `ai_priority` and a longer `ai_timeout`, since their AI calls queue behind rate limits.
+    `time_budget` (seconds) bounds the run as in build_report; partial reports are not cached.
+    `deep_scan` adds a `trivy config` scan to the native Dockerfile checks when those are enabled.
+    """
+    cache_key = static_report_cache_key(dockerfile_content, deep_scan)
+    cached = static_report_cache.get(cache_key)
+    if cached is not None:
+        cached["cached"] = True
+        replay_sections(cached, on_section)
+        return cached
+
+    report = _build_static_report(dockerfile_content, on_section=on_section, ai_priority=ai_priority,
+                                  ai_timeout=ai_timeout, time_budget=time_budget, deep_scan=deep_scan)
+
+    # Only keep complete reports; a timed-out or failed stage (or scan engine) should be retried next time
+    engines = report["security_analysis"].get("engines", {})
+    if all(t["status"] == "ok" for t in report["timings"].values()) and all(s == "ok" for s in engines.values()):
+        static_report_cache.set(cache_key, report)
+    return report
+
+def _build_static_report(dockerfile_content: str, on_section=None, ai_priority: int = PRIORITY_INTERACTIVE,
+                         ai_timeout: float = None, time_budget: float = None, deep_scan: bool = False):
+    def _misconfigs(image):
+        misconfigs = analyze_misconfig(image, image["runtime_analysis"])
 
-    # Use AI for optimization and reasoning
-    try:
-        recommendation = optimize_with_ai(image_context, dockerfile_content)
-    except Exception:
-        dockerfile_suggestion = suggest_dockerfile(image_analysis, runtime, misconfigs)
-        recommendation = {
-            "optimized_dockerfile": dockerfile_suggestion,
-            "explanation": ["AI Optimization was unavailable, showing rule-based suggestions."],
-            "security_warnings": []
+        # Check for secrets in ENV/ARG statically (simple regex fallback)
+        secrets = _detect_static_secrets(dockerfile_content)
+        # Filter out duplicates if Trivy already caught them
+        existing_messages = [m["message"] for m in misconfigs]
+        for s in secrets:
+            if s["message"] not in existing_messages:
+                misconfigs.append(s)
+        return misconfigs
+
+    def _optimize(image, misconfigs):
+        # Prepare context for AI
+        image_context = {
+            "image": "uploaded_dockerfile",
+            "runtime": image.get("runtime", "unknown"),
+            "misconfigurations": misconfigs,
+            "summary": {
+                "layer_count": len(image["layers"]),
+                "runs_as_root": image["runtime_analysis"]["runs_as_root"],
+            }
         }
+        # Use AI for optimization and reasoning
+        return optimize_with_ai(image_context, dockerfile_content, priority=ai_priority)
 
-    raw_findings = []
-    
-    # 1. Misconfigurations (Rules Engine)
-    for m in misconfigs:
-        raw_findings.append({
-            "id": m.get("id"),
-            "category": "ANALYSIS",
-            "message": m["message"],
-            "severity": m.get("severity", "MEDIUM"),
-            "recommendation": m.get("recommendation", ""),
-            "source": "rules"
-        })
-        
-    # 2. AI (Deep Semantic Analysis)
-    for w in recommendation.get("security_warnings", []):
-        ai_tag = _extract_tag(w)
-        w_clean = re.sub(r"\[[A-Z0-9_]+\]", "", w).strip()
-
-        is_duplicate = False
-        for f in raw_findings:
-            f_id = f.get("id")
-            # 1. Match by Tag/ID
-            if ai_tag and f_id and ai_tag == f_id:
-                is_duplicate = True
-                f["source"] = "hybrid"
-                break
-            
-            # 2. Fuzzy match
-            f_norm = _normalize(f["message"])
-            w_norm = _normalize(w_clean)
-            if w_norm in f_norm or f_norm in w_norm:
-                is_duplicate = True
-                f["source"] = "hybrid"
-                break
-            
-        if not is_duplicate:
-            # Map specific AI warnings to technical resolutions
-            rec = "Implemented in the optimized Dockerfile."
-            w_low = w_clean.lower()
-            if "root" in w_low: rec = "Add a non-root USER and set appropriate permissions."
-            elif "stage" in w_low: rec = "Use multi-stage builds to reduce image footprint."
-            elif "secret" in w_low or "token" in w_low: rec = "Use build secrets or environment variables instead of hardcoding."
-            elif "tool" in w_low or "install" in w_low: rec = "Clean package manager caches (apt/apk cleanup) in the same layer."
-            
-            raw_findings.append({
-                "id": ai_tag,
-                "category": "ANALYSIS",
-                "message": w_clean,
-                "severity": "HIGH",
-                "recommendation": rec,
-                "source": "ai"
-            })
-
-    # 3. Security (High/Critical)
-    for v in security.get("vulnerabilities", []):
-        if v["severity"] in ["HIGH", "CRITICAL"]:
-            v_id = v.get('id', 'unknown')
-            msg = f"{v['title']} ({v_id})"
-
-            if not any(v_id in f["message"] for f in raw_findings):
-                raw_findings.append({
-                    "id": v_id,
-                    "category": "SECURITY",
-                    "message": msg,
-                    "severity": v["severity"],
-                    "recommendation": v.get("resolution", ""),
-                    "source": "security_scanner"
-                })
-            
-    # Final Deduplication & Cleanup
-    unique_findings = []
-    seen_msgs = set()
-    for f in raw_findings:
-        msg_norm = f["message"].lower().strip()
-        if msg_norm not in seen_msgs:
-            unique_findings.append(f)
-            seen_msgs.add(msg_norm)
+    # The Dockerfile scan (`trivy config`, or the native checks) runs alongside the rule engine and the AI call.
+    results, timings = run_stages([
+        Stage("image", lambda: analyze_dockerfile_content(dockerfile_content)),
+        Stage("security", lambda: analyze_dockerfile_security(dockerfile_content, deep=deep_scan or None),
+              timeout=_stage_timeout("security", time_budget), fallback=_security_unavailable),
+        Stage("misconfigs", _misconfigs, requires=("image",)),
+        Stage("recommendation", _optimize, requires=("image", "misconfigs"),
+              timeout=_stage_timeout("recommendation", time_budget, default=ai_timeout),
+              fallback=lambda e, image, misconfigs: _rule_based_recommendation(e, image, image["runtime_analysis"], misconfigs)),
+    ], on_stage=_section_emitter(on_section), deadline=time_budget)
+    image_analysis = results["image"]
+    runtime = image_analysis["runtime_analysis"]
+    security = results["security"]
+    misconfigs = results["misconfigs"]
+    recommendation = results["recommendation"]
+
+    merge_started = time.monotonic()
+    unique_findings = merge_findings(
+        misconfigs,
+        recommendation.get("security_warnings", []),
+        security.get("vulnerabilities", []),
+        ai_default_recommendation="Implemented in the optimized Dockerfile.",
+    )
+    timings["findings"] = {"status": "ok", "duration_ms": round((time.monotonic() - merge_started) * 1000, 1)}
+    record_stage("findings", "ok", timings["findings"]["duration_ms"])
+
+    if on_section:
+        on_section("findings", unique_findings)
 
     return {
         "image": "uploaded_dockerfile",
@@ -282,6 +329,9 @@ def build_static_report(dockerfile_content: str):
         "misconfigurations": misconfigs,
         "recommendation": recommendation,
         "findings": unique_findings,
+        "pending": _pending_sections(timings),
+        "timings": timings,
+        "cached": False,
     }
 
 def _detect_static_secrets(content: str):
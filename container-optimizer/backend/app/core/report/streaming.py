@@ -0,0 +1,51 @@
+import json
+import queue
+import threading
+from fastapi import HTTPException
+
+_DONE = object()
+
+
+def _encode(event: dict, fmt: str) -> str:
+    payload = json.dumps(event, default=str)
+    if fmt == "sse":
+        return f"event: {event['event']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+def stream_report(run, fmt: str = "ndjson"):
+    """
+    Runs `run(on_section)` in a worker thread and yields each section as soon as it is emitted.
+
+    Events (one JSON object per NDJSON line, or per SSE message):
+    - {"event": "section", "section": <name>, "data": ...} for every partial result
+    - {"event": "complete", "data": <full report>} once the report is assembled
+    - {"event": "error", "status_code": <int>, "detail": <str>} if the run fails
+    """
+    events = queue.Queue()
+
+    def _on_section(section, data):
+        events.put({"event": "section", "section": section, "data": data})
+
+    def _worker():
+        try:
+            report = run(_on_section)
+            events.put({"event": "complete", "data": report})
+        except HTTPException as e:
+            events.put({"event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            events.put({"event": "error", "status_code": 500, "detail": str(e)})
+        finally:
+            events.put(_DONE)
+
+    threading.Thread(target=_worker, name="report-stream", daemon=True).start()
+
+    while True:
+        event = events.get()
+        if event is _DONE:
+            return
+        yield _encode(event, fmt)
+
+
+def streaming_media_type(fmt: str) -> str:
+    return "text/event-stream" if fmt == "sse" else "application/x-ndjson"
@@ -1,29 +1,114 @@
+import os
 import subprocess
 import tempfile
 import json
+import threading
+import time
+from app.core import http_client
+from app.core.metrics import observe_call, record_subprocess
+from app.core.trivy_server import trivy_server
+from app.core.trivy_results import new_result_path, parse_vulnerabilities
+
+# Standalone `trivy image` processes each load the full vulnerability DB; cap how many run at once
+TRIVY_MAX_CLI_SCANS = int(os.getenv("TRIVY_MAX_CLI_SCANS", "2"))
+_cli_scan_slots = threading.BoundedSemaphore(TRIVY_MAX_CLI_SCANS)
+
+# How long a `trivy --version` probe is trusted before re-checking (DB/check bundles update in place)
+TRIVY_VERSION_TTL_SECONDS = 300
+
+_version_lock = threading.Lock()
+_version_info = {"checked_at": 0.0, "info": None}
+
+
+def get_trivy_version_info():
+    """
+    Returns Trivy's version metadata (binary version, vulnerability DB and check bundle).
+    Used to key cached scan results so they expire when Trivy or its databases change.
+    """
+    with _version_lock:
+        if _version_info["info"] is not None and time.monotonic() - _version_info["checked_at"] < TRIVY_VERSION_TTL_SECONDS:
+            return _version_info["info"]
+
+        try:
+            data = _server_version()
+            if data is None:
+                result = subprocess.run(
+                    ["trivy", "--version", "--format", "json"],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                    timeout=10,
+                )
+                data = json.loads(result.stdout)
+            info = {
+                "version": data.get("Version", "unknown"),
+                "vuln_db": (data.get("VulnerabilityDB") or {}).get("UpdatedAt"),
+                "check_bundle": (data.get("CheckBundle") or data.get("PolicyBundle") or {}).get("Digest"),
+            }
+            record_subprocess("trivy_version", "ok")
+        except (OSError, ValueError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            record_subprocess("trivy_version", "timeout" if isinstance(e, subprocess.TimeoutExpired) else "error")
+            info = {"version": "unavailable", "vuln_db": None, "check_bundle": None}
+
+        _version_info.update(checked_at=time.monotonic(), info=info)
+        return info
+
+
+def _server_version():
+    """Version metadata from the Trivy server, which owns the DB that client-mode scans use."""
+    server_url = trivy_server.server_url()
+    if server_url is None:
+        return None
+    try:
+        response = http_client.get(f"{server_url}/version", timeout=2, max_retries=0)
+        return response.json() if response.status_code == 200 else None
+    except Exception:
+        return None
 
 
 def scan_image(image_name: str):
     """
     Run Trivy image scan safely.
-    Returns parsed JSON or raises a controlled error.
+    Runs as a client of the Trivy server when one is available, otherwise as a standalone CLI scan
+    (also when the server stops answering mid-scan).
+    Returns {"scan_id", "vulnerabilities", "by_severity"} with compact vulnerability records
+    (see trivy_results); full details stay on disk under scan_id. Raises a controlled error on failure.
     """
-    with tempfile.TemporaryDirectory() as tmp:
-        output_file = f"{tmp}/result.json"
+    server_url = trivy_server.server_url()
+    if server_url is not None:
+        try:
+            return _run_image_scan(image_name, server_url)
+        except RuntimeError:
+            # A scan that failed on a live server (bad reference, DB error, timeout) would fail the
+            # same way standalone; only a lost server is worth a standalone retry
+            if trivy_server.is_reachable():
+                raise
+            trivy_server.report_failure()
 
-        cmd = [
-            "trivy",
-            "image",
-            "--scanners",
-            "vuln,secret,misconfig",
-            "--format",
-            "json",
-            "--output",
-            output_file,
-            image_name,
-        ]
+    with _cli_scan_slots:
+        return _run_image_scan(image_name)
 
-        try:
+
+def _run_image_scan(image_name: str, server_url: str = None):
+    scan_id, output_file = new_result_path()
+
+    cmd = [
+        "trivy",
+        "image",
+        "--scanners",
+        "vuln,secret,misconfig",
+        "--format",
+        "json",
+        "--output",
+        output_file,
+    ]
+    if server_url:
+        cmd += ["--server", server_url]
+    cmd.append(image_name)
+
+    mode = "client" if server_url else "standalone"
+    try:
+        with observe_call("trivy", f"image_{mode}"):
             subprocess.run(
                 cmd,
                 check=True,
@@ -31,25 +116,42 @@ def scan_image(image_name: str):
                 stderr=subprocess.DEVNULL,
                 timeout=60 # Prevent hangs
             )
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-            raise RuntimeError(
-                "Trivy scan failed or timed out. Ensure Trivy is installed and working."
-            )
+        record_subprocess(f"trivy_image_{mode}", "ok")
+        vulnerabilities, by_severity = parse_vulnerabilities(output_file)
+    except (OSError, ValueError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        record_subprocess(f"trivy_image_{mode}", "timeout" if isinstance(e, subprocess.TimeoutExpired) else "error")
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        raise RuntimeError(
+            "Trivy scan failed or timed out. Ensure Trivy is installed and working."
+        )
 
-        with open(output_file) as f:
-            return json.load(f)
+    return {"scan_id": scan_id, "vulnerabilities": vulnerabilities, "by_severity": by_severity}
 
 def scan_dockerfile(content: str):
     """
     Run Trivy config scan on Dockerfile content.
-    Returns parsed JSON findings.
+    Config checks do not use the vulnerability DB, so this always runs locally (no server round-trip).
+    Returns parsed JSON findings. Raises a controlled error on failure.
     """
+    return scan_dockerfiles({"Dockerfile": content})["Dockerfile"]
+
+def scan_dockerfiles(contents: dict):
+    """
+    Runs a single `trivy config` over many Dockerfiles: each one is written to its own directory of a
+    temp tree, so the policy bundle is loaded once for the whole batch.
+    contents: key -> Dockerfile content. Returns key -> {"Results": [...]} with that file's results only.
+    Raises a controlled error if the scan fails, so a crashed scanner is never mistaken for a clean file.
+    """
+    if not contents:
+        return {}
+    keys = list(contents)
     with tempfile.TemporaryDirectory() as tmp:
-        df_path = f"{tmp}/Dockerfile"
+        for i, key in enumerate(keys):
+            os.makedirs(f"{tmp}/{i}")
+            with open(f"{tmp}/{i}/Dockerfile", "w") as f:
+                f.write(contents[key])
         output_file = f"{tmp}/result.json"
-        
-        with open(df_path, "w") as f:
-            f.write(content)
 
         cmd = [
             "trivy",
@@ -60,20 +162,31 @@ def scan_dockerfile(content: str):
             "json",
             "--output",
             output_file,
-            df_path,
+            tmp,
         ]
 
         try:
-            subprocess.run(
-                cmd,
-                check=True,
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                timeout=30 # Faster for config scan
+            with observe_call("trivy", "config"):
+                subprocess.run(
+                    cmd,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    timeout=min(30 + 2 * len(keys), 120) # Faster for config scan
+                )
+            record_subprocess("trivy_config", "ok")
+            with open(output_file) as f:
+                scan = json.load(f)
+        except (OSError, ValueError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            record_subprocess("trivy_config", "timeout" if isinstance(e, subprocess.TimeoutExpired) else "error")
+            raise RuntimeError(
+                "Trivy config scan failed or timed out. Ensure Trivy is installed and working."
             )
-        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
-            # If scan fails, return empty findings
-            return {"Results": []}
 
-        with open(output_file) as f:
-            return json.load(f)
+    # Targets are relative to the scanned tree, e.g. "3/Dockerfile"
+    per_file = {key: {"Results": []} for key in keys}
+    for result in scan.get("Results") or []:
+        directory = (result.get("Target") or "").replace("\\", "/").split("/")[0]
+        if directory.isdigit() and int(directory) < len(keys):
+            per_file[keys[int(directory)]]["Results"].append(result)
+    return per_file
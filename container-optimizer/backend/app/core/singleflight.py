@@ -0,0 +1,60 @@
+import copy
+import threading
+from app.core.metrics import Counter
+
+singleflight_calls_total = Counter(
+    "optimizer_singleflight_calls_total",
+    "Expensive calls by group: 'started' ran the work, 'joined' waited on an identical in-flight call.",
+    ("group", "role"),
+)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs `fn`, later callers arriving
+    while it is in flight wait for and share its result (or exception) instead of repeating the work.
+    Joiners receive a deep copy, so no caller can mutate another caller's result.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            singleflight_calls_total.inc(group=self.name, role="joined")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        singleflight_calls_total.inc(group=self.name, role="started")
+        try:
+            result = fn()
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,350 @@
+import math
+import os
+import threading
+import time
+from array import array
+from app.docker.client import get_docker_client, new_docker_client, reporting_failures
+from app.docker.events import docker_events
+from app.core.metrics import register_collector
+
+# "auto": read cgroup v2 files where the container's cgroup is visible, else keep a streaming stats
+# connection per container (up to STATS_MAX_STREAMS); "stream": streaming connections only; "off": no sampling.
+STATS_SOURCE = os.getenv("STATS_SOURCE", "auto")
+STATS_INTERVAL_SECONDS = float(os.getenv("STATS_INTERVAL_SECONDS", "5"))
+# One hour of history per container at the default interval
+STATS_RING_SIZE = int(os.getenv("STATS_RING_SIZE", "720"))
+STATS_CGROUP_ROOT = os.getenv("STATS_CGROUP_ROOT", "/sys/fs/cgroup")
+# Each streamed container holds a thread and a daemon connection; containers beyond this are not sampled
+# until a stream frees up (cgroup-sampled containers do not count)
+STATS_MAX_STREAMS = int(os.getenv("STATS_MAX_STREAMS", "32"))
+# The running set also follows Docker events; this only catches what the events missed
+RUNNING_REFRESH_SECONDS = 30
+# A streaming stats connection that ends (daemon restart, socket error) is reopened after a backoff
+# that doubles per consecutive failure, up to this
+STATS_STREAM_MAX_BACKOFF_SECONDS = 60
+
+_RUNNING_CHANGES = {"start", "restart", "die", "stop", "kill", "destroy", "pause", "unpause"}
+
+
+class SampleRing:
+    """Fixed-size ring of (timestamp, cpu %, memory bytes) samples backed by typed arrays (~20 bytes/sample)."""
+
+    __slots__ = ("capacity", "_ts", "_cpu", "_mem", "_next", "_count")
+
+    def __init__(self, capacity: int = STATS_RING_SIZE):
+        self.capacity = capacity
+        self._ts = array("d", bytes(8 * capacity))
+        self._cpu = array("f", bytes(4 * capacity))
+        self._mem = array("Q", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, ts: float, cpu_percent: float, memory_bytes: int):
+        i = self._next
+        self._ts[i] = ts
+        self._cpu[i] = cpu_percent
+        self._mem[i] = max(0, int(memory_bytes))
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def latest(self):
+        if not self._count:
+            return None
+        i = (self._next - 1) % self.capacity
+        return self._ts[i], self._cpu[i], self._mem[i]
+
+    def window(self, seconds: float = None, now: float = None):
+        """Samples from the last `seconds` (all if None), oldest first, as (timestamps, cpu, memory) lists."""
+        start = (self._next - self._count) % self.capacity
+        order = [(start + k) % self.capacity for k in range(self._count)]
+        if seconds is not None:
+            cutoff = (now or time.time()) - seconds
+            order = [i for i in order if self._ts[i] >= cutoff]
+        return [self._ts[i] for i in order], [self._cpu[i] for i in order], [self._mem[i] for i in order]
+
+
+def percentile(values: list, q: float):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def _read_int(path: str):
+    with open(path) as f:
+        value = f.read().strip()
+    return None if value == "max" else int(value)
+
+
+def _read_keyed(path: str) -> dict:
+    with open(path) as f:
+        return {k: int(v) for k, v in (line.split() for line in f if line.strip())}
+
+
+class _ContainerState:
+    def __init__(self, capacity: int):
+        self.ring = SampleRing(capacity)
+        self.cgroup = None           # cgroup v2 directory, if visible from here
+        self.last_cpu_usec = None    # previous cpu.stat usage_usec (cgroup mode)
+        self.last_sampled = None
+        self.memory_limit = None     # bytes; None for unlimited
+        self.cpu_limit = None        # cores; None for unlimited
+        self.stream = None           # streaming stats connection (stream mode)
+        self.reader = None           # thread reading the stream
+        self.stream_failures = 0     # connections in a row that ended before delivering a sample
+        self.reopen_at = 0.0         # monotonic time before which a lost stream is not reopened
+
+
+class StatsCollector:
+    """
+    Samples CPU and memory of every running container in the background and keeps them in per-container
+    ring buffers, so requests read usage from memory instead of blocking on one-shot `docker stats` calls.
+    cgroup v2 accounting files are read directly when visible (the backend runs on the Docker host);
+    otherwise each container gets one long-lived streaming stats connection, for at most `max_streams` containers.
+    """
+
+    def __init__(self, source: str = STATS_SOURCE, interval: float = STATS_INTERVAL_SECONDS,
+                 capacity: int = STATS_RING_SIZE, cgroup_root: str = STATS_CGROUP_ROOT, events=docker_events,
+                 max_streams: int = STATS_MAX_STREAMS):
+        self.source = source
+        self.interval = interval
+        self.capacity = capacity
+        self.cgroup_root = cgroup_root
+        self.max_streams = max_streams
+        self.events = events
+        self._containers = {}  # full container ID -> _ContainerState
+        self._short_ids = {}   # 12-character ID (as in listings) -> full ID
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._running_dirty = threading.Event()
+        self._thread = None
+        self.samples = 0
+        events.subscribe(self._on_event)
+
+    def start(self):
+        """Starts background sampling. Safe to call more than once."""
+        if self.source == "off":
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stats-collector", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._thread = None
+            states = list(self._containers.values())
+        for state in states:
+            self._close_stream(state)
+
+    def _on_event(self, event: dict):
+        if event.get("Type") == "container" and (event.get("Action") or "") in _RUNNING_CHANGES:
+            self._running_dirty.set()
+
+    def _state(self, container_id: str):
+        with self._lock:
+            return self._containers.get(self._short_ids.get(container_id, container_id))
+
+    def usage(self, container_id: str):
+        """Latest sample as {cpu_percent, memory_mb, sampled_at}, or None if none has been taken yet."""
+        state = self._state(container_id)
+        latest = state.ring.latest() if state else None
+        if latest is None:
+            return None
+        ts, cpu, mem = latest
+        return {"cpu_percent": round(cpu, 2), "memory_mb": round(mem / (1024 * 1024), 2), "sampled_at": ts}
+
+    def history(self, container_id: str, window_seconds: float = None):
+        """Samples and p50/p95/max summaries over the window, plus the limits last seen; None if unknown."""
+        state = self._state(container_id)
+        if state is None:
+            return None
+        timestamps, cpu, mem = state.ring.window(window_seconds)
+        mem_mb = [m / (1024 * 1024) for m in mem]
+
+        def _summary(values):
+            if not values:
+                return None
+            return {"p50": round(percentile(values, 50), 2), "p95": round(percentile(values, 95), 2),
+                    "max": round(max(values), 2)}
+
+        return {
+            "window_seconds": window_seconds,
+            "interval_seconds": self.interval,
+            "sample_count": len(timestamps),
+            "cpu_percent": _summary(cpu),
+            "memory_mb": _summary(mem_mb),
+            "memory_limit_mb": round(state.memory_limit / (1024 * 1024), 2) if state.memory_limit else None,
+            "cpu_limit": state.cpu_limit,
+            "samples": [{"t": t, "cpu_percent": round(c, 2), "memory_mb": round(m, 2)}
+                        for t, c, m in zip(timestamps, cpu, mem_mb)],
+        }
+
+    def _run(self):
+        last_refresh = 0.0
+        while not self._stop.is_set():
+            try:
+                if self._running_dirty.is_set() or time.monotonic() - last_refresh > RUNNING_REFRESH_SECONDS:
+                    self._running_dirty.clear()
+                    with reporting_failures():
+                        running = get_docker_client().api.containers()
+                    self._sync_running(running)
+                    last_refresh = time.monotonic()
+                self._reopen_streams()
+                self._sample_cgroups()
+            except Exception as e:
+                print(f"Stats collection failed: {e}")
+            self._stop.wait(self.interval)
+
+    def _sync_running(self, running: list):
+        running_ids = {c["Id"] for c in running}
+        with self._lock:
+            gone = [cid for cid in self._containers if cid not in running_ids]
+            stopped = [self._containers.pop(cid) for cid in gone]
+            new = {cid: _ContainerState(self.capacity) for cid in running_ids if cid not in self._containers}
+            self._containers.update(new)
+            self._short_ids = {cid[:12]: cid for cid in self._containers}
+        for state in stopped:
+            self._close_stream(state)
+        for cid, state in new.items():
+            state.cgroup = self._find_cgroup(cid) if self.source == "auto" else None
+        self._reopen_streams()
+
+    def _reopen_streams(self):
+        """
+        Opens a stream for tracked containers with neither a cgroup reader nor a live stream,
+        as long as fewer than `max_streams` are open; the rest wait for a stream to free up.
+        """
+        now = time.monotonic()
+        with self._lock:
+            live = sum(1 for s in self._containers.values() if s.reader and s.reader.is_alive())
+            idle = [(cid, state) for cid, state in self._containers.items()
+                    if state.cgroup is None and not (state.reader and state.reader.is_alive()) and now >= state.reopen_at]
+        for cid, state in idle[:max(0, self.max_streams - live)]:
+            self._open_stream(cid, state)
+
+    def _find_cgroup(self, container_id: str):
+        # systemd and cgroupfs cgroup drivers respectively
+        for path in (f"{self.cgroup_root}/system.slice/docker-{container_id}.scope", f"{self.cgroup_root}/docker/{container_id}"):
+            if os.path.exists(f"{path}/cpu.stat") and os.path.exists(f"{path}/memory.current"):
+                return path
+        return None
+
+    def _sample_cgroups(self):
+        with self._lock:
+            states = [s for s in self._containers.values() if s.cgroup]
+        now = time.time()
+        for state in states:
+            try:
+                self._sample_cgroup(state, now)
+            except (OSError, ValueError, KeyError):
+                continue  # the container went away between listing and sampling
+
+    def _sample_cgroup(self, state: _ContainerState, now: float):
+        cpu_usec = _read_keyed(f"{state.cgroup}/cpu.stat")["usage_usec"]
+        memory = _read_int(f"{state.cgroup}/memory.current")
+        # Match `docker stats`: page cache that can be reclaimed is not counted
+        memory -= _read_keyed(f"{state.cgroup}/memory.stat").get("inactive_file", 0)
+        state.memory_limit = _read_int(f"{state.cgroup}/memory.max")
+        with open(f"{state.cgroup}/cpu.max") as f:
+            quota, period = f.read().split()
+        state.cpu_limit = None if quota == "max" else round(int(quota) / int(period), 2)
+
+        if state.last_cpu_usec is not None:
+            elapsed_usec = (now - state.last_sampled) * 1_000_000
+            cpu_percent = (cpu_usec - state.last_cpu_usec) / elapsed_usec * 100 if elapsed_usec > 0 else 0.0
+            state.ring.append(now, cpu_percent, memory)
+            self.samples += 1
+        state.last_cpu_usec = cpu_usec
+        state.last_sampled = now
+
+    def _open_stream(self, container_id: str, state: _ContainerState):
+        state.reader = threading.Thread(target=self._read_stream, args=(container_id, state),
+                                        name=f"stats-{container_id[:12]}", daemon=True)
+        state.reader.start()
+
+    def _close_stream(self, state: _ContainerState):
+        stream, state.stream = state.stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def _read_stream(self, container_id: str, state: _ContainerState):
+        client = None
+        try:
+            # Long-lived, so it gets its own connection rather than one from the shared pool
+            client = new_docker_client()
+            stream = client.api.stats(container_id, stream=True, decode=True)
+            state.stream = stream
+            for stats in stream:
+                if self._stop.is_set() or state.stream is None:
+                    break
+                now = time.time()
+                # The daemon pushes about one sample per second; keep one per interval
+                if state.last_sampled is not None and now - state.last_sampled < self.interval:
+                    continue
+                sample = stream_sample(stats)
+                if sample is None:
+                    continue
+                cpu_percent, memory, limit = sample
+                state.memory_limit = limit
+                state.ring.append(now, cpu_percent, memory)
+                state.last_sampled = now
+                state.stream_failures = 0
+                self.samples += 1
+        except Exception as e:
+            if not self._stop.is_set():
+                print(f"Stats stream for {container_id[:12]} ended: {e}")
+        finally:
+            self._close_stream(state)
+            if client is not None:
+                client.close()
+            # Reopened by the sampling loop while the container is still running
+            state.stream_failures += 1
+            backoff = min(STATS_STREAM_MAX_BACKOFF_SECONDS, self.interval * 2 ** (state.stream_failures - 1))
+            state.reopen_at = time.monotonic() + backoff
+
+
+def stream_sample(stats: dict):
+    """(cpu %, memory bytes, memory limit or None) from one Docker stats message, computed like `docker stats`."""
+    cpu, precpu = stats.get("cpu_stats") or {}, stats.get("precpu_stats") or {}
+    if "system_cpu_usage" not in cpu or "system_cpu_usage" not in precpu:
+        return None  # the first message has no previous reading
+    cpu_delta = cpu["cpu_usage"]["total_usage"] - precpu["cpu_usage"]["total_usage"]
+    system_delta = cpu["system_cpu_usage"] - precpu["system_cpu_usage"]
+    online = cpu.get("online_cpus") or len(cpu["cpu_usage"].get("percpu_usage") or []) or 1
+    cpu_percent = cpu_delta / system_delta * online * 100 if system_delta > 0 else 0.0
+
+    memory_stats = stats.get("memory_stats") or {}
+    detail = memory_stats.get("stats") or {}
+    # cgroup v2 reports inactive_file, v1 total_inactive_file
+    memory = memory_stats.get("usage", 0) - detail.get("inactive_file", detail.get("total_inactive_file", 0))
+    limit = memory_stats.get("limit")
+    # An unlimited container reports the host's memory as its limit; callers compare against HostConfig
+    return cpu_percent, memory, limit
+
+
+stats_collector = StatsCollector()
+
+
+@register_collector
+def _stats_collector_metrics():
+    with stats_collector._lock:
+        tracked = len(stats_collector._containers)
+        cgroup = sum(1 for s in stats_collector._containers.values() if s.cgroup)
+        stream = sum(1 for s in stats_collector._containers.values() if s.reader and s.reader.is_alive())
+    return [
+        ("optimizer_stats_containers", "gauge", "Running containers sampled by the stats collector.",
+         [({"source": "cgroup"}, cgroup), ({"source": "stream"}, stream), ({"source": "none"}, tracked - cgroup - stream)]),
+        ("optimizer_stats_samples_total", "counter", "Container usage samples taken.",
+         [({}, stats_collector.samples)]),
+    ]
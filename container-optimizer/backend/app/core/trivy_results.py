@@ -0,0 +1,150 @@
+import json
+import os
+import re
+import time
+import uuid
+
+# Raw Trivy image results are kept on disk so full vulnerability details can be looked up by ID
+# without holding (or returning) multi-MB documents per report.
+TRIVY_RESULTS_DIR = os.getenv("TRIVY_RESULTS_DIR", "/tmp/optimizer_trivy_results")
+TRIVY_RESULTS_MAX_FILES = int(os.getenv("TRIVY_RESULTS_MAX_FILES", "200"))
+TRIVY_RESULTS_TTL_SECONDS = float(os.getenv("TRIVY_RESULTS_TTL_SECONDS", "86400"))
+
+CHUNK_SIZE = 64 * 1024
+
+_SCAN_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_WHITESPACE = " \t\r\n"
+_decoder = json.JSONDecoder()
+
+
+def iter_array_items(fp, key: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Yields the elements of every `"<key>": [...]` array in a JSON document, reading `fp` in chunks.
+    Only one element is decoded at a time, so memory stays proportional to the largest element.
+    A quoted key followed by ':' cannot occur inside a JSON string (its quotes would be escaped).
+    """
+    key_re = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+    buffer = ""
+    eof = False
+
+    def _fill():
+        nonlocal buffer, eof
+        chunk = fp.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while True:
+        # 1. Find the next array for `key`
+        match = key_re.search(buffer)
+        while match is None:
+            if eof:
+                return
+            # Keep a tail in case the key straddles two chunks
+            buffer = buffer[-(len(key) + 16):]
+            _fill()
+            match = key_re.search(buffer)
+        buffer = buffer[match.end():]
+
+        # 2. Decode its elements one at a time
+        while True:
+            stripped = buffer.lstrip(_WHITESPACE + ",")
+            if not stripped:
+                if eof:
+                    return
+                buffer = ""
+                _fill()
+                continue
+            buffer = stripped
+            if buffer[0] == "]":
+                buffer = buffer[1:]
+                break
+            try:
+                item, end = _decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                _fill()
+                continue
+            buffer = buffer[end:]
+            yield item
+
+
+def compact_vulnerability(v: dict) -> dict:
+    """The fields reports need; descriptions, references and CVSS vectors stay in the raw result."""
+    return {
+        "id": v.get("VulnerabilityID"),
+        "package": v.get("PkgName"),
+        "installed_version": v.get("InstalledVersion"),
+        "fixed_version": v.get("FixedVersion"),
+        "severity": v.get("Severity", "UNKNOWN"),
+        "title": v.get("Title") or v.get("VulnerabilityID"),
+    }
+
+
+def parse_vulnerabilities(path: str):
+    """
+    Streams Results[].Vulnerabilities from a Trivy JSON file into compact records.
+    The same CVE reported for the same package version in several targets is kept once.
+    Returns (vulnerabilities, by_severity).
+    """
+    vulnerabilities = []
+    by_severity = {}
+    seen = set()
+    with open(path, encoding="utf-8") as fp:
+        for raw in iter_array_items(fp, "Vulnerabilities"):
+            record = compact_vulnerability(raw)
+            identity = (record["id"], record["package"], record["installed_version"])
+            if identity in seen:
+                continue
+            seen.add(identity)
+            by_severity[record["severity"]] = by_severity.get(record["severity"], 0) + 1
+            vulnerabilities.append(record)
+    return vulnerabilities, by_severity
+
+
+def new_result_path():
+    """Returns (scan_id, path) for a new raw result file, pruning old ones first."""
+    os.makedirs(TRIVY_RESULTS_DIR, exist_ok=True)
+    prune_results()
+    scan_id = uuid.uuid4().hex
+    return scan_id, os.path.join(TRIVY_RESULTS_DIR, f"{scan_id}.json")
+
+
+def result_path(scan_id: str):
+    if not _SCAN_ID_RE.match(scan_id or ""):
+        return None
+    path = os.path.join(TRIVY_RESULTS_DIR, f"{scan_id}.json")
+    return path if os.path.exists(path) else None
+
+
+def find_vulnerability_details(scan_id: str, vulnerability_id: str):
+    """
+    Full Trivy records for one vulnerability ID in a stored scan (one per affected package).
+    Returns None if the scan is unknown or has expired.
+    """
+    path = result_path(scan_id)
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as fp:
+        return [v for v in iter_array_items(fp, "Vulnerabilities") if v.get("VulnerabilityID") == vulnerability_id]
+
+
+def prune_results():
+    try:
+        entries = [e for e in os.scandir(TRIVY_RESULTS_DIR) if e.name.endswith(".json")]
+    except FileNotFoundError:
+        return 0
+    cutoff = time.time() - TRIVY_RESULTS_TTL_SECONDS
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    removed = 0
+    for i, entry in enumerate(entries):
+        # Oldest first: drop expired files and whatever exceeds the cap (leaving room for the next one)
+        if entry.stat().st_mtime < cutoff or len(entries) - i >= TRIVY_RESULTS_MAX_FILES:
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,170 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+from app.core import http_client
+from app.core.metrics import record_subprocess, register_collector
+
+# "managed": start and supervise a local `trivy server` (opt-in: only for a single app process, since
+# every worker would try to bind TRIVY_SERVER_LISTEN); "external": use TRIVY_SERVER_URL as-is, the
+# default when it is set; "off" (otherwise the default): always fork a standalone `trivy` per scan.
+TRIVY_SERVER_MODE = os.getenv("TRIVY_SERVER_MODE", "external" if os.getenv("TRIVY_SERVER_URL") else "off")
+TRIVY_SERVER_URL = os.getenv("TRIVY_SERVER_URL")
+TRIVY_SERVER_LISTEN = os.getenv("TRIVY_SERVER_LISTEN", "127.0.0.1:4954")
+TRIVY_CACHE_DIR = os.getenv("TRIVY_CACHE_DIR")
+TRIVY_HEALTH_INTERVAL_SECONDS = float(os.getenv("TRIVY_HEALTH_INTERVAL_SECONDS", "15"))
+# The first start may download the vulnerability DB; scans use the CLI until the server is ready
+TRIVY_SERVER_START_TIMEOUT = float(os.getenv("TRIVY_SERVER_START_TIMEOUT", "180"))
+TRIVY_RESTART_BACKOFF_SECONDS = float(os.getenv("TRIVY_RESTART_BACKOFF_SECONDS", "30"))
+
+
+class TrivyServerManager:
+    """
+    Keeps a long-lived `trivy server` running so scans run as thin clients (`trivy image --server`)
+    that reuse the server's loaded vulnerability DB instead of reloading it per process.
+    A supervisor thread health-checks the server and restarts it if it dies or stops answering.
+    `server_url()` returns None whenever the server is not ready, and callers fall back to the CLI.
+    """
+
+    def __init__(self, mode: str = TRIVY_SERVER_MODE, listen: str = TRIVY_SERVER_LISTEN, url: str = TRIVY_SERVER_URL):
+        self.mode = mode
+        self.listen = listen
+        self.url = url or f"http://{listen}"
+        self._process = None
+        self._healthy = False
+        self._started_at = None
+        self._restarts = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._supervisor = None
+
+    def start(self):
+        """Starts supervision (and the server itself in managed mode). Safe to call more than once."""
+        if self.mode == "off":
+            return
+        with self._lock:
+            if self._supervisor is not None:
+                return
+            self._stop.clear()
+            self._supervisor = threading.Thread(target=self._supervise, name="trivy-server", daemon=True)
+            self._supervisor.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._supervisor = None
+            self._healthy = False
+            process, self._process = self._process, None
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def server_url(self):
+        if self.mode == "off":
+            return None
+        self.start()
+        return self.url if self._healthy else None
+
+    def is_reachable(self) -> bool:
+        """Probes the server right away, e.g. to tell a scan that failed on the server from a lost connection."""
+        return self._check_health()
+
+    def report_failure(self):
+        """Called by scanners when the server stopped answering; the next health check decides whether to restart."""
+        self._healthy = False
+
+    def status(self):
+        process = self._process
+        return {
+            "mode": self.mode,
+            "url": self.url if self.mode != "off" else None,
+            "healthy": self._healthy,
+            "pid": process.pid if process is not None and process.poll() is None else None,
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if self._healthy and self._started_at else None,
+            "restarts": self._restarts,
+        }
+
+    def _check_health(self) -> bool:
+        try:
+            response = http_client.get(f"{self.url}/healthz", timeout=2, max_retries=0)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    def _spawn(self):
+        if shutil.which("trivy") is None:
+            return None
+        cmd = ["trivy", "server", "--listen", self.listen]
+        if TRIVY_CACHE_DIR:
+            cmd += ["--cache-dir", TRIVY_CACHE_DIR]
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError:
+            record_subprocess("trivy_server", "error")
+            return None
+        record_subprocess("trivy_server", "ok")
+        return process
+
+    def _wait_until_healthy(self, process) -> bool:
+        deadline = time.monotonic() + TRIVY_SERVER_START_TIMEOUT
+        while time.monotonic() < deadline and not self._stop.is_set():
+            if process.poll() is not None:
+                return False
+            if self._check_health():
+                return True
+            self._stop.wait(1)
+        return False
+
+    def _supervise(self):
+        while not self._stop.is_set():
+            if self._check_health():
+                if not self._healthy:
+                    self._started_at = self._started_at or time.monotonic()
+                self._healthy = True
+            else:
+                self._healthy = False
+                if self.mode == "managed":
+                    self._restart()
+            self._stop.wait(TRIVY_HEALTH_INTERVAL_SECONDS)
+
+    def _restart(self):
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+        process = self._spawn()
+        if process is None:
+            return
+        with self._lock:
+            if self._process is not None:
+                self._restarts += 1
+            self._process = process
+        if self._wait_until_healthy(process):
+            self._healthy = True
+            self._started_at = time.monotonic()
+        else:
+            # Keep using the CLI for a while instead of hammering a server that cannot start
+            self._stop.wait(TRIVY_RESTART_BACKOFF_SECONDS)
+
+
+trivy_server = TrivyServerManager()
+
+
+@register_collector
+def _trivy_server_metrics():
+    status = trivy_server.status()
+    return [
+        ("optimizer_trivy_server_up", "gauge", "1 if scans are running against the Trivy server.",
+         [({"mode": status["mode"]}, 1 if status["healthy"] else 0)]),
+        ("optimizer_trivy_server_restarts_total", "counter", "Managed Trivy server restarts.",
+         [({}, status["restarts"])]),
+    ]
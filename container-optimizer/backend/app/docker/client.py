@@ -1,21 +1,160 @@
 import docker
 import os
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from app.core.metrics import register_collector
 
-def get_docker_client():
-    try:
-        # If Docker Desktop is used, force correct socket
-        # Try standard environment variable first
-        socket_path = os.getenv("DOCKER_HOST", "unix:///var/run/docker.sock")
-        
-        # Fallback to local user desktop socket if it exists (generalized)
-        user_socket = os.path.expanduser("~/.docker/desktop/docker.sock")
-        if os.path.exists(user_socket):
-            client = docker.DockerClient(base_url=f"unix://{user_socket}")
-        else:
-            client = docker.from_env()
-
-        client.ping()
+# Connections kept per Docker host; requests beyond this open (and then drop) extra connections
+DOCKER_MAX_POOL_SIZE = int(os.getenv("DOCKER_MAX_POOL_SIZE", "20"))
+DOCKER_TIMEOUT_SECONDS = int(os.getenv("DOCKER_TIMEOUT_SECONDS", "60"))
+# A client is pinged again only when its last successful check is older than this
+DOCKER_HEALTH_INTERVAL_SECONDS = float(os.getenv("DOCKER_HEALTH_INTERVAL_SECONDS", "30"))
+
+# Failures of the daemon connection itself, as opposed to errors the daemon returned
+DOCKER_CONNECTION_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+def _default_base_url():
+    """Docker Desktop's per-user socket if present, else whatever DOCKER_HOST / the environment says (None)."""
+    user_socket = os.path.expanduser("~/.docker/desktop/docker.sock")
+    if os.path.exists(user_socket):
+        return f"unix://{user_socket}"
+    return None
+
+
+def new_docker_client(host: str = None):
+    """
+    A client of its own, for long-lived streams (events, streaming stats) that would otherwise
+    hold one of the shared pool's connections for hours.
+    """
+    base_url = host or _default_base_url()
+    if base_url:
+        return docker.DockerClient(base_url=base_url, timeout=DOCKER_TIMEOUT_SECONDS, max_pool_size=DOCKER_MAX_POOL_SIZE)
+    return docker.from_env(timeout=DOCKER_TIMEOUT_SECONDS, max_pool_size=DOCKER_MAX_POOL_SIZE)
+
+
+class _Entry:
+    def __init__(self, client):
+        self.client = client
+        self.checked_at = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class DockerClientManager:
+    """
+    One pooled DockerClient per Docker host, shared by every caller in the process.
+    Health checks are lazy: a client is pinged only when it is handed out and its last successful check
+    is older than DOCKER_HEALTH_INTERVAL_SECONDS (or a Docker call failed to connect, see
+    `reporting_failures`); a failed ping replaces the client once before giving up. docker-py clients
+    are thread-safe. `get()` may block on a ping, so call it from worker threads (sync routes), not
+    from the event loop.
+    """
+
+    def __init__(self, factory=new_docker_client, health_interval: float = DOCKER_HEALTH_INTERVAL_SECONDS):
+        self._factory = factory
+        self.health_interval = health_interval
+        self._entries = {}  # host (None = default) -> _Entry
+        self._lock = threading.Lock()
+        self.reconnects = 0
+
+    def get(self, host: str = None):
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is None:
+            return self._connect(host)
+        if time.monotonic() - entry.checked_at < self.health_interval:
+            return entry.client
+
+        with entry.lock:  # one ping per stale client, however many threads ask at once
+            if time.monotonic() - entry.checked_at < self.health_interval:
+                return entry.client
+            try:
+                entry.client.ping()
+                entry.checked_at = time.monotonic()
+                return entry.client
+            except Exception:
+                pass
+        self.reconnects += 1
+        return self._connect(host, replacing=entry)
+
+    def report_failure(self, host: str = None):
+        """Forces a health check on the next `get()`, e.g. after a call failed with a connection error."""
+        with self._lock:
+            entry = self._entries.get(host)
+        if entry is not None:
+            entry.checked_at = float("-inf")
+
+    def close(self):
+        with self._lock:
+            entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            self._close(entry.client)
+
+    def _connect(self, host: str, replacing: _Entry = None):
+        with self._lock:
+            current = self._entries.get(host)
+            if current is not None and current is not replacing:
+                return current.client  # another thread connected first
+        try:
+            client = self._factory(host)
+            client.ping()
+        except Exception as e:
+            raise RuntimeError(f"Docker not accessible: {e}")
+
+        with self._lock:
+            current = self._entries.get(host)
+            if current is not None and current is not replacing:
+                winner = current.client
+            else:
+                self._entries[host] = _Entry(client)
+                winner = None
+        if winner is not None:
+            self._close(client)
+            return winner
+        if replacing is not None:
+            self._close(replacing.client)
         return client
 
-    except Exception as e:
-        raise RuntimeError(f"Docker not accessible: {e}")
+    @staticmethod
+    def _close(client):
+        try:
+            client.close()
+        except Exception:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {"hosts": len(self._entries), "reconnects": self.reconnects}
+
+
+docker_clients = DockerClientManager()
+
+
+def get_docker_client(host: str = None):
+    """The shared, health-checked client for `host` (default: DOCKER_HOST / Docker Desktop)."""
+    return docker_clients.get(host)
+
+
+@contextmanager
+def reporting_failures(host: str = None):
+    """
+    Wraps Docker calls (also usable as a decorator): a connection failure makes the next
+    `get_docker_client()` health-check the shared client instead of handing it out again.
+    """
+    try:
+        yield
+    except DOCKER_CONNECTION_ERRORS:
+        docker_clients.report_failure(host)
+        raise
+
+
+@register_collector
+def _docker_client_metrics():
+    stats = docker_clients.stats()
+    return [
+        ("optimizer_docker_clients", "gauge", "Pooled Docker clients (one per Docker host).", [({}, stats["hosts"])]),
+        ("optimizer_docker_client_reconnects_total", "counter", "Docker clients replaced after a failed health check.",
+         [({}, stats["reconnects"])]),
+    ]
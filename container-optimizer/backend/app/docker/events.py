@@ -0,0 +1,113 @@
+import logging
+import os
+import threading
+from app.docker.client import new_docker_client
+from app.core.metrics import Counter, register_collector
+
+# First reconnect delay; doubles on every further failure, up to the cap
+DOCKER_EVENTS_RECONNECT_SECONDS = float(os.getenv("DOCKER_EVENTS_RECONNECT_SECONDS", "5"))
+DOCKER_EVENTS_MAX_BACKOFF_SECONDS = float(os.getenv("DOCKER_EVENTS_MAX_BACKOFF_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+docker_events_total = Counter(
+    "optimizer_docker_events_total",
+    "Docker events received by the shared subscription.",
+    ("type", "action"),
+)
+
+
+class DockerEvents:
+    """
+    One long-lived `docker events` subscription shared by everything that keeps Docker-derived state
+    fresh. Listeners get each decoded event on the subscription thread and must return quickly.
+    `generation` changes on every (re)connect: events may have been missed while disconnected, so
+    state built under an older generation (or while `connected` is False) must not be trusted.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._stream = None
+        self.connected = False
+        self.generation = 0
+
+    def subscribe(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+        return listener
+
+    def start(self):
+        """Starts the subscription thread. Safe to call more than once."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="docker-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._lock:
+            self._thread = None
+            stream, self._stream = self._stream, None
+        self.connected = False
+        if stream is not None:
+            try:
+                stream.close()  # unblocks the reader
+            except Exception:
+                pass
+
+    def _run(self):
+        failures = 0
+        last_error = None  # logged once, then again only when it changes or the connection recovers
+        while not self._stop.is_set():
+            client = None
+            try:
+                # A dedicated connection: the subscription would otherwise pin one of the shared pool's
+                client = new_docker_client()
+                stream = client.events(decode=True, filters={"type": ["container", "image"]})
+                with self._lock:
+                    self._stream = stream
+                self.generation += 1
+                self.connected = True
+                if last_error is not None:
+                    logger.info("Docker events subscription restored after %d failed attempt(s)", failures)
+                failures, last_error = 0, None
+                for event in stream:
+                    self._dispatch(event)
+            except Exception as e:
+                if not self._stop.is_set():
+                    failures += 1
+                    error = f"{type(e).__name__}: {e}"
+                    if error != last_error:
+                        logger.warning("Docker events subscription lost: %s", e)
+                        last_error = error
+            finally:
+                self.connected = False
+                if client is not None:
+                    client.close()
+            self._stop.wait(min(DOCKER_EVENTS_MAX_BACKOFF_SECONDS, DOCKER_EVENTS_RECONNECT_SECONDS * 2 ** max(0, failures - 1)))
+
+    def _dispatch(self, event: dict):
+        docker_events_total.inc(type=event.get("Type", "unknown"), action=(event.get("Action") or "").split(":")[0])
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.warning("Docker event listener failed: %s", e)
+
+
+docker_events = DockerEvents()
+
+
+@register_collector
+def _docker_events_metrics():
+    return [
+        ("optimizer_docker_events_connected", "gauge", "1 while the Docker events subscription is connected.",
+         [({}, 1 if docker_events.connected else 0)]),
+    ]
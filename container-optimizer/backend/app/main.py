@@ -1,12 +1,34 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import containers, auth, consent
-import requests
+from fastapi.responses import PlainTextResponse
+from app.api import containers, auth, consent, jobs
+from app.core.metrics import http_requests_total, http_request_duration_seconds, render_latest
+from app.core import http_client
+from app.core.trivy_server import trivy_server
+from app.docker.events import docker_events
+from app.core.stats_collector import stats_collector
+from app.docker.client import docker_clients
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the Trivy server up early so the first scans do not pay for a cold vulnerability DB load
+    trivy_server.start()
+    # Keeps cached Docker state (e.g. the container listing) current
+    docker_events.start()
+    stats_collector.start()
+    yield
+    stats_collector.stop()
+    docker_events.stop()
+    docker_clients.close()
+    trivy_server.stop()
 
 app = FastAPI(
     title="Docker Container Optimizer",
     description="Real-time Docker container optimization & security platform",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 def get_headers(token: str):
@@ -17,7 +39,7 @@ def get_authenticated_user(token: str) -> str:
     """Gets the login name of the authenticated user. Safe for CI."""
     try:
         url = "https://api.github.com/user"
-        resp = requests.get(url, headers=get_headers(token), timeout=5)
+        resp = http_client.get(url, headers=get_headers(token), timeout=5)
         if resp.status_code == 200:
             return resp.json()["login"]
     except Exception:
@@ -34,9 +56,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Use the route template (e.g. /api/jobs/{job_id}) to keep label cardinality bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests_total.inc(method=request.method, route=route, status=str(status))
+        http_request_duration_seconds.observe(time.perf_counter() - started, method=request.method, route=route)
+
 app.include_router(containers.router, prefix="/api")
 app.include_router(auth.router, prefix="/api")
 app.include_router(consent.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def health():
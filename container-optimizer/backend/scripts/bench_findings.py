@@ -0,0 +1,160 @@
+"""
+Benchmark: indexed findings merge vs. the previous quadratic de-duplication.
+
+Usage: python scripts/bench_findings.py [--cves 5000] [--repeat 3]
+Exits non-zero if the two implementations disagree.
+"""
+import sys
+import os
+import re
+import time
+import random
+import argparse
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.report.findings import merge_findings
+
+
+def legacy_merge_findings(misconfigs, security_warnings, vulnerabilities, ai_default_recommendation):
+    """The de-duplication previously inlined in build_report/build_static_report."""
+    def _extract_tag(message):
+        match = re.search(r"\[([A-Z0-9_]+)\]", message)
+        return match.group(1) if match else None
+
+    def _normalize(text):
+        return re.sub(r'[^a-z0-9]', '', text.lower())
+
+    raw_findings = []
+    for m in misconfigs:
+        raw_findings.append({
+            "id": m.get("id"),
+            "category": "ANALYSIS",
+            "message": m["message"],
+            "severity": m.get("severity", "MEDIUM"),
+            "recommendation": m.get("recommendation", ""),
+            "source": "rules"
+        })
+
+    for w in security_warnings:
+        ai_tag = _extract_tag(w)
+        w_clean = re.sub(r"\[[A-Z0-9_]+\]", "", w).strip()
+        is_duplicate = False
+        for f in raw_findings:
+            f_id = f.get("id")
+            if ai_tag and f_id and ai_tag == f_id:
+                is_duplicate = True
+                f["source"] = "hybrid"
+                break
+            f_norm = _normalize(f["message"])
+            w_norm = _normalize(w_clean)
+            if w_norm in f_norm or f_norm in w_norm:
+                is_duplicate = True
+                f["source"] = "hybrid"
+                break
+        if not is_duplicate:
+            rec = ai_default_recommendation
+            w_low = w_clean.lower()
+            if "root" in w_low: rec = "Add a non-root USER and set appropriate permissions."
+            elif "stage" in w_low: rec = "Use multi-stage builds to reduce image footprint."
+            elif "secret" in w_low or "token" in w_low: rec = "Use build secrets or environment variables instead of hardcoding."
+            elif "tool" in w_low or "install" in w_low: rec = "Clean package manager caches (apt/apk cleanup) in the same layer."
+            raw_findings.append({
+                "id": ai_tag,
+                "category": "ANALYSIS",
+                "message": w_clean,
+                "severity": "HIGH",
+                "recommendation": rec,
+                "source": "ai"
+            })
+
+    for v in vulnerabilities:
+        if v.get("severity") in ["HIGH", "CRITICAL"]:
+            v_id = v.get('id', 'unknown')
+            msg = f"{v['title']} ({v_id})"
+            if not any(v_id in f["message"] for f in raw_findings):
+                raw_findings.append({
+                    "id": v_id,
+                    "category": "SECURITY",
+                    "message": msg,
+                    "severity": v["severity"],
+                    "recommendation": v.get("resolution", ""),
+                    "source": "security_scanner"
+                })
+
+    unique_findings = []
+    seen_msgs = set()
+    for f in raw_findings:
+        msg_norm = f["message"].lower().strip()
+        if msg_norm not in seen_msgs:
+            unique_findings.append(f)
+            seen_msgs.add(msg_norm)
+    return unique_findings
+
+
+def generate_inputs(cve_count: int, seed: int = 7):
+    """Synthetic report inputs shaped like a large base image scan."""
+    rng = random.Random(seed)
+    misconfigs = [
+        {"id": "RUN_AS_ROOT", "severity": "HIGH", "message": "Container runs as root user", "recommendation": "Add a non-root USER in the Dockerfile."},
+        {"id": "NO_VERSION_PINNING", "severity": "MEDIUM", "message": "Base image version not pinned (using 'latest')", "recommendation": "Pin tags."},
+        {"id": "MISSING_HEALTHCHECK", "severity": "LOW", "message": "No HEALTHCHECK instruction found", "recommendation": "Add a HEALTHCHECK."},
+        {"id": "BUILD_TOOLS_PRESENT", "severity": "HIGH", "message": "Build tools present in final image", "recommendation": "Use a builder stage."},
+    ]
+    misconfigs += [
+        {"id": f"RULE_{i}", "severity": "MEDIUM", "message": f"Synthetic rule finding number {i}"} for i in range(20)
+    ]
+    security_warnings = [
+        "[RUN_AS_ROOT] The container runs as root",
+        "[NO_VERSION_PINNING] Image uses the latest tag",
+        "Build tools present in final image",
+        "[SECRET_IN_ENV] Hardcoded secret token found in ENV",
+        "Final image ships compilers; use a multi stage build",
+        "[CVE_SCAN] Known vulnerable package CVE-2023-10003 is installed",
+        # IDs embedded in longer tokens still count as mentioned
+        "SBOM entry pkg:CVE-2023-10007/libxml2 is affected",
+    ]
+    packages = [f"lib{name}" for name in ("ssl", "xml2", "curl", "png", "z", "krb5", "sqlite3", "expat")]
+    vulnerabilities = []
+    for i in range(cve_count):
+        # Realistic scans report the same CVE once per affected package
+        v_id = f"CVE-2023-{10000 + rng.randrange(cve_count // 2 or 1):05d}"
+        if i % 7 == 0:
+            # Shorter IDs that are prefixes of longer ones (CVE-2023-1000 vs CVE-2023-10003)
+            v_id = v_id[:-1]
+        vulnerabilities.append({
+            "id": v_id,
+            "title": f"{rng.choice(packages)}: memory corruption in parser",
+            "severity": rng.choice(["LOW", "MEDIUM", "HIGH", "CRITICAL"]),
+            "resolution": "Upgrade the package",
+        })
+    return misconfigs, security_warnings, vulnerabilities
+
+
+def run(cve_count: int, repeat: int = 1):
+    inputs = generate_inputs(cve_count)
+    timings = {}
+    outputs = {}
+    for name, fn in (("legacy", legacy_merge_findings), ("indexed", merge_findings)):
+        best = None
+        for _ in range(repeat):
+            misconfigs, warnings, vulns = generate_inputs(cve_count)
+            started = time.perf_counter()
+            outputs[name] = fn(misconfigs, warnings, vulns, "Implemented in the optimized Dockerfile.")
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        timings[name] = best
+    return outputs["legacy"] == outputs["indexed"], timings, len(outputs["indexed"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Findings merge benchmark")
+    parser.add_argument("--cves", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for count in sorted({100, 1000, args.cves}):
+        same, timings, total = run(count, args.repeat)
+        speedup = timings["legacy"] / timings["indexed"] if timings["indexed"] else float("inf")
+        print(f"{count:>6} CVEs -> {total:>5} findings | legacy {timings['legacy']*1000:9.1f} ms | "
+              f"indexed {timings['indexed']*1000:7.1f} ms | x{speedup:.1f} | identical: {same}")
+        if not same:
+            sys.exit(1)
@@ -0,0 +1,54 @@
+"""
+Records `trivy config` results for tests/scenarios/*.dockerfile into tests/scenarios/trivy/*.json,
+the fixtures test_parity_with_recorded_trivy_output compares the native Dockerfile checks against
+(tests/test_dockerfile_checks.py; skipped until recorded). tests/scenarios/expected/ holds the
+hand-written expectations, which are not Trivy output.
+
+Usage: python scripts/record_trivy_parity.py   (requires trivy on PATH)
+Only the fields the parity test uses are kept, so fixtures stay readable and diff well.
+"""
+import sys
+import os
+import glob
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.security_scanner import scan_dockerfile, get_trivy_version_info
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), "..", "tests", "scenarios")
+
+
+def record(path: str):
+    with open(path) as f:
+        scan = scan_dockerfile(f.read())
+    misconfigs = []
+    for result in scan.get("Results", []):
+        for m in result.get("Misconfigurations", []):
+            if m.get("Status", "FAIL") != "FAIL":
+                continue
+            misconfigs.append({
+                "ID": m["ID"],
+                "AVDID": m.get("AVDID"),
+                "Title": m.get("Title"),
+                "Severity": m.get("Severity"),
+                "StartLine": (m.get("CauseMetadata") or {}).get("StartLine") or None,
+            })
+    misconfigs.sort(key=lambda m: (m["StartLine"] or 0, m["ID"]))
+    return {
+        "Source": f"Recorded from trivy config {get_trivy_version_info()['version']}",
+        "Results": [{"Target": "Dockerfile", "Class": "config", "Misconfigurations": misconfigs}],
+    }
+
+
+def main():
+    for path in sorted(glob.glob(os.path.join(SCENARIOS, "*.dockerfile"))):
+        name = os.path.basename(path).replace(".dockerfile", ".json")
+        os.makedirs(os.path.join(SCENARIOS, "trivy"), exist_ok=True)
+        out = os.path.join(SCENARIOS, "trivy", name)
+        with open(out, "w") as f:
+            json.dump(record(path), f, indent=2)
+            f.write("\n")
+        print(f"recorded {out}")
+
+
+if __name__ == "__main__":
+    main()
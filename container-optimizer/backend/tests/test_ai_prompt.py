@@ -0,0 +1,57 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.ai_prompt import build_prompt, compact_misconfigs, summarize_run_chains, estimate_tokens
+
+
+def test_compact_misconfigs_collapses_duplicates():
+    misconfigs = [
+        {"id": "APT_NO_CLEAN", "severity": "LOW", "message": "apt cache not cleaned", "recommendation": "..."},
+        {"id": "APT_NO_CLEAN", "severity": "MEDIUM", "message": "apt cache not cleaned", "recommendation": "..."},
+        {"id": "RUN_AS_ROOT", "severity": "HIGH", "message": "Container runs as root user", "recommendation": "..."},
+    ]
+    compacted = compact_misconfigs(misconfigs)
+    assert [m["id"] for m in compacted] == ["RUN_AS_ROOT", "APT_NO_CLEAN"]
+    assert compacted[1] == {"id": "APT_NO_CLEAN", "severity": "MEDIUM", "message": "apt cache not cleaned", "count": 2}
+    assert "recommendation" not in compacted[0]
+    assert [m["id"] for m in compact_misconfigs(misconfigs[:1], drop_low=True)] == []
+
+    # Distinct problems reported under one rule ID all reach the prompt
+    secrets = [
+        {"id": "DS031", "severity": "HIGH", "message": "Secret in ENV AWS_SECRET_KEY"},
+        {"id": "DS031", "severity": "HIGH", "message": "Secret in ARG GITHUB_TOKEN"},
+    ]
+    assert [m["message"] for m in compact_misconfigs(secrets)] == [m["message"] for m in secrets]
+
+
+def test_summarize_run_chains():
+    dockerfile = "FROM debian:12\nRUN apt-get update && \\\n    " + " && ".join(f"step{i}" for i in range(10)) + "\nCMD run\n"
+    summarized = summarize_run_chains(dockerfile, keep=3)
+    lines = summarized.splitlines()
+    assert lines[0] == "FROM debian:12"
+    assert lines[1].startswith("RUN apt-get update && step0 && step1 && ...")
+    assert "8 more commands omitted" in lines[1]
+    assert lines[2] == "CMD run"
+
+    # Separators are kept as written: `a; b` runs b even when a fails, `a && b` does not
+    mixed = summarize_run_chains("RUN a; b && c; d && e && f\n", keep=3)
+    assert mixed.startswith("RUN a; b && c; ...")
+    assert "3 more commands omitted" in mixed
+
+
+def test_build_prompt_stays_within_budget():
+    print("Testing prompt budgeting...")
+    misconfigs = [{"id": f"RULE_{i % 5}", "severity": "LOW" if i % 2 else "HIGH", "message": f"issue {i % 5}"} for i in range(200)]
+    context = {"image": "uploaded_dockerfile", "runtime": "python", "misconfigurations": misconfigs}
+    small = "FROM python:3.11\nCMD python app.py\n"
+
+    prompt, info = build_prompt(context, small, budget=4000)
+    assert info["compaction"] == ["compact_json"]
+    assert info["misconfigurations"] == 5
+    assert '"id":"RULE_0"' in prompt and "\n  " not in prompt.split("Misconfigurations Found:")[1].split("###")[0]
+
+    huge = "FROM python:3.11\nRUN " + " && ".join(f"pip install package-{i}" for i in range(2000)) + "\n"
+    prompt, info = build_prompt(context, huge, budget=1000)
+    assert "summarize_run_chains" in info["compaction"]
+    assert estimate_tokens(prompt) <= 1000
+    assert info["prompt_tokens"] == estimate_tokens(prompt)
@@ -0,0 +1,71 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.ai_scheduler import AIScheduler, TokenBucket
+
+
+def test_token_bucket_wait_time():
+    bucket = TokenBucket(rate_per_minute=60)  # 1 token/s, capacity 60
+    assert bucket.wait_time(10) == 0.0
+    bucket.consume(60)
+    assert 1.9 < bucket.wait_time(2) <= 2.0
+    # Requests larger than the bucket wait for a full bucket instead of forever
+    assert bucket.wait_time(1000) <= 60
+
+
+def test_scheduler_runs_by_priority_within_concurrency():
+    print("Testing AI scheduler ordering...")
+    scheduler = AIScheduler(requests_per_minute=6000, tokens_per_minute=10**6, max_concurrency=1)
+    gate = threading.Event()
+    order = []
+
+    blocker = scheduler.submit(lambda: gate.wait(2))
+    time.sleep(0.05)
+    futures = [
+        scheduler.submit(order.append, "batch", priority=10),
+        scheduler.submit(order.append, "background", priority=20),
+        scheduler.submit(order.append, "interactive", priority=0),
+    ]
+    gate.set()
+    blocker.result(timeout=2)
+    for f in futures:
+        f.result(timeout=2)
+    assert order == ["interactive", "batch", "background"]
+
+
+def test_scheduler_respects_request_rate():
+    # 2 requests/s with a burst capacity of 2: the third call must wait ~0.5s
+    scheduler = AIScheduler(requests_per_minute=120, tokens_per_minute=10**6, max_concurrency=4)
+    scheduler.request_bucket = TokenBucket(120, capacity=2)
+    started = time.monotonic()
+    results = dict((key, result) for key, result, _ in scheduler.map_as_completed(
+        {i: (lambda i=i: i * 2, (), 0) for i in range(3)}
+    ))
+    assert results == {0: 0, 1: 2, 2: 4}
+    assert time.monotonic() - started >= 0.4
+
+
+def test_calls_without_api_key_fail_fast_without_charging_limits():
+    import tempfile
+    from unittest.mock import patch
+    from app.core import ai_service
+    from app.core.cache import DiskCache
+
+    scheduler = AIScheduler(requests_per_minute=3, tokens_per_minute=8000, max_concurrency=1)
+    with tempfile.TemporaryDirectory() as tmp, \
+         patch.object(ai_service, "GROQ_API_KEY", None), \
+         patch.object(ai_service, "ai_scheduler", scheduler), \
+         patch.object(ai_service, "ai_response_cache", DiskCache("ai_no_key", directory=tmp)):
+        started = time.monotonic()
+        for i in range(6):  # twice the per-minute request budget
+            try:
+                ai_service.optimize_with_ai({"image": f"app:{i}", "misconfigurations": []})
+            except Exception as e:
+                assert "GROQ_API_KEY" in str(e)
+            else:
+                assert False, "Expected the call to fail"
+        assert time.monotonic() - started < 1.0
+    assert scheduler.stats()["request_tokens"] == 3
+    assert scheduler.stats()["llm_tokens"] == 8000
@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock, patch
+from app.core.analysis_watcher import AnalysisWatcher
+from app.core.jobs import JobManager
+from app.core.ai_scheduler import PRIORITY_BACKGROUND
+
+
+class NoEvents:
+    def subscribe(self, listener):
+        pass
+
+
+def _container(image_id, memory=0):
+    return {"Id": "c" * 64, "Image": image_id, "Config": {"Image": "api:1", "User": ""}, "HostConfig": {"Memory": memory}}
+
+
+def test_new_digests_and_configs_are_queued_once():
+    jobs = MagicMock(max_queue=50)
+    jobs.stats.return_value = {"queued": 0}
+    jobs.submit.side_effect = lambda kind, fn, params, priority: {"id": f"job-{jobs.submit.call_count}"}
+    client = MagicMock()
+    client.api.inspect_image.return_value = {"Id": "sha256:img1", "RepoTags": ["api:1"]}
+    watcher = AnalysisWatcher(enabled=True, jobs=jobs, events=NoEvents(), build=MagicMock())
+
+    with patch("app.core.analysis_watcher.get_docker_client", return_value=client):
+        assert watcher.handle("image", "api:1") == "queued"
+        assert watcher.handle("image", "api:latest") == "unchanged", "A re-tag of a known digest is not re-analyzed"
+
+        client.api.inspect_container.return_value = _container("sha256:img1")
+        assert watcher.handle("container", "c1") == "queued"
+        assert watcher.handle("container", "c1") == "unchanged", "A restart with the same config is not re-analyzed"
+
+        client.api.inspect_container.return_value = _container("sha256:img1", memory=512 * 1024 * 1024)
+        assert watcher.handle("container", "c1") == "queued"
+
+        client.api.inspect_image.return_value = {"Id": "sha256:dangling", "RepoTags": []}
+        assert watcher.handle("image", "sha256:dangling") == "skipped"
+
+    assert jobs.submit.call_count == 3
+    assert all(call.kwargs["priority"] > 0 for call in jobs.submit.call_args_list)
+    assert watcher.status()["tracked"] == 3
+
+
+def test_background_jobs_leave_room_for_users_and_retry_after_failure():
+    jobs = JobManager(workers=1, max_queue=4)
+    build = MagicMock(side_effect=RuntimeError("daemon went away"))
+    watcher = AnalysisWatcher(enabled=True, jobs=jobs, events=NoEvents(), build=build)
+
+    client = MagicMock()
+    client.api.inspect_image.return_value = {"Id": "sha256:img", "RepoTags": ["api:1"]}
+    with patch("app.core.analysis_watcher.get_docker_client", return_value=client):
+        assert watcher.handle("image", "api:1") == "queued"
+        job_id = watcher.status()["recent"][0]["job_id"]
+        for _ in range(200):
+            if jobs.get(job_id)["status"] == "failed":
+                break
+            time.sleep(0.01)
+        assert jobs.get(job_id)["status"] == "failed"
+        assert build.call_args.kwargs["ai_priority"] == PRIORITY_BACKGROUND
+        # A failed analysis is forgotten so the next event retries it
+        assert watcher.handle("image", "api:1") == "queued"
+
+    jobs.stats = lambda: {"queued": 2}
+    with patch("app.core.analysis_watcher.get_docker_client", return_value=client):
+        client.api.inspect_image.return_value = {"Id": "sha256:other", "RepoTags": ["web:1"]}
+        assert watcher.handle("image", "web:1") == "queue_full"
+
+
+def test_events_go_through_one_bounded_worker():
+    import queue
+    import threading
+    watcher = AnalysisWatcher(enabled=True, jobs=MagicMock(), events=NoEvents(), build=MagicMock())
+    watcher._events = queue.Queue(maxsize=3)
+    busy, release, handled = threading.Event(), threading.Event(), []
+
+    def _handle(kind, event):
+        busy.set()
+        release.wait(2)
+        handled.append(event["id"])
+
+    with patch.object(watcher, "_handle", side_effect=_handle):
+        watcher._on_event({"Type": "image", "Action": "pull", "id": "img0"})
+        assert busy.wait(1)
+        # A bulk pull while the worker is inspecting: three wait in the backlog, the rest are dropped
+        for i in range(1, 10):
+            watcher._on_event({"Type": "image", "Action": "pull", "id": f"img{i}"})
+        release.set()
+        for _ in range(200):
+            if len(handled) == 4:
+                break
+            time.sleep(0.01)
+    assert handled == ["img0", "img1", "img2", "img3"]
+
+
+def test_watcher_is_opt_in():
+    from app.core.analysis_watcher import analysis_watcher
+    if "ANALYSIS_WATCHER" not in os.environ:
+        assert analysis_watcher.enabled is False, "Pulls must not trigger AI calls and scans unless enabled"
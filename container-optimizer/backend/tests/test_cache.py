@@ -0,0 +1,139 @@
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.cache import TTLCache
+from app.core.report import report_builder
+from unittest.mock import patch
+
+
+def test_ttl_cache_eviction_and_expiry():
+    cache = TTLCache("test", max_entries=2, ttl_seconds=0.2)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # "a" is now most recently used
+    cache.set("c", {"v": 3})
+
+    assert cache.get("b") is None, "Least recently used entry should be evicted"
+    assert cache.get("c") == {"v": 3}
+    time.sleep(0.25)
+    assert cache.get("a") is None, "Expired entry should be dropped"
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["evictions"] == 1
+
+
+def test_concurrent_misses_compute_once():
+    cache = TTLCache("test_flight", max_entries=4, ttl_seconds=60)
+    calls = []
+    release = threading.Event()
+
+    def slow_scan():
+        calls.append(1)
+        release.wait(2)
+        return {"vulnerabilities": []}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("img", slow_scan))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    while cache.flight.in_flight() == 0:
+        time.sleep(0.01)
+    time.sleep(0.1)  # let the other callers join
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1, "Identical in-flight requests should share one computation"
+    assert results == [{"vulnerabilities": []}] * 5
+    results[0]["vulnerabilities"].append("x")
+    assert results[1] == {"vulnerabilities": []}, "Callers must not share mutable results"
+    assert cache.get("img") == {"vulnerabilities": []}
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_static_report_served_from_cache():
+    print("Testing static report cache...")
+    report_builder.static_report_cache.invalidate()
+    dockerfile = "FROM python:3.11\nRUN pip install flask\nCMD [\"python\", \"app.py\"]\n"
+
+    # Reports whose `trivy config` scan failed are not cached, so stand in for Trivy
+    with patch('app.core.report.report_builder.optimize_with_ai') as mock_ai, \
+         patch('app.core.report.report_builder.get_trivy_version_info', return_value={"version": "test"}), \
+         patch('app.core.analyzers.security_analyzer.get_trivy_version_info', return_value={"version": "test"}), \
+         patch('app.core.analyzers.security_analyzer.scan_dockerfile', return_value={"Results": []}):
+        mock_ai.return_value = {"optimized_dockerfile": "FROM python:3.11-slim", "explanation": [], "security_warnings": []}
+
+        first = report_builder.build_static_report(dockerfile)
+        # Same content with CRLF endings and trailing spaces must hit the cache
+        second = report_builder.build_static_report(dockerfile.replace("\n", "  \r\n"))
+
+        assert mock_ai.call_count == 1
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert second["findings"] == first["findings"]
+
+
+def test_image_scan_cached_by_digest_and_db_version():
+    print("Testing digest-keyed Trivy cache...")
+    from app.core.analyzers import security_analyzer
+    security_analyzer.image_scan_cache.invalidate()
+    digests = {"app:latest": "sha256:aaa"}
+    db = {"version": "0.50.0", "vuln_db": "2024-01-01", "check_bundle": None}
+
+    with patch.object(security_analyzer, "resolve_image_id", side_effect=lambda ref: digests[ref]), \
+         patch.object(security_analyzer, "get_trivy_version_info", side_effect=lambda: dict(db)), \
+         patch.object(security_analyzer, "scan_image", return_value={"scan_id": "0" * 32, "vulnerabilities": [], "by_severity": {}}) as mock_scan:
+        security_analyzer.analyze_security("app:latest")
+        security_analyzer.analyze_security("app:latest")
+        assert mock_scan.call_count == 1
+
+        # Tag moved to a new digest
+        digests["app:latest"] = "sha256:bbb"
+        security_analyzer.analyze_security("app:latest")
+        assert mock_scan.call_count == 2
+
+        # Vulnerability DB updated
+        db["vuln_db"] = "2024-01-02"
+        security_analyzer.analyze_security("app:latest")
+        assert mock_scan.call_count == 3
+
+
+def test_ai_response_cache_ignores_formatting():
+    print("Testing persistent AI cache...")
+    import tempfile
+    from app.core import ai_service
+    from app.core.cache import DiskCache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        disk_cache = DiskCache("ai_test", directory=tmp, max_entries=2)
+        context = {"image": "uploaded_dockerfile", "runtime": "python", "misconfigurations": [{"id": "RUN_AS_ROOT", "message": "Container runs as root user"}]}
+        original = "FROM python:3.11\nRUN pip install a \\\n    b\nCMD python app.py\n"
+        reformatted = "# build image\nFROM python:3.11\n\nRUN pip install a b   # deps\nCMD python app.py\n"
+
+        with patch.object(ai_service, "ai_response_cache", disk_cache), \
+             patch.object(ai_service, "GROQ_API_KEY", "test-key"), \
+             patch.object(ai_service, "_request_optimization", return_value={"optimized_dockerfile": "FROM python:3.11-slim"}) as mock_ai:
+            ai_service.optimize_with_ai(context, original)
+            result = ai_service.optimize_with_ai(context, reformatted)
+
+            assert mock_ai.call_count == 1
+            assert result == {"optimized_dockerfile": "FROM python:3.11-slim"}
+
+            ai_service.optimize_with_ai(context, original.replace("python:3.11", "python:3.12"))
+            assert mock_ai.call_count == 2
+
+            # Same tag, new image after a pull: not served the old image's answer
+            pulled = {"image": "app:latest", "runtime": "python", "misconfigurations": []}
+            ai_service.optimize_with_ai({**pulled, "image_id": "sha256:old"})
+            ai_service.optimize_with_ai({**pulled, "image_id": "sha256:old"})
+            assert mock_ai.call_count == 3
+            ai_service.optimize_with_ai({**pulled, "image_id": "sha256:new"})
+            assert mock_ai.call_count == 4
+
+        for i in range(3):
+            disk_cache.set(f"k{i}", {"i": i})
+        assert disk_cache.stats()["entries"] == 2
+        assert disk_cache.purge() == 2
+        assert disk_cache.get("k2") is None
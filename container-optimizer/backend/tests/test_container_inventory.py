@@ -0,0 +1,96 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock, patch
+from app.core.container_inventory import ContainerInventory, build_listing
+
+
+class FakeEvents:
+    def __init__(self):
+        self.connected = True
+        self.generation = 1
+        self.listeners = []
+
+    def start(self):
+        pass
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def emit(self, type_, action, actor_id=None):
+        for listener in self.listeners:
+            listener({"Type": type_, "Action": action, "Actor": {"ID": actor_id}})
+
+
+CONTAINERS = [
+    {"Id": "a" * 64, "Names": ["/api"], "ImageID": "sha256:img", "State": "running"},
+    {"Id": "b" * 64, "Names": ["/job"], "ImageID": "sha256:gone", "State": "exited"},
+]
+IMAGES = [{"Id": "sha256:img", "RepoTags": ["api:1"], "Size": 150 * 1024 * 1024}]
+
+
+def test_listing_joins_containers_with_images():
+    listing = build_listing(CONTAINERS, IMAGES)
+    assert listing[0] == {"id": "a" * 12, "name": "api", "image": "api:1", "status": "running", "image_size_mb": 150.0}
+    assert listing[1]["image"] == "b" * 12 and listing[1]["image_size_mb"] == 0
+
+
+def test_listing_cached_until_an_event_arrives():
+    events = FakeEvents()
+    inventory = ContainerInventory(events=events, max_age=60)
+    client = MagicMock()
+    client.api.containers.return_value = CONTAINERS
+    client.api.images.return_value = IMAGES
+
+    with patch("app.core.container_inventory.get_docker_client", return_value=client):
+        inventory.list()
+        inventory.list()
+        assert client.api.containers.call_count == 1, "Unchanged hosts are served from the snapshot"
+
+        events.emit("container", "exec_start: sh")  # irrelevant to the listing
+        inventory.list()
+        assert client.api.containers.call_count == 1
+
+        events.emit("container", "die")
+        inventory.list()
+        assert client.api.containers.call_count == 2
+
+        # Events may have been missed while reconnecting
+        events.generation += 1
+        inventory.list()
+        assert client.api.containers.call_count == 3
+
+        events.connected = False
+        inventory.list()
+        inventory.list()
+        assert client.api.containers.call_count == 5
+    assert client.api.images.call_count == 5
+
+
+def test_limits_inspected_once_per_container():
+    events = FakeEvents()
+    inventory = ContainerInventory(events=events, max_age=60)
+    client = MagicMock()
+    client.api.containers.return_value = CONTAINERS
+    client.api.images.return_value = IMAGES
+    client.api.inspect_container.return_value = {"HostConfig": {"Memory": 512 * 1024 * 1024, "NetworkMode": "bridge"}}
+
+    with patch("app.core.container_inventory.get_docker_client", return_value=client):
+        first = inventory.running_limits()
+        assert [(s["Id"], limits) for s, limits in first] == [("a" * 64, {"Memory": 512 * 1024 * 1024})]
+        assert inventory.running_limits() == first
+        assert client.api.inspect_container.call_count == 1, "Only running containers, and only once"
+
+        # Another container starting rebuilds the listing but does not re-inspect known ones
+        events.emit("container", "start", "b" * 64)
+        inventory.running_limits()
+        assert client.api.containers.call_count == 2 and client.api.inspect_container.call_count == 1
+
+        # `docker update` may change the limits
+        events.emit("container", "update", "a" * 64)
+        inventory.running_limits()
+        assert client.api.inspect_container.call_count == 2
+
+        events.generation += 1
+        inventory.running_limits()
+        assert client.api.inspect_container.call_count == 3
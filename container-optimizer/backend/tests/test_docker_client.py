@@ -0,0 +1,88 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+from unittest.mock import patch
+import requests
+from app.docker import client as client_module
+from app.docker.client import DockerClientManager, reporting_failures
+
+
+class FakeClient:
+    def __init__(self, host):
+        self.host = host
+        self.pings = 0
+        self.healthy = True
+        self.closed = False
+
+    def ping(self):
+        self.pings += 1
+        if not self.healthy:
+            raise ConnectionError("socket closed")
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+def test_one_shared_client_per_host_with_lazy_health_checks():
+    created = []
+
+    def factory(host):
+        created.append(FakeClient(host))
+        return created[-1]
+
+    manager = DockerClientManager(factory=factory, health_interval=60)
+    threads = [threading.Thread(target=manager.get) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    client = manager.get()
+    assert manager.get() is client
+    assert sum(not c.closed for c in created) == 1, "Concurrent first calls must end up sharing one client"
+    assert client.pings == 1, "Fresh clients are not pinged again within the health interval"
+
+    remote = manager.get("tcp://builder:2376")
+    assert remote is not client and remote.host == "tcp://builder:2376"
+
+    # After a reported failure the next call checks, finds the daemon gone and reconnects
+    client.healthy = False
+    manager.report_failure()
+    replacement = manager.get()
+    assert replacement is not client and client.closed and manager.stats()["reconnects"] == 1
+
+
+def test_connection_errors_in_docker_calls_trigger_a_health_check():
+    created = []
+
+    def factory(host):
+        created.append(FakeClient(host))
+        return created[-1]
+
+    manager = DockerClientManager(factory=factory, health_interval=60)
+    client = manager.get()
+    with patch.object(client_module, "docker_clients", manager):
+        # An error the daemon returned says nothing about the connection
+        with pytest.raises(ValueError):
+            with reporting_failures():
+                raise ValueError("No such image")
+        assert manager.get() is client and client.pings == 1
+
+        client.healthy = False
+        with pytest.raises(requests.exceptions.ConnectionError):
+            with reporting_failures():
+                raise requests.exceptions.ConnectionError("Connection aborted")
+        replacement = manager.get()
+    assert replacement is not client and client.closed
+
+
+def test_unreachable_daemon_raises_runtime_error():
+    def factory(host):
+        client = FakeClient(host)
+        client.healthy = False
+        return client
+
+    with pytest.raises(RuntimeError, match="Docker not accessible"):
+        DockerClientManager(factory=factory).get()
@@ -0,0 +1,54 @@
+import sys
+import os
+import logging
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import MagicMock, patch
+from app.docker import events
+from app.docker.events import DockerEvents
+
+
+class RecordingStop(threading.Event):
+    """Records each reconnect delay instead of sleeping through it."""
+
+    def __init__(self):
+        super().__init__()
+        self.waits = []
+
+    def wait(self, timeout=None):
+        self.waits.append(timeout)
+        return self.is_set()
+
+
+def test_reconnect_backs_off_and_logs_once_per_outage(caplog):
+    print("Testing Docker events reconnect backoff...")
+    subscription = DockerEvents()
+    subscription._stop = RecordingStop()
+    received = []
+    subscription.subscribe(received.append)
+    refused = ConnectionError("connection refused")
+    outage = [refused] * 5 + [ConnectionError("permission denied")]
+
+    def _connect():
+        if outage:
+            raise outage.pop(0)
+        # Recovered: deliver one event, then shut down
+        subscription._stop.set()
+        client = MagicMock()
+        client.events.return_value = iter([{"Type": "container", "Action": "start"}])
+        return client
+
+    with patch.object(events, "new_docker_client", side_effect=_connect), \
+         patch.object(events, "DOCKER_EVENTS_RECONNECT_SECONDS", 5), \
+         patch.object(events, "DOCKER_EVENTS_MAX_BACKOFF_SECONDS", 60), \
+         caplog.at_level(logging.INFO, logger="app.docker.events"):
+        subscription._run()
+
+    assert subscription._stop.waits[:6] == [5, 10, 20, 40, 60, 60]
+    messages = [r.getMessage() for r in caplog.records]
+    assert messages == [
+        "Docker events subscription lost: connection refused",
+        "Docker events subscription lost: permission denied",
+        "Docker events subscription restored after 6 failed attempt(s)",
+    ]
+    assert received == [{"Type": "container", "Action": "start"}]
@@ -0,0 +1,179 @@
+import sys
+import os
+import glob
+import json
+import subprocess
+from collections import Counter
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.analyzers.dockerfile_checks import run_dockerfile_checks
+from app.core.analyzers.security_analyzer import analyze_dockerfile_security
+
+SCENARIOS = os.path.join(os.path.dirname(__file__), "scenarios")
+
+
+def _ids(content):
+    return Counter(f["id"] for f in run_dockerfile_checks(content))
+
+
+def _misconfigs(fixture_dir: str, dockerfile_path: str):
+    with open(os.path.join(fixture_dir, os.path.basename(dockerfile_path).replace(".dockerfile", ".json"))) as f:
+        return [m for r in json.load(f)["Results"] for m in r["Misconfigurations"]]
+
+
+def _assert_matches(dockerfile_path: str, expected: list):
+    with open(dockerfile_path) as f:
+        native = run_dockerfile_checks(f.read())
+    name = os.path.basename(dockerfile_path)
+    assert Counter((f["id"], f["severity"]) for f in native) == Counter((m["ID"], m["Severity"]) for m in expected), name
+    expected_lines = sorted((m["ID"], m["StartLine"]) for m in expected if m["StartLine"])
+    assert sorted((f["id"], f["line"]) for f in native if f["line"]) == expected_lines, name
+
+
+def test_native_checks_match_expected_scenarios():
+    print("Testing native Dockerfile checks against expected scenario results...")
+    paths = sorted(glob.glob(os.path.join(SCENARIOS, "*.dockerfile")))
+    assert paths
+    for path in paths:
+        _assert_matches(path, _misconfigs(os.path.join(SCENARIOS, "expected"), path))
+
+
+def test_parity_with_recorded_trivy_output():
+    # Fixtures recorded from a real `trivy config` run by scripts/record_trivy_parity.py
+    recorded = os.path.join(SCENARIOS, "trivy")
+    paths = [p for p in sorted(glob.glob(os.path.join(SCENARIOS, "*.dockerfile")))
+             if os.path.exists(os.path.join(recorded, os.path.basename(p).replace(".dockerfile", ".json")))]
+    if not paths:
+        pytest.skip("no recorded Trivy output; run scripts/record_trivy_parity.py with trivy on PATH")
+    for path in paths:
+        _assert_matches(path, _misconfigs(recorded, path))
+
+
+def test_instruction_checks():
+    dockerfile = "\n".join([
+        "FROM alpine:3.19 AS base",
+        "MAINTAINER someone@example.com",
+        "RUN apk add curl && wget -q https://example.com/x",
+        "FROM base AS base",
+        "WORKDIR app",
+        "ADD src/ /app/",
+        "ADD release.tar.gz /opt/",
+        "COPY --from=base a.txt b.txt /dest",
+        "RUN sudo apt-get install curl",
+        "RUN cd /tmp && curl -fsSLO https://example.com/y",
+        "RUN yum install -y httpd",
+        "RUN apt-get update",
+        "EXPOSE 22 70000 8000-9000",
+        "HEALTHCHECK CMD true",
+        "HEALTHCHECK CMD false",
+        "CMD [\"a\"]",
+        "CMD [\"b\"]",
+        "USER root",
+    ])
+    ids = _ids(dockerfile)
+    for check_id in ("DS002", "DS004", "DS005", "DS006", "DS008", "DS009", "DS010", "DS011", "DS012", "DS013",
+                     "DS014", "DS015", "DS016", "DS017", "DS021", "DS022", "DS023", "DS025", "DS029"):
+        assert ids[check_id] >= 1, check_id
+    assert ids["DS005"] == 1, "ADD of a tar archive is allowed"
+    assert "DS001" not in ids and "DS026" not in ids
+
+
+def test_clean_dockerfile_has_no_findings():
+    dockerfile = """
+FROM python:3.11-slim AS build
+WORKDIR /app
+RUN apt-get update && apt-get install -y --no-install-recommends gcc && rm -rf /var/lib/apt/lists/*
+FROM python:3.11-slim
+COPY --from=build /app /app
+USER app
+HEALTHCHECK CMD python -c "print(1)"
+CMD ["python", "app.py"]
+"""
+    assert run_dockerfile_checks(dockerfile) == []
+    from unittest.mock import patch
+    from app.core.analyzers import security_analyzer
+    with patch.object(security_analyzer, "DOCKERFILE_NATIVE_CHECKS", True):
+        result = analyze_dockerfile_security(dockerfile, deep=False)
+    assert result["status"] == "ok" and result["engines"] == {"native": "ok"}
+
+
+def test_trivy_config_is_the_default_engine():
+    from unittest.mock import patch
+    from app.core import security_scanner
+    from app.core.analyzers import security_analyzer
+    security_analyzer.dockerfile_scan_cache.invalidate()
+    dockerfile = "FROM python:3.11\nMAINTAINER someone@example.com\n"
+    scan = {"Results": [{"Misconfigurations": [{"ID": "DS022", "Title": "Deprecated MAINTAINER used", "Severity": "HIGH"}]}]}
+
+    with patch.object(security_analyzer, "get_trivy_version_info", return_value={"version": "test"}), \
+         patch.object(security_analyzer, "scan_dockerfile", return_value=scan), \
+         patch.object(security_analyzer, "run_dockerfile_checks") as native:
+        result = analyze_dockerfile_security(dockerfile, deep=False)
+    assert not native.called
+    assert result["status"] == "ok" and result["engines"] == {"trivy": "ok"}
+    assert [v["id"] for v in result["vulnerabilities"]] == ["DS022"]
+
+    security_analyzer.dockerfile_scan_cache.invalidate()
+    failed = subprocess.CalledProcessError(1, ["trivy", "config"])
+    with patch.object(security_analyzer, "get_trivy_version_info", return_value={"version": "test"}), \
+         patch.object(security_scanner.subprocess, "run", side_effect=failed):
+        result = analyze_dockerfile_security(dockerfile)
+    assert result["status"] == "error" and result["engines"] == {"trivy": "error"} and result["error"]
+
+
+def test_batch_trivy_config_scan_runs_once_and_splits_results():
+    print("Testing batched trivy config...")
+    from unittest.mock import patch
+    from app.core import security_scanner
+    from app.core.analyzers import security_analyzer
+    security_analyzer.dockerfile_scan_cache.invalidate()
+    calls = []
+
+    def _run(cmd, **kwargs):
+        calls.append(cmd)
+        tree = cmd[-1]
+        results = []
+        for directory in sorted(os.listdir(tree)):
+            with open(os.path.join(tree, directory, "Dockerfile")) as f:
+                if "SECRET" in f.read():
+                    results.append({"Target": f"{directory}/Dockerfile", "Class": "secret",
+                                    "Secrets": [{"RuleID": "generic-secret", "Title": "Secret", "Severity": "CRITICAL"}]})
+        with open(cmd[cmd.index("--output") + 1], "w") as f:
+            json.dump({"Results": results}, f)
+
+    contents = {
+        "api/Dockerfile": "FROM python:3.11-slim\nENV SECRET=abc\nUSER app\nHEALTHCHECK CMD true\n",
+        "web/Dockerfile": "FROM node:20-slim\nUSER node\nHEALTHCHECK CMD true\n",
+    }
+    with patch.object(security_analyzer, "DOCKERFILE_NATIVE_CHECKS", True), \
+         patch.object(security_analyzer, "get_trivy_version_info", return_value={"version": "test"}), \
+         patch.object(security_scanner.subprocess, "run", side_effect=_run):
+        results = security_analyzer.analyze_dockerfiles_security(contents, deep=True)
+        # Per-file calls afterwards are served from the cache
+        single = security_analyzer.analyze_dockerfile_security(contents["api/Dockerfile"], deep=True)
+
+    assert len(calls) == 1
+    assert [v["id"] for v in results["api/Dockerfile"]["vulnerabilities"]] == ["generic-secret"]
+    assert results["web/Dockerfile"]["vulnerabilities"] == []
+    assert results["api/Dockerfile"]["engines"] == {"native": "ok", "trivy": "ok"}
+    assert single == results["api/Dockerfile"]
+
+
+def test_failed_trivy_config_scan_is_reported_and_not_cached():
+    from unittest.mock import patch
+    from app.core import security_scanner
+    from app.core.analyzers import security_analyzer
+    security_analyzer.dockerfile_scan_cache.invalidate()
+    dockerfile = "FROM python:3.11-slim\nUSER app\nHEALTHCHECK CMD true\n"
+    failed = subprocess.CalledProcessError(1, ["trivy", "config"])
+
+    with patch.object(security_analyzer, "DOCKERFILE_NATIVE_CHECKS", True), \
+         patch.object(security_analyzer, "get_trivy_version_info", return_value={"version": "test"}), \
+         patch.object(security_scanner.subprocess, "run", side_effect=failed) as mock_run:
+        single = security_analyzer.analyze_dockerfile_security(dockerfile, deep=True)
+        batch = security_analyzer.analyze_dockerfiles_security({"Dockerfile": dockerfile}, deep=True)
+        assert mock_run.call_count == 2  # the failure was not cached
+
+    assert single["engines"] == {"native": "ok", "trivy": "error"}
+    assert batch["Dockerfile"]["engines"] == {"native": "ok", "trivy": "error"}
+    assert security_analyzer.dockerfile_scan_cache.stats()["entries"] == 0
@@ -0,0 +1,46 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "scripts")))
+from app.core.report.findings import merge_findings
+from bench_findings import legacy_merge_findings, generate_inputs
+
+
+def test_merge_matches_legacy_behavior():
+    print("Testing findings merge parity...")
+    for count in (0, 50, 800):
+        legacy = legacy_merge_findings(*generate_inputs(count), "Implemented in the optimized Dockerfile.")
+        indexed = merge_findings(*generate_inputs(count), "Implemented in the optimized Dockerfile.")
+        assert indexed == legacy, f"Mismatch with {count} CVEs"
+
+
+def test_merge_marks_hybrid_and_skips_mentioned_cves():
+    misconfigs = [{"id": "RUN_AS_ROOT", "severity": "HIGH", "message": "Container runs as root user"}]
+    warnings = ["[RUN_AS_ROOT] Runs as root", "Upgrade openssl to fix CVE-2024-0001"]
+    vulns = [
+        {"id": "CVE-2024-0001", "title": "openssl: overflow", "severity": "CRITICAL"},
+        {"id": "CVE-2024-0002", "title": "zlib: overflow", "severity": "HIGH"},
+        {"id": "CVE-2024-0002", "title": "zlib: overflow", "severity": "HIGH"},
+        {"id": "CVE-2024-0003", "title": "bash: minor", "severity": "LOW"},
+    ]
+    findings = merge_findings(misconfigs, warnings, vulns, "Implemented in the optimized Dockerfile.")
+
+    assert findings[0]["source"] == "hybrid"
+    assert [f["id"] for f in findings if f["source"] == "security_scanner"] == ["CVE-2024-0002"]
+
+
+def test_scanner_ids_match_as_substrings():
+    misconfigs = [{"id": "SBOM", "severity": "HIGH", "message": "Vulnerable pkg:CVE-2023-12345 in libxml2"}]
+    vulns = [
+        {"id": "CVE-2023-12345", "title": "libxml2: overflow", "severity": "HIGH"},
+        {"id": "CVE-2023-1234", "title": "libxml2: prefix", "severity": "HIGH"},
+        {"id": "CVE-2023-9999", "title": "zlib: overflow", "severity": "HIGH"},
+        {"id": "CVE-2023-99999", "title": "zlib: longer", "severity": "HIGH"},
+        {"id": "GO", "title": "short id", "severity": "HIGH"},
+    ]
+    findings = merge_findings(misconfigs, [], vulns, "")
+    legacy = legacy_merge_findings(
+        [dict(m) for m in misconfigs], [], [dict(v) for v in vulns], ""
+    )
+    assert findings == legacy
+    assert [f["id"] for f in findings if f["source"] == "security_scanner"] == ["CVE-2023-9999", "CVE-2023-99999", "GO"]
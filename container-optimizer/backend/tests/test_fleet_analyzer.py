@@ -0,0 +1,61 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from app.core.fleet_analyzer import build_fleet_report, chain_ids
+
+MB = 1024 * 1024
+
+
+def _image(name, layers, size_mb):
+    return {"id": "sha256:" + name.replace(":", "").ljust(64, "0"), "tags": [name], "size": size_mb * MB, "layers": layers}
+
+
+def test_chain_ids_follow_the_oci_formula():
+    chains = chain_ids(["sha256:a", "sha256:b"])
+    assert chains[0] == "sha256:a"
+    assert chains[1] != "sha256:b" and chain_ids(["sha256:a", "sha256:b", "sha256:c"])[:2] == chains
+
+
+def test_shared_bases_and_consolidation_savings():
+    images = [
+        _image("debian:bookworm-slim", ["sha256:deb"], 75),
+        _image("python:3.11-slim", ["sha256:deb", "sha256:py311"], 130),
+        _image("python:3.12-slim", ["sha256:deb", "sha256:py312"], 125),
+        _image("api:1", ["sha256:deb", "sha256:py311", "sha256:api"], 150),
+        _image("worker:1", ["sha256:deb", "sha256:py311", "sha256:worker"], 140),
+        _image("billing:1", ["sha256:deb", "sha256:py312", "sha256:billing"], 135),
+    ]
+    with patch("app.core.fleet_analyzer.cached_layer_size", return_value=None):
+        report = build_fleet_report(images)
+
+    assert report["disk"]["exact"] is True
+    # deb 75 + py311 55 + py312 50 + api 20 + worker 10 + billing 10
+    assert report["disk"]["actual_bytes"] == 220 * MB
+    assert report["disk"]["virtual_bytes"] == 755 * MB
+
+    by_name = {b["base"]: b for b in report["base_images"]}
+    assert by_name["python:3.11-slim"]["images"] == ["api:1", "worker:1"]
+    assert by_name["python:3.11-slim"]["unique_bytes"] == 55 * MB
+    assert by_name["python:3.11-slim"]["app_bytes"] == 30 * MB
+    assert by_name["debian:bookworm-slim"]["image_count"] == 2  # the two python bases
+
+    python = next(c for c in report["consolidation"] if c["family"] == "python")
+    assert python["target"] == "python:3.11-slim" and python["replace"] == ["python:3.12-slim"]
+    assert python["disk_savings_bytes"] == 50 * MB
+    assert report["top_shared_layers"][0]["diff_id"] == "sha256:deb"
+
+
+def test_untagged_shared_base_uses_cached_layer_sizes():
+    images = [
+        _image("api:1", ["sha256:base", "sha256:api"], 110),
+        _image("worker:1", ["sha256:base", "sha256:worker"], 105),
+    ]
+    sizes = {"sha256:base": 100 * MB}
+    with patch("app.core.fleet_analyzer.cached_layer_size", side_effect=sizes.get):
+        report = build_fleet_report(images)
+
+    base = report["base_images"][0]
+    assert base["base"].startswith("untagged layers") and base["image_count"] == 2
+    assert base["size_bytes"] == 100 * MB
+    assert report["disk"]["actual_bytes"] == 115 * MB and report["disk"]["exact"] is True
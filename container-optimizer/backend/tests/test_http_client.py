@@ -0,0 +1,68 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core import http_client
+from unittest.mock import patch, MagicMock
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+
+def _response(status, headers=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = headers or {}
+    return resp
+
+
+def test_retries_honor_retry_after_and_method_semantics():
+    print("Testing pooled HTTP client retries...")
+    session = MagicMock()
+    session.request.side_effect = [_response(429, {"Retry-After": "0"}), _response(503), _response(200)]
+
+    with patch.object(http_client, "get_session", return_value=session), \
+         patch.object(http_client.time, "sleep") as mock_sleep:
+        resp = http_client.get("https://api.github.com/repos/o/r")
+        assert resp.status_code == 200
+        assert session.request.call_count == 3
+        assert mock_sleep.call_args_list[0].args == (0.0,)
+
+        # A 5xx on a non-idempotent POST is returned as-is instead of being replayed
+        session.request.reset_mock(side_effect=True)
+        session.request.side_effect = [_response(502), _response(200)]
+        assert http_client.post("https://api.github.com/repos/o/r/pulls", json={}).status_code == 502
+        assert session.request.call_count == 1
+
+
+def test_default_timeout_applied():
+    session = MagicMock()
+    session.request.return_value = _response(200)
+    with patch.object(http_client, "get_session", return_value=session):
+        http_client.get("https://api.github.com/user")
+    assert session.request.call_args.kwargs["timeout"] == (http_client.HTTP_CONNECT_TIMEOUT, http_client.HTTP_READ_TIMEOUT)
+
+
+def test_non_idempotent_requests_resent_only_if_never_sent():
+    refused = requests.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "Connection refused")))
+    reset = requests.ConnectionError(ProtocolError("Connection aborted.", ConnectionResetError(104, "reset")))
+    session = MagicMock()
+
+    with patch.object(http_client, "get_session", return_value=session), patch.object(http_client.time, "sleep"):
+        session.request.side_effect = [refused, requests.ConnectTimeout(), _response(201)]
+        assert http_client.post("https://api.github.com/repos/o/r/pulls", json={}).status_code == 201
+        assert session.request.call_count == 3
+
+        # The body may already have been processed: creating the PR again could duplicate it
+        for error in (reset, requests.ReadTimeout()):
+            session.request.reset_mock(side_effect=True)
+            session.request.side_effect = [error, _response(201)]
+            try:
+                http_client.post("https://api.github.com/repos/o/r/pulls", json={})
+            except requests.RequestException as e:
+                assert e is error
+            else:
+                assert False, "Expected the error to be raised"
+            assert session.request.call_count == 1
+
+        session.request.reset_mock(side_effect=True)
+        session.request.side_effect = [reset, _response(200)]
+        assert http_client.get("https://api.github.com/repos/o/r").status_code == 200
@@ -0,0 +1,68 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.jobs import JobManager, QueueFullError
+from fastapi import HTTPException
+
+
+def _wait_for(manager, job_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get(job_id, include_result=True)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError("Job did not finish in time")
+
+
+def test_jobs_run_in_background_with_progress():
+    print("Testing job queue...")
+    manager = JobManager(workers=1, max_queue=5)
+    release = threading.Event()
+
+    def _scan(on_section):
+        on_section("image_analysis", {})
+        release.wait(2)
+        return {"image": "app:1"}
+
+    first = manager.submit("image-report", _scan)
+    second = manager.submit("image-report", lambda on_section: {"image": "app:2"})
+    time.sleep(0.05)
+
+    assert manager.get(first["id"])["status"] == "running"
+    assert manager.get(second["id"])["queue_position"] == 1
+
+    release.set()
+    done = _wait_for(manager, first["id"])
+    assert done["result"] == {"image": "app:1"}
+    assert done["progress"]["sections"] == ["image_analysis"]
+    assert done["timings"]["run_ms"] is not None
+    assert _wait_for(manager, second["id"])["result"] == {"image": "app:2"}
+
+
+def test_job_queue_bounded_and_errors_recorded():
+    manager = JobManager(workers=1, max_queue=1)
+    block = threading.Event()
+    manager.submit("scan", lambda on_section: block.wait(2))
+    time.sleep(0.05)
+    queued = manager.submit("scan", lambda on_section: None)
+    try:
+        manager.submit("scan", lambda on_section: None)
+    except QueueFullError:
+        pass
+    else:
+        assert False, "Expected the queue to be full"
+    block.set()
+    _wait_for(manager, queued["id"])
+
+    def _missing(on_section):
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    failed = _wait_for(manager, manager.submit("scan", _missing)["id"])
+    assert failed["status"] == "failed"
+    assert failed["error"] == {"status_code": 404, "detail": "Image not found"}
+    # Finished jobs drop their closures (request arguments, tokens) right away
+    assert manager._jobs[failed["id"]]["_fn"] is None
+    assert manager._jobs[queued["id"]]["_fn"] is None
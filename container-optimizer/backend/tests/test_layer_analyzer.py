@@ -0,0 +1,112 @@
+import sys
+import os
+import io
+import hashlib
+import tarfile
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core import layer_analyzer
+from app.core.layer_analyzer import read_image_export, compute_efficiency, layer_misconfigs, load_layers, image_inventory
+
+MB = 1024 * 1024
+
+
+def _tar(entries):
+    """entries: list of (name, size or contents) for files, or (name, None) for directories."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, size in entries:
+            info = tarfile.TarInfo(name)
+            if size is None:
+                info.type = tarfile.DIRTYPE
+                tar.addfile(info)
+            else:
+                data = size if isinstance(size, bytes) else b"\0" * size
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _export(members):
+    """A `docker save`-style tarball from (name, bytes) members, served in small chunks."""
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, payload in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(payload)
+            tar.addfile(info, io.BytesIO(payload))
+    data = buffer.getvalue()
+    return (data[i:i + 1000] for i in range(0, len(data), 1000))
+
+
+def test_overwritten_deleted_and_cache_bytes():
+    base = _tar([("usr/", None), ("usr/lib/", None), ("usr/lib/big.so", 3 * MB), ("usr/lib/keep.so", MB),
+                 ("opt/", None), ("opt/tool/", None), ("opt/tool/a", MB), ("opt/tool/b", MB)])
+    app = _tar([("usr/lib/big.so", 2 * MB),          # overwrites 3 MB
+                ("opt/.wh.tool", 0),                 # deletes the 2 MB directory
+                ("var/cache/apt/archives/x.deb", 6 * MB),
+                ("./.bashrc", 10)])
+    parsed = read_image_export(_export([
+        ("blobs/sha256/cfg", b'{"architecture": "amd64"}'),
+        ("blobs/sha256/aaa", base),
+        ("blobs/sha256/bbb", app),
+        ("manifest.json", b"[]"),
+    ]))
+    assert set(parsed) == {"sha256:aaa", "sha256:bbb"}
+    layers = [parsed["sha256:aaa"], parsed["sha256:bbb"]]
+    assert ".bashrc" in layers[1].files
+
+    result = compute_efficiency(layers, ["sha256:aaa", "sha256:bbb"])
+    assert result["total_bytes"] == 6 * MB + 8 * MB + 10
+    assert result["wasted_bytes"] == 5 * MB
+    assert result["layers"][0]["wasted_bytes"] == 5 * MB and result["layers"][0]["diff_id"] == "sha256:aaa"
+    assert result["cache_bytes"] == 6 * MB
+    assert result["package_caches"][0]["manager"] == "apt"
+    assert result["top_wasted_files"][0] == {"path": "/usr/lib/big.so", "dead_copies": 1, "wasted_bytes": 3 * MB}
+    assert 0.64 < result["efficiency"] < 0.65
+
+    ids = {m["id"] for m in layer_misconfigs({"status": "ok", **result})}
+    assert ids == {"LAYER_WASTED_BYTES", "LAYER_PACKAGE_CACHE"}
+
+
+def test_opaque_directory_hides_lower_contents():
+    lower = _tar([("app/", None), ("app/old.js", 4 * MB)])
+    upper = _tar([("app/", None), ("app/.wh..wh..opq", 0), ("app/new.js", MB)])
+    parsed = read_image_export(_export([("a/layer.tar", lower), ("b/layer.tar", upper)]))
+    # Legacy exports are keyed by the hash of each layer tarball, which is its diff ID
+    diff_ids = ["sha256:" + hashlib.sha256(t).hexdigest() for t in (lower, upper)]
+    assert set(parsed) == set(diff_ids)
+
+    result = compute_efficiency([parsed[d] for d in diff_ids])
+    assert result["wasted_bytes"] == 4 * MB
+    assert result["visible_bytes"] == MB
+
+
+def test_shared_base_layers_are_parsed_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(layer_analyzer.layer_contents_cache, "directory", str(tmp_path))
+    status = b"Package: libc6\nStatus: install ok installed\nVersion: 2.36\n\nPackage: gone\nStatus: deinstall ok config-files\nVersion: 1\n"
+    base = _tar([("var/lib/dpkg/status", status), ("usr/local/bin/python3.11", 10)])
+    app_one = _tar([("usr/local/lib/python3.11/site-packages/flask-3.0.0.dist-info/METADATA", 5)])
+    app_two = _tar([("app/main.js", 5)])
+
+    exports = []
+
+    def _export_of(*layers):
+        def _chunks():
+            exports.append(layers)
+            return _export([(f"blobs/sha256/{name}", data) for name, data in layers])
+        return _chunks
+
+    layers, parsed = load_layers("img1", ["sha256:base", "sha256:one"], _export_of(("base", base), ("one", app_one)))
+    assert parsed == 2
+    packages, hints = image_inventory(layers)
+    assert packages == {"dpkg": {"libc6": "2.36"}, "pip": {"flask": "3.0.0"}}
+    assert hints == ["python"]
+
+    # A second image on the same base only parses its own layer
+    layers, parsed = load_layers("img2", ["sha256:base", "sha256:two"], _export_of(("base", b"not a tar"), ("two", app_two)))
+    assert parsed == 1
+    assert "var/lib/dpkg/status" in layers[0].files and "app/main.js" in layers[1].files
+
+    # Fully cached images need no export at all
+    layers, parsed = load_layers("img1", ["sha256:base", "sha256:one"], _export_of())
+    assert parsed == 0 and len(exports) == 2
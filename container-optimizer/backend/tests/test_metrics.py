@@ -0,0 +1,27 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.metrics import Counter, Histogram, render_latest, observe_call
+
+
+def test_prometheus_exposition_format():
+    requests_total = Counter("test_requests_total", "Test counter.", ("route",))
+    latency = Histogram("test_latency_seconds", "Test histogram.", ("route",), buckets=(0.1, 1))
+    requests_total.inc(route="/api/containers")
+    requests_total.inc(route="/api/containers")
+    latency.observe(0.05, route="/api/containers")
+    latency.observe(0.5, route="/api/containers")
+
+    try:
+        with observe_call("trivy", "image"):
+            raise RuntimeError("scan failed")
+    except RuntimeError:
+        pass
+
+    text = render_latest()
+    assert 'test_requests_total{route="/api/containers"} 2' in text
+    assert 'test_latency_seconds_bucket{route="/api/containers",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{route="/api/containers",le="+Inf"} 2' in text
+    assert 'test_latency_seconds_count{route="/api/containers"} 2' in text
+    assert 'optimizer_external_call_duration_seconds_count{dependency="trivy",operation="image",outcome="error"} 1' in text
+    assert "# TYPE optimizer_cache_hit_ratio gauge" in text
@@ -0,0 +1,87 @@
+import sys
+import os
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.report.pipeline import Stage, run_stages
+
+
+def test_independent_stages_run_concurrently():
+    print("Testing concurrent stage execution...")
+    started = time.monotonic()
+    results, timings = run_stages([
+        Stage("a", lambda: time.sleep(0.3) or "a"),
+        Stage("b", lambda: time.sleep(0.3) or "b"),
+        Stage("c", lambda a, b: a + b, requires=("a", "b")),
+    ])
+    elapsed = time.monotonic() - started
+
+    assert results["c"] == "ab"
+    assert elapsed < 0.55, f"Stages ran sequentially ({elapsed:.2f}s)"
+    assert timings["a"]["status"] == "ok"
+    assert timings["a"]["duration_ms"] >= 250
+
+
+def test_stage_timeout_uses_fallback():
+    print("Testing stage timeout fallback...")
+    results, timings = run_stages([
+        Stage("slow", lambda: time.sleep(2) or "late", timeout=0.1, fallback=lambda e: "fallback"),
+        Stage("fast", lambda: "fast"),
+    ])
+
+    assert results["slow"] == "fallback"
+    assert timings["slow"]["status"] == "timeout"
+    assert timings["total"]["duration_ms"] < 1000
+
+
+def test_stage_failure_without_fallback_raises():
+    def _boom():
+        raise RuntimeError("image not found")
+
+    try:
+        run_stages([Stage("image", _boom), Stage("misconfigs", lambda image: image, requires=("image",))])
+    except RuntimeError as e:
+        assert "image not found" in str(e)
+    else:
+        assert False, "Expected the stage error to propagate"
+
+
+def test_run_deadline_only_cuts_degradable_stages():
+    results, timings = run_stages([
+        Stage("required", lambda: time.sleep(0.3) or "done"),
+        Stage("optional", lambda: time.sleep(2) or "late", timeout=10, fallback=lambda e: "fallback"),
+    ], deadline=0.1)
+
+    assert results == {"required": "done", "optional": "fallback"}
+    assert timings["optional"]["status"] == "timeout"
+    assert timings["total"]["duration_ms"] < 1000
+
+
+def test_time_budget_returns_partial_report_and_late_results_fill_cache():
+    print("Testing time-budgeted report...")
+    from unittest.mock import patch
+    from app.core.report import report_builder
+    from app.core.analyzers import security_analyzer
+    report_builder.static_report_cache.invalidate()
+    security_analyzer.dockerfile_scan_cache.invalidate()
+    dockerfile = "FROM python:3.11\nCMD [\"python\", \"app.py\"]\n"
+    scan = {"status": "ok", "total_vulnerabilities": 0, "by_severity": {}, "vulnerabilities": []}
+
+    def _slow_ai(*args, **kwargs):
+        time.sleep(1)
+        return {"optimized_dockerfile": "FROM python:3.11-slim", "explanation": [], "security_warnings": []}
+
+    with patch.object(report_builder, "optimize_with_ai", side_effect=_slow_ai), \
+         patch.object(security_analyzer, "_analyze_dockerfile_security", side_effect=lambda c: time.sleep(0.5) or scan) as mock_scan:
+        started = time.monotonic()
+        report = report_builder.build_static_report(dockerfile, time_budget=0.2, deep_scan=True)
+        assert time.monotonic() - started < 0.6
+        assert sorted(report["pending"]) == ["recommendation", "security_summary"]
+        assert report["security_analysis"]["status"] == "pending"
+        assert report["recommendation"]["optimized_dockerfile"]  # rule-based suggestion
+
+        # The abandoned scan finishes in the background and is picked up by the next request
+        time.sleep(0.5)
+        report = report_builder.build_static_report(dockerfile, time_budget=0.2, deep_scan=True)
+        assert report["security_analysis"]["status"] == "ok"
+        assert "security_summary" not in report["pending"]
+        assert mock_scan.call_count == 1
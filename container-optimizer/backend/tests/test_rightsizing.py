@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.analyzers.rightsizing_analyzer import recommend, instance_limits, summarize
+from app.core.analyzers.misconfig_analyzer import analyze_misconfig
+
+MB = 1024 * 1024
+
+
+def _history(mem_max, cpu_p95, samples=100):
+    return {
+        "window_seconds": 3600,
+        "sample_count": samples,
+        "memory_mb": {"p50": mem_max * 0.8, "p95": mem_max * 0.9, "max": mem_max},
+        "cpu_percent": {"p50": cpu_p95 / 2, "p95": cpu_p95, "max": cpu_p95 * 1.2},
+    }
+
+
+def test_generous_limits_are_reduced():
+    limits = instance_limits({"Memory": 2048 * MB, "NanoCpus": 4_000_000_000, "CpuShares": 4096})
+    result = recommend(_history(mem_max=200, cpu_p95=20), limits)
+
+    assert result["memory"]["recommended_limit_mb"] == 288  # 200 MB * 1.3, rounded up to 32 MB
+    assert result["memory"]["action"] == "reduce" and result["memory"]["over_provisioned_mb"] == 2048 - 288
+    assert result["cpu"]["recommended_limit_cores"] == 0.3
+    assert result["cpu"]["action"] == "reduce" and result["cpu"]["over_provisioned_cores"] == 3.7
+    assert result["cpu"]["cpu_shares"] == {"current": 4096, "recommended": 1024}
+
+    totals = summarize([{"rightsizing": result}, {"rightsizing": recommend(None, {})}])
+    assert totals["sized"] == 1 and totals["over_provisioned_memory_mb"] == 1760 and totals["over_provisioned_cores"] == 3.7
+
+
+def test_missing_and_tight_limits():
+    result = recommend(_history(mem_max=400, cpu_p95=95), instance_limits({"Memory": 512 * MB, "CpuQuota": 100000, "CpuPeriod": 100000}))
+    assert result["memory"]["action"] == "keep"
+    assert result["cpu"]["action"] == "increase"
+
+    # The kernel reclaims or OOM-kills before a sample at the limit itself is recorded; 94% is near it
+    near = recommend(_history(mem_max=480, cpu_p95=10), instance_limits({"Memory": 512 * MB}))
+    assert near["memory"]["action"] == "increase" and near["memory"]["recommended_limit_mb"] == 640
+    runtime = {"runs_as_root": False, "instance": {"id": "c1", "memory_limit": 512 * MB}, "rightsizing": near}
+    issues = {i["id"]: i for i in analyze_misconfig({"layers": [], "base_image": "python:3.11-slim"}, runtime)}
+    assert issues["RUNTIME_MEMORY_NEAR_LIMIT"]["message"] == "Memory usage peaked at 480 MB, 94% of the 512 MB limit"
+
+    result = recommend(_history(mem_max=520, cpu_p95=10), instance_limits({"Memory": 512 * MB}))
+    assert result["memory"]["action"] == "increase" and result["cpu"]["action"] == "set"
+
+    assert recommend(_history(100, 10, samples=3), {})["status"] == "insufficient_data"
+
+
+def test_runtime_rules_use_the_recommendation():
+    unlimited = recommend(_history(mem_max=100, cpu_p95=10), instance_limits({"Memory": 0}))
+    runtime = {"runs_as_root": False, "instance": {"id": "c1", "memory_limit": 0}, "rightsizing": unlimited}
+    issues = {i["id"]: i for i in analyze_misconfig({"layers": [], "base_image": "python:3.11-slim"}, runtime)}
+    assert "--memory 160m" in issues["RUNTIME_NO_MEMORY_LIMIT"]["recommendation"]
+
+    generous = recommend(_history(mem_max=100, cpu_p95=10), instance_limits({"Memory": 4096 * MB}))
+    runtime = {"runs_as_root": False, "instance": {"id": "c1", "memory_limit": 4096 * MB}, "rightsizing": generous}
+    issues = {i["id"]: i for i in analyze_misconfig({"layers": [], "base_image": "python:3.11-slim"}, runtime)}
+    assert "RUNTIME_OVERPROVISIONED" in issues and "RUNTIME_NO_MEMORY_LIMIT" not in issues
@@ -0,0 +1,151 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.stats_collector import SampleRing, StatsCollector, percentile, stream_sample
+
+
+class NoEvents:
+    def subscribe(self, listener):
+        pass
+
+
+def test_ring_keeps_the_latest_samples_in_order():
+    ring = SampleRing(capacity=3)
+    for t in range(5):
+        ring.append(1000.0 + t, float(t), t * 1024)
+    assert len(ring) == 3
+    timestamps, cpu, mem = ring.window()
+    assert timestamps == [1002.0, 1003.0, 1004.0] and cpu == [2.0, 3.0, 4.0] and mem == [2048, 3072, 4096]
+    assert ring.window(1.5, now=1004.0)[0] == [1003.0, 1004.0]
+    assert ring.latest() == (1004.0, 4.0, 4096)
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50 and percentile(values, 95) == 95 and percentile(values, 100) == 100
+    assert percentile([], 50) is None
+
+
+def _write_cgroup(path, usage_usec, memory):
+    os.makedirs(path, exist_ok=True)
+    files = {
+        "cpu.stat": f"usage_usec {usage_usec}\nuser_usec 0\n",
+        "memory.current": f"{memory}\n",
+        "memory.stat": "anon 1\ninactive_file 1048576\n",
+        "memory.max": "536870912\n",
+        "cpu.max": "150000 100000\n",
+    }
+    for name, content in files.items():
+        with open(os.path.join(path, name), "w") as f:
+            f.write(content)
+
+
+def test_cgroup_sampling_without_docker_calls(tmp_path):
+    container_id = "c" * 64
+    cgroup = tmp_path / "system.slice" / f"docker-{container_id}.scope"
+    _write_cgroup(cgroup, 1_000_000, 101 * 1024 * 1024)
+
+    collector = StatsCollector(source="auto", interval=5, capacity=10, cgroup_root=str(tmp_path), events=NoEvents())
+    collector._sync_running([{"Id": container_id}])
+    collector._sample_cgroups()
+    assert collector.usage(container_id[:12]) is None, "The first reading only establishes a CPU baseline"
+
+    state = collector._state(container_id)
+    state.last_sampled -= 2.0  # two seconds later, half a core busy
+    _write_cgroup(cgroup, 2_000_000, 101 * 1024 * 1024)
+    collector._sample_cgroups()
+
+    usage = collector.usage(container_id[:12])
+    assert 49 < usage["cpu_percent"] < 51
+    assert usage["memory_mb"] == 100.0  # reclaimable page cache excluded
+    history = collector.history(container_id[:12], 60)
+    assert history["memory_limit_mb"] == 512.0 and history["cpu_limit"] == 1.5
+    assert history["sample_count"] == 1 and history["cpu_percent"]["max"] == usage["cpu_percent"]
+
+    collector._sync_running([])
+    assert collector.usage(container_id[:12]) is None
+
+
+def test_stream_sample_matches_docker_stats():
+    stats = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 3_000}, "system_cpu_usage": 20_000, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 1_000}, "system_cpu_usage": 10_000},
+        "memory_stats": {"usage": 300, "limit": 1000, "stats": {"inactive_file": 100}},
+    }
+    assert stream_sample(stats) == (80.0, 200, 1000)
+    assert stream_sample({"cpu_stats": {}, "precpu_stats": {}}) is None
+
+
+def test_lost_stats_stream_is_reopened():
+    import time
+    import threading
+    from unittest.mock import patch, MagicMock
+    from app.core import stats_collector as module
+
+    message = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 3_000}, "system_cpu_usage": 20_000, "online_cpus": 1},
+        "precpu_stats": {"cpu_usage": {"total_usage": 1_000}, "system_cpu_usage": 10_000},
+        "memory_stats": {"usage": 64 * 1024 * 1024},
+    }
+    opened = []
+    second = threading.Event()
+
+    def _stats(container_id, stream, decode):
+        opened.append(container_id)
+        if len(opened) == 1:
+            return iter([message])  # the daemon restarted: the stream ends after one sample
+        second.set()
+        return iter([message])
+
+    client = MagicMock()
+    client.api.stats.side_effect = _stats
+    collector = StatsCollector(source="stream", interval=0.01, capacity=10, events=NoEvents())
+    container_id = "d" * 64
+    with patch.object(module, "new_docker_client", return_value=client):
+        collector._sync_running([{"Id": container_id}])
+        state = collector._state(container_id)
+        state.reader.join(1)
+        assert len(opened) == 1 and len(state.ring) == 1
+
+        # Not reopened before the backoff, reopened after it without the container restarting
+        state.reopen_at = time.monotonic() + 60
+        collector._reopen_streams()
+        assert len(opened) == 1
+        state.reopen_at = 0.0
+        state.last_sampled -= 1  # an interval has passed since the last sample
+        collector._reopen_streams()
+        assert second.wait(1)
+        state.reader.join(1)
+
+    assert len(state.ring) == 2
+    collector.stop()
+
+
+def test_streamed_containers_are_capped():
+    import threading
+    from unittest.mock import patch, MagicMock
+    from app.core import stats_collector as module
+
+    release = {}
+
+    def _stats(container_id, stream, decode):
+        release[container_id] = threading.Event()
+        return iter(lambda: release[container_id].wait(1) and None, None)  # blocks like an open stream
+
+    client = MagicMock()
+    client.api.stats.side_effect = _stats
+    collector = StatsCollector(source="stream", interval=0.01, capacity=10, events=NoEvents(), max_streams=2)
+    ids = [c * 64 for c in "abc"]
+    with patch.object(module, "new_docker_client", return_value=client):
+        collector._sync_running([{"Id": cid} for cid in ids])
+        streamed = [cid for cid in ids if collector._state(cid).reader]
+        waiting = next(cid for cid in ids if cid not in streamed)
+        assert len(streamed) == 2
+
+        # A streamed container stops: its stream is closed and the slot goes to the one left waiting
+        collector._sync_running([{"Id": cid} for cid in ids if cid != streamed[0]])
+        assert collector._state(waiting).reader is not None
+
+    for event in list(release.values()):
+        event.set()
+    collector.stop()
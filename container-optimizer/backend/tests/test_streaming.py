@@ -0,0 +1,35 @@
+import sys
+import os
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.core.report.streaming import stream_report
+from app.core.report import report_builder
+from unittest.mock import patch
+
+
+def test_static_report_streams_sections_before_completion():
+    print("Testing streaming static report...")
+    report_builder.static_report_cache.invalidate()
+    dockerfile = "FROM node:18\nRUN npm install\nCMD [\"node\", \"app.js\"]\n"
+
+    with patch('app.core.report.report_builder.optimize_with_ai') as mock_ai:
+        mock_ai.return_value = {"optimized_dockerfile": "FROM node:20-slim", "explanation": [], "security_warnings": []}
+        lines = list(stream_report(lambda on_section: report_builder.build_static_report(dockerfile, on_section=on_section)))
+
+    events = [json.loads(l) for l in lines]
+    sections = [e["section"] for e in events if e["event"] == "section"]
+    for expected in ["image_analysis", "misconfigurations", "security_summary", "recommendation", "findings"]:
+        assert expected in sections, f"Missing section {expected}"
+    assert sections.index("misconfigurations") < sections.index("recommendation")
+    assert events[-1]["event"] == "complete"
+    assert events[-1]["data"]["findings"] == next(e["data"] for e in events if e.get("section") == "findings")
+
+
+def test_stream_reports_errors():
+    def _fail(on_section):
+        on_section("pull", {"status": "pulled"})
+        raise RuntimeError("Image 'x' not found locally")
+
+    events = [json.loads(l) for l in stream_report(_fail)]
+    assert events[0]["section"] == "pull"
+    assert events[-1] == {"event": "error", "status_code": 500, "detail": "Image 'x' not found locally"}
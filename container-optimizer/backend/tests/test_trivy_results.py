@@ -0,0 +1,58 @@
+import sys
+import os
+import io
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from app.core import trivy_results
+
+
+def _trivy_document():
+    def vuln(i, pkg, severity):
+        return {
+            "VulnerabilityID": f"CVE-2024-{i:04d}",
+            "PkgName": pkg,
+            "InstalledVersion": "1.0",
+            "FixedVersion": "1.1",
+            "Severity": severity,
+            "Title": f"Issue {i} with \"quoted\" text and ] brackets",
+            "Description": "x" * 500,
+            "References": [f"https://example.com/{i}"],
+        }
+    return {
+        "SchemaVersion": 2,
+        "Results": [
+            {"Target": "debian", "Vulnerabilities": [vuln(i, "openssl", "HIGH" if i % 2 else "LOW") for i in range(50)]},
+            {"Target": "python-pkg", "Class": "lang-pkgs"},  # no Vulnerabilities key
+            {"Target": "app.jar", "Vulnerabilities": [vuln(7, "openssl", "HIGH"), vuln(100, "log4j", "CRITICAL")]},
+            {"Target": "Dockerfile", "Misconfigurations": [{"ID": "DS002", "Description": '"Vulnerabilities": ['}]},
+        ],
+    }
+
+
+def test_iter_array_items_across_small_chunks():
+    doc = json.dumps(_trivy_document(), indent=2)
+    items = list(trivy_results.iter_array_items(io.StringIO(doc), "Vulnerabilities", chunk_size=37))
+    assert len(items) == 52
+    assert items[-1]["PkgName"] == "log4j"
+
+
+def test_parse_and_lazy_details(tmp_path):
+    print("Testing streaming Trivy parser...")
+    with patch.object(trivy_results, "TRIVY_RESULTS_DIR", str(tmp_path)):
+        scan_id, path = trivy_results.new_result_path()
+        with open(path, "w") as f:
+            json.dump(_trivy_document(), f)
+
+        vulnerabilities, by_severity = trivy_results.parse_vulnerabilities(path)
+        # CVE-2024-0007 in openssl 1.0 appears in two targets but is kept once
+        assert len(vulnerabilities) == 51
+        assert by_severity == {"HIGH": 25, "LOW": 25, "CRITICAL": 1}
+        assert vulnerabilities[0] == {
+            "id": "CVE-2024-0000", "package": "openssl", "installed_version": "1.0", "fixed_version": "1.1",
+            "severity": "LOW", "title": 'Issue 0 with "quoted" text and ] brackets',
+        }
+
+        details = trivy_results.find_vulnerability_details(scan_id, "CVE-2024-0100")
+        assert details[0]["References"] == ["https://example.com/100"]
+        assert trivy_results.find_vulnerability_details("../etc", "CVE-2024-0100") is None
@@ -0,0 +1,60 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from unittest.mock import patch
+from app.core import security_scanner
+from app.core.trivy_server import TrivyServerManager
+
+
+def test_scan_uses_server_and_falls_back_to_cli():
+    print("Testing Trivy client/server fallback...")
+    commands = []
+
+    def _run(cmd, **kwargs):
+        commands.append(cmd)
+        if "--server" in cmd:
+            raise security_scanner.subprocess.CalledProcessError(1, cmd)
+        with open(cmd[cmd.index("--output") + 1], "w") as f:
+            f.write('{"Results": []}')
+
+    server = TrivyServerManager(mode="external", url="http://trivy:4954")
+    server._healthy = True
+    with patch.object(server, "start"), \
+         patch.object(server, "_check_health", return_value=False), \
+         patch.object(security_scanner, "trivy_server", server), \
+         patch.object(security_scanner.subprocess, "run", side_effect=_run):
+        assert security_scanner.scan_image("app:1")["vulnerabilities"] == []
+
+    assert commands[0][commands[0].index("--server") + 1] == "http://trivy:4954"
+    assert "--server" not in commands[1]
+    assert server.status()["healthy"] is False
+
+
+def test_scan_error_on_live_server_is_not_retried_standalone():
+    calls = []
+
+    def _run(cmd, **kwargs):
+        calls.append(cmd)
+        raise security_scanner.subprocess.CalledProcessError(1, cmd)  # e.g. unknown image reference
+
+    server = TrivyServerManager(mode="external", url="http://trivy:4954")
+    server._healthy = True
+    with patch.object(server, "start"), \
+         patch.object(server, "_check_health", return_value=True), \
+         patch.object(security_scanner, "trivy_server", server), \
+         patch.object(security_scanner.subprocess, "run", side_effect=_run):
+        try:
+            security_scanner.scan_image("missing:1")
+        except RuntimeError:
+            pass
+        else:
+            assert False, "Expected the scan error to be raised"
+
+    assert len(calls) == 1
+    assert server.status()["healthy"] is True
+
+
+def test_scan_skips_server_when_off():
+    server = TrivyServerManager(mode="off")
+    assert server.server_url() is None
+    assert server.status()["url"] is None
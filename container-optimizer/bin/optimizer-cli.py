@@ -4,6 +4,36 @@ import requests
 import json
 import argparse
 
+# Extra seconds allowed on top of --time-budget for upload, rule analysis and the response itself
+BUDGET_MARGIN_SECONDS = 15
+
+def request_timeout(time_budget):
+    return time_budget + BUDGET_MARGIN_SECONDS if time_budget else 60
+
+def fetch_report_streaming(api_url, payload, time_budget=None):
+    """Reads the NDJSON report stream, printing rule findings as soon as they arrive."""
+    report = None
+    with requests.post(f"{api_url}/analyze-dockerfile/stream", json=payload, stream=True,
+                       timeout=request_timeout(time_budget)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["event"] == "section" and event["section"] == "misconfigurations":
+                print("\n--- 📋 Rule Findings ---")
+                for m in event["data"]:
+                    print(f"  [{m.get('severity', 'MEDIUM')}] {m['message']}")
+            elif event["event"] == "section" and event["section"] == "security_summary":
+                print(f"\n🛡️ Security scan: {event['data'].get('status')} ({event['data'].get('total_vulnerabilities', 0)} issues)")
+            elif event["event"] == "complete":
+                report = event["data"]
+            elif event["event"] == "error":
+                raise Exception(f"HTTP {event['status_code']}: {event['detail']}")
+    if report is None:
+        raise Exception("Report stream ended before the analysis completed")
+    return report
+
 def main():
     parser = argparse.ArgumentParser(description="Dockerfile Optimizer Gate CLI")
     parser.add_argument("--file", default="Dockerfile", help="Path to the Dockerfile")
@@ -13,6 +43,10 @@ def main():
     parser.add_argument("--fail-on", choices=["CRITICAL", "HIGH", "ALL"], help="Fail build on security risks")
     parser.add_argument("--repo-url", help="GitHub Repo URL (for PR)")
     parser.add_argument("--github-token", help="GitHub Token (for PR)")
+    parser.add_argument("--stream", action="store_true", help="Show rule findings while Trivy and the AI are still running")
+    parser.add_argument("--deep-scan", action="store_true", help="Also run Trivy config checks when the server uses its built-in Dockerfile checks")
+    parser.add_argument("--time-budget", type=float,
+                        help="Seconds the server may spend; slower Trivy/AI results are reported as pending instead of blocking")
     
     args = parser.parse_args()
 
@@ -29,10 +63,22 @@ def main():
 
     print(f"📡 Sending to Optimizer Service ({api_url})...")
     
+    payload = {"content": content}
+    if args.time_budget:
+        payload["time_budget"] = args.time_budget
+    if args.deep_scan:
+        payload["deep_scan"] = True
+
     try:
-        response = requests.post(f"{api_url}/analyze-dockerfile", json={"content": content}, timeout=60)
-        response.raise_for_status()
-        report = response.json()
+        if args.stream:
+            report = fetch_report_streaming(api_url, payload, args.time_budget)
+        else:
+            response = requests.post(f"{api_url}/analyze-dockerfile", json=payload, timeout=request_timeout(args.time_budget))
+            response.raise_for_status()
+            report = response.json()
+
+        if report.get("pending"):
+            print(f"\n⏳ Not finished within the time budget: {', '.join(report['pending'])} (re-run to pick up cached results)")
 
         recommendation = report.get("recommendation", {})
         security_warnings = recommendation.get("security_warnings", [])
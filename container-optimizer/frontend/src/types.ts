@@ -4,6 +4,8 @@ export type Container = {
   image: string
   status: string
   image_size_mb: number
+  cpu_percent?: number | null
+  memory_mb?: number | null
 }
 
 export type Misconfiguration = {
@@ -26,6 +28,8 @@ export type AnalysisReport = {
   summary: {
     image_size_mb: number
     layer_count: number
+    layer_efficiency?: number | null
+    wasted_mb?: number | null
     runs_as_root: boolean
     security_scan_status: string
     misconfiguration_count: number